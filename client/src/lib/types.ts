@@ -13,6 +13,14 @@ export interface TableMetadata {
   name: string;
   rowCount: number;
   columnCount: number;
+  rowCountEstimated?: boolean;
+  sizeBytes?: number | null;
+}
+
+export interface TablePage {
+  tables: TableMetadata[];
+  nextCursor: string | null;
+  total: number;
 }
 
 export interface ColumnMetadata {
@@ -1,6 +1,6 @@
-import { useQuery, useMutation } from "@tanstack/react-query";
+import { useQuery, useMutation, useInfiniteQuery } from "@tanstack/react-query";
 import { useParams, Link } from "wouter";
-import { useState } from "react";
+import { useState, useEffect } from "react";
 import {
   Database,
   Table as TableIcon,
@@ -46,6 +46,7 @@ import { DataValidationDialog } from "@/components/data-validation-dialog";
 import { soundManager } from "@/lib/sounds";
 import { queryClient, apiRequest } from "@/lib/queryClient";
 import { useToast } from "@/hooks/use-toast";
+import type { TablePage } from "@/lib/types";
 
 export default function DatabaseExplorer() {
   const { connectionId } = useParams<{ connectionId: string }>();
@@ -71,20 +72,41 @@ export default function DatabaseExplorer() {
     select: (data) => data.find((c: any) => c.id === connectionId)
   });
 
-  const { data: tables, isLoading: tablesLoading } = useQuery<any[]>({
-    queryKey: [`/api/connections/${connectionId}/tables`],
+  // The search box filters on the server; wait for typing to pause
+  const [tableSearch, setTableSearch] = useState("");
+  useEffect(() => {
+    const timer = setTimeout(() => setTableSearch(searchQuery.trim()), 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  const {
+    data: tablePages,
+    isLoading: tablesLoading,
+    fetchNextPage: fetchMoreTables,
+    hasNextPage: hasMoreTables,
+    isFetchingNextPage: fetchingMoreTables,
+  } = useInfiniteQuery<TablePage>({
+    queryKey: [`/api/connections/${connectionId}/tables`, "page", tableSearch],
+    queryFn: async ({ pageParam }) => {
+      const params = new URLSearchParams({ limit: "100" });
+      if (tableSearch) params.set("search", tableSearch);
+      if (pageParam) params.set("cursor", pageParam as string);
+      const res = await fetch(`/api/connections/${connectionId}/tables?${params}`, { credentials: "include" });
+      if (!res.ok) throw new Error(`${res.status}: ${await res.text()}`);
+      return res.json();
+    },
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
     enabled: !!connectionId,
   });
+  const filteredTables = tablePages?.pages.flatMap(page => page.tables);
+  const tableTotal = tablePages?.pages[0]?.total;
 
   const { data: queryHistory } = useQuery<any[]>({
     queryKey: [`/api/connections/${connectionId}/query-history`],
     enabled: !!connectionId,
   });
 
-  const filteredTables = tables?.filter(table =>
-    table.name.toLowerCase().includes(searchQuery.toLowerCase())
-  );
-
   const dropTableMutation = useMutation({
     mutationFn: async (tableName: string) => {
       const res = await apiRequest('DELETE', `/api/connections/${connectionId}/tables/${tableName}`);
@@ -325,7 +347,7 @@ export default function DatabaseExplorer() {
             <Card className="p-4 glass">
               <div className="flex items-center justify-between mb-3">
                 <h3 className="font-semibold">Tables</h3>
-                <Badge variant="secondary">{tables?.length || 0}</Badge>
+                <Badge variant="secondary">{tableTotal || 0}</Badge>
               </div>
 
               <div className="relative mb-3">
@@ -339,7 +361,15 @@ export default function DatabaseExplorer() {
                 />
               </div>
 
-              <div className="space-y-1 max-h-[500px] overflow-y-auto">
+              <div
+                className="space-y-1 max-h-[500px] overflow-y-auto"
+                onScroll={(e) => {
+                  const list = e.currentTarget;
+                  if (hasMoreTables && !fetchingMoreTables && list.scrollHeight - list.scrollTop - list.clientHeight < 200) {
+                    fetchMoreTables();
+                  }
+                }}
+              >
                 {tablesLoading ? (
                   <div className="text-center py-8 text-muted-foreground">Loading...</div>
                 ) : filteredTables && filteredTables.length > 0 ? (
@@ -361,7 +391,7 @@ export default function DatabaseExplorer() {
                       <span className="flex-1 truncate">{table.name}</span>
                       {table.rowCount !== undefined && (
                         <Badge variant="outline" className="text-xs">
-                          {table.rowCount}
+                          {table.rowCountEstimated ? "~" : ""}{table.rowCount}
                         </Badge>
                       )}
                     </button>
@@ -371,6 +401,18 @@ export default function DatabaseExplorer() {
                     No tables found
                   </div>
                 )}
+                {hasMoreTables && (
+                  <Button
+                    variant="ghost"
+                    size="sm"
+                    className="w-full"
+                    disabled={fetchingMoreTables}
+                    onClick={() => fetchMoreTables()}
+                    data-testid="button-load-more-tables"
+                  >
+                    {fetchingMoreTables ? "Loading..." : "Load more"}
+                  </Button>
+                )}
               </div>
             </Card>
 
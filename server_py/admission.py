@@ -0,0 +1,176 @@
+from collections import deque
+from typing import Dict, Optional, Any, Deque, Tuple
+import asyncio
+import math
+import os
+import re
+import time
+
+
+# Request classes: interactive requests are served first; expensive ones get
+# their own lane with a smaller concurrency cap so they cannot take every slot
+INTERACTIVE = "interactive"
+EXPENSIVE = "expensive"
+LANES = (INTERACTIVE, EXPENSIVE)
+
+CONNECTION_PATH = re.compile(r"^/api/connections/([^/]+)/(.+)$")
+EXPENSIVE_PATH = re.compile(r"/(export(/sql)?|backup|restore|import|analyze|validate)$")
+# Control routes must stay reachable when the queue is full
+EXEMPT_PATH = re.compile(r"^(query/[^/]+/cancel|jobs|admission)$")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class ConnectionGate:
+    """Concurrency limit and bounded priority wait queue for one database connection"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, max_expensive: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_expensive = min(max_expensive, max_concurrent)
+        self.active: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.service_time = 0.0  # Moving average of request duration in seconds
+
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self.waiters.values())
+
+    def _can_start(self, lane: str) -> bool:
+        if sum(self.active.values()) >= self.max_concurrent:
+            return False
+        return lane != EXPENSIVE or self.active[EXPENSIVE] < self.max_expensive
+
+    def _retry_after(self) -> int:
+        """Seconds until the queue ahead has likely drained"""
+        backlog = self.queued() + sum(self.active.values())
+        return max(1, math.ceil(backlog * (self.service_time or 1.0) / self.max_concurrent))
+
+    async def acquire(self, lane: str) -> None:
+        """Wait for a slot in the given lane, or raise AdmissionRejected"""
+        # Interactive requests may overtake queued expensive ones, never the reverse
+        ahead = self.waiters[INTERACTIVE] if lane == EXPENSIVE else ()
+        if self._can_start(lane) and not self.waiters[lane] and not ahead:
+            self.active[lane] += 1
+            self.admitted += 1
+            return
+
+        if self.queued() >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Too many queued requests for this connection", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[lane].append(future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we gave up waiting; hand it on
+                self.release(lane)
+            elif future in self.waiters[lane]:
+                self.waiters[lane].remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected("Timed out waiting for a free slot on this connection",
+                                        self._retry_after())
+            raise
+
+        waited = time.monotonic() - started
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.admitted += 1
+
+    def release(self, lane: str, duration: Optional[float] = None) -> None:
+        """Free a slot and wake the next waiter, interactive lane first"""
+        self.active[lane] -= 1
+        if duration is not None:
+            self.service_time = duration if not self.service_time else 0.9 * self.service_time + 0.1 * duration
+
+        for next_lane in LANES:
+            waiters = self.waiters[next_lane]
+            while waiters and self._can_start(next_lane):
+                future = waiters.popleft()
+                if future.done():
+                    continue  # Timed out or cancelled
+                self.active[next_lane] += 1
+                future.set_result(None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of limits, occupancy and counters"""
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "maxQueue": self.max_queue,
+            "maxExpensive": self.max_expensive,
+            "queueTimeout": self.queue_timeout,
+            "active": dict(self.active),
+            "queued": {lane: len(waiters) for lane, waiters in self.waiters.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timedOut": self.timed_out,
+            "avgWaitMs": round(self.total_wait / self.admitted * 1000, 3) if self.admitted else 0,
+            "maxWaitMs": round(self.max_wait * 1000, 3),
+            "avgServiceMs": round(self.service_time * 1000, 3)
+        }
+
+
+class AdmissionController:
+    """Per-connection admission control for API requests"""
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, queue_timeout: float = 10.0,
+                 max_expensive: int = 2):
+        self.defaults = {
+            "max_concurrent": max_concurrent,
+            "max_queue": max_queue,
+            "queue_timeout": queue_timeout,
+            "max_expensive": max_expensive
+        }
+        self.gates: Dict[str, ConnectionGate] = {}
+
+    def configure(self, connection_id: str, max_concurrent: Optional[int] = None,
+                  max_queue: Optional[int] = None) -> None:
+        """Set limits for a connection, falling back to the defaults"""
+        self.gates[connection_id] = ConnectionGate(
+            max_concurrent=max_concurrent or self.defaults["max_concurrent"],
+            max_queue=max_queue if max_queue is not None else self.defaults["max_queue"],
+            queue_timeout=self.defaults["queue_timeout"],
+            max_expensive=self.defaults["max_expensive"]
+        )
+
+    def remove(self, connection_id: str) -> None:
+        self.gates.pop(connection_id, None)
+
+    def gate(self, connection_id: str) -> Optional[ConnectionGate]:
+        """The gate of a configured connection; gates are only created by configure"""
+        return self.gates.get(connection_id)
+
+    def classify(self, path: str) -> Optional[Tuple[str, str]]:
+        """Map a request path to (connection_id, lane), or None if it is not admission controlled"""
+        match = CONNECTION_PATH.match(path)
+        if not match or EXEMPT_PATH.match(match.group(2)):
+            return None
+        lane = EXPENSIVE if EXPENSIVE_PATH.search(path) else INTERACTIVE
+        return match.group(1), lane
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {connection_id: gate.metrics() for connection_id, gate in self.gates.items()}
+
+
+# Global admission controller instance
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "8")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+    max_expensive=int(os.getenv("ADMISSION_MAX_EXPENSIVE", "2"))
+)
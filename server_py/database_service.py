@@ -1,19 +1,55 @@
-from sqlalchemy import create_engine, text, inspect, MetaData, Table, Column, Integer, String, Text, Boolean, Numeric, DateTime, JSON
+from sqlalchemy import create_engine, text, inspect, bindparam, MetaData, Table, Column, Integer, String, Text, Boolean, Numeric, DateTime, JSON
 from sqlalchemy.engine import Engine
-from typing import Dict, List, Optional, Any, Tuple
-from models import TableMetadata, ColumnMetadata, IndexMetadata, QueryResult, ConnectionConfig
+from typing import Dict, List, Optional, Any, Tuple, Callable
+from models import TableMetadata, ColumnMetadata, IndexMetadata, QueryResult, ConnectionConfig, ValidationState
+from datetime import datetime, date, time as time_type
+from decimal import Decimal
+from contextlib import contextmanager
+from latency import latency
+from metrics import cache_requests, transfer_rows, transfer_bytes
+from tracing import phase
+from slow_log import slow_log
+from index_advisor import index_advisor
+from validation import ValidationPlan, SAMPLE_LIMIT
+from data_compare import DataCompare, LEAF_SIZE, MAX_DIFFERENCES, INTEGER_TYPES
+from schema_diff import normalize_type
+from table_copy import TableCopy, READERS, BATCH_SIZE
+from index_build import IndexBuildWatcher
+import pandas as pd
+import numpy as np
+import threading
+import random
 import time
 import os
 import json
+import base64
+import hashlib
 import csv
 import io
 
 
+# Sort orders accepted by list_tables
+TABLE_SORT_KEYS = ("name", "size", "rows")
+# Seconds a cached schema snapshot is served before it is read again, so DDL from other clients shows up
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "30"))
+# Largest upsert batch; bigger requests are split
+MAX_UPSERT_BATCH_SIZE = 1000
+# Bound parameters SQLite accepts in one statement (SQLITE_MAX_VARIABLE_NUMBER since 3.32)
+SQLITE_MAX_VARIABLES = 32766
+
+
 class DatabaseService:
     """Service for managing multiple database connections and operations"""
     
     def __init__(self):
         self.connections: Dict[str, Engine] = {}
+        self.primary_keys: Dict[Tuple[str, str], List[str]] = {}
+        self.table_statistics: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.schema_snapshots: Dict[str, Dict[str, Any]] = {}
+        self.schema_snapshot_times: Dict[str, float] = {}  # Monotonic time each snapshot was read
+        self.statement_timeouts: Dict[str, int] = {}
+        self.running_queries: Dict[str, Dict[str, Any]] = {}
+        self._running_queries_lock = threading.Lock()
     
     def detect_database_type(self, config: Dict[str, Any]) -> Optional[str]:
         """Auto-detect database type from file path or connection string"""
@@ -58,6 +94,12 @@ class DatabaseService:
             conn.execute(text("SELECT 1"))
         
         self.connections[config.id] = engine
+        slow_log.attach(engine, config.id)
+        slow_log.configure(config.id, config.slowQueryThresholdMs, config.slowQueryPercentile)
+        if config.statementTimeout:
+            self.statement_timeouts[config.id] = config.statementTimeout
+        else:
+            self.statement_timeouts.pop(config.id, None)
     
     def get_connection(self, connection_id: str) -> Engine:
         """Get a database connection"""
@@ -70,37 +112,321 @@ class DatabaseService:
         if connection_id in self.connections:
             self.connections[connection_id].dispose()
             del self.connections[connection_id]
+        self.statement_timeouts.pop(connection_id, None)
+        slow_log.remove(connection_id)
+        self._invalidate_schema_cache(connection_id)
+
+    def _invalidate_schema_cache(self, connection_id: str) -> None:
+        """Forget cached schema details after DDL may have changed them"""
+        for key in [key for key in self.primary_keys if key[0] == connection_id]:
+            del self.primary_keys[key]
+        for key in [key for key in self.table_statistics if key[0] == connection_id]:
+            del self.table_statistics[key]
+        self.schema_snapshots.pop(connection_id, None)
+        self.schema_snapshot_times.pop(connection_id, None)
     
+    def _cached_snapshot(self, connection_id: str) -> Optional[Dict[str, Any]]:
+        """The cached schema snapshot, unless it is older than SCHEMA_CACHE_TTL"""
+        read_at = self.schema_snapshot_times.get(connection_id)
+        if read_at is None or time.monotonic() - read_at > SCHEMA_CACHE_TTL:
+            return None
+        return self.schema_snapshots.get(connection_id)
+    
+    @latency.timed("metadata")
+    def get_schema_snapshot(self, connection_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """Columns, keys, indexes and relationships of every table, read in a fixed number of catalog queries.
+        
+        The snapshot is cached until DDL runs through this service, it is older
+        than SCHEMA_CACHE_TTL, or `refresh` is set. Its version is a hash of the content, so clients can tell
+        whether the schema changed without comparing it.
+        """
+        snapshot = self._cached_snapshot(connection_id)
+        if snapshot is not None and not refresh:
+            cache_requests.inc(cache="schema_snapshot", result="hit")
+            return snapshot
+        cache_requests.inc(cache="schema_snapshot", result="miss")
+        
+        engine = self.get_connection(connection_id)
+        if engine.dialect.name == 'mysql':
+            # The MySQL dialect reflects one table at a time, so read information_schema directly
+            with engine.connect() as conn:
+                reflected = self._reflect_mysql_schema(conn)
+        else:
+            inspector = inspect(engine)
+            names = inspector.get_table_names()
+            columns = inspector.get_multi_columns()
+            pk_constraints = inspector.get_multi_pk_constraint()
+            fk_constraints = inspector.get_multi_foreign_keys()
+            indexes = inspector.get_multi_indexes()
+            unique_constraints = inspector.get_multi_unique_constraints()
+            check_constraints = inspector.get_multi_check_constraints()
+            reflected = {
+                name: (columns.get((None, name), []), pk_constraints.get((None, name)) or {},
+                       fk_constraints.get((None, name), []),
+                       # PostgreSQL also lists the index behind each unique constraint
+                       [idx for idx in indexes.get((None, name), []) if not idx.get("duplicates_constraint")],
+                       unique_constraints.get((None, name), []), check_constraints.get((None, name), []))
+                for name in names
+            }
+        
+        tables = []
+        relationships = []
+        for name in sorted(reflected):
+            columns_data, pk_constraint, fk_list, index_list, unique_list, check_list = reflected[name]
+            tables.append({
+                "name": name,
+                "columns": [col.model_dump() for col in self._column_metadata(columns_data, pk_constraint, fk_list, index_list)],
+                "primaryKey": pk_constraint.get("constrained_columns", []),
+                "foreignKeys": [{
+                    "name": fk.get("name"),
+                    "columns": fk["constrained_columns"],
+                    "referredTable": fk["referred_table"],
+                    "referredColumns": fk["referred_columns"],
+                    "onDelete": fk.get("options", {}).get("ondelete"),
+                    "onUpdate": fk.get("options", {}).get("onupdate")
+                } for fk in fk_list],
+                "indexes": [{"name": idx["name"], "columns": idx["column_names"], "unique": bool(idx.get("unique"))}
+                            for idx in index_list],
+                "uniqueConstraints": [{"name": uc.get("name"), "columns": uc["column_names"]} for uc in unique_list],
+                "checkConstraints": [{"name": cc.get("name"), "expression": cc["sqltext"]} for cc in check_list]
+            })
+            for fk in tables[-1]["foreignKeys"]:
+                relationships.append({
+                    "fromTable": name,
+                    "fromColumn": ", ".join(fk["columns"]),
+                    "toTable": fk["referredTable"],
+                    "toColumn": ", ".join(fk["referredColumns"]),
+                    "onDelete": fk["onDelete"],
+                    "onUpdate": fk["onUpdate"]
+                })
+        
+        content = json.dumps(tables, sort_keys=True, default=str)
+        snapshot = {
+            "version": hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest(),
+            "generatedAt": datetime.utcnow().isoformat(),
+            "dialect": engine.dialect.name,
+            "tables": tables,
+            "relationships": relationships
+        }
+        self.schema_snapshots[connection_id] = snapshot
+        self.schema_snapshot_times[connection_id] = time.monotonic()
+        return snapshot
+    
+    def _reflect_mysql_schema(self, conn) -> Dict[str, Tuple[List[Dict], Dict, List[Dict], List[Dict], List[Dict], List[Dict]]]:
+        """Reflect every table of the current MySQL database with five information_schema queries.
+        
+        MySQL implements unique constraints as unique indexes, so they are
+        reported with the indexes.
+        """
+        reflected: Dict[str, Tuple[List[Dict], Dict, List[Dict], List[Dict], List[Dict], List[Dict]]] = {}
+        for (name,) in conn.execute(text(
+            "SELECT TABLE_NAME FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'"
+        )):
+            reflected[name] = ([], {}, [], [], [], [])
+        
+        for table, column, column_type, nullable, default, extra in conn.execute(text(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, EXTRA "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        )):
+            if table in reflected:
+                reflected[table][0].append({
+                    "name": column, "type": column_type.upper(), "nullable": nullable == "YES",
+                    "default": default, "autoincrement": "auto_increment" in (extra or "")
+                })
+        
+        indexes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for table, index_name, non_unique, column in conn.execute(text(
+            "SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+        )):
+            if table not in reflected:
+                continue
+            if index_name == "PRIMARY":
+                reflected[table][1].setdefault("constrained_columns", []).append(column)
+                reflected[table][1]["name"] = "PRIMARY"
+                continue
+            index = indexes.get((table, index_name))
+            if index is None:
+                index = indexes[(table, index_name)] = {"name": index_name, "column_names": [], "unique": not non_unique}
+                reflected[table][3].append(index)
+            index["column_names"].append(column)
+        
+        foreign_keys: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for table, name, column, referred_table, referred_column, on_update, on_delete in conn.execute(text(
+            "SELECT k.TABLE_NAME, k.CONSTRAINT_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_NAME, "
+            "k.REFERENCED_COLUMN_NAME, r.UPDATE_RULE, r.DELETE_RULE "
+            "FROM information_schema.KEY_COLUMN_USAGE k "
+            "JOIN information_schema.REFERENTIAL_CONSTRAINTS r "
+            "ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME "
+            "AND r.TABLE_NAME = k.TABLE_NAME "
+            "WHERE k.TABLE_SCHEMA = DATABASE() AND k.REFERENCED_TABLE_NAME IS NOT NULL "
+            "ORDER BY k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION"
+        )):
+            if table not in reflected:
+                continue
+            fk = foreign_keys.get((table, name))
+            if fk is None:
+                fk = foreign_keys[(table, name)] = {
+                    "name": name, "constrained_columns": [], "referred_table": referred_table,
+                    "referred_columns": [], "options": {"onupdate": on_update, "ondelete": on_delete}
+                }
+                reflected[table][2].append(fk)
+            fk["constrained_columns"].append(column)
+            fk["referred_columns"].append(referred_column)
+        
+        try:
+            for table, name, expression in conn.execute(text(
+                "SELECT t.TABLE_NAME, c.CONSTRAINT_NAME, c.CHECK_CLAUSE FROM information_schema.CHECK_CONSTRAINTS c "
+                "JOIN information_schema.TABLE_CONSTRAINTS t "
+                "ON t.CONSTRAINT_SCHEMA = c.CONSTRAINT_SCHEMA AND t.CONSTRAINT_NAME = c.CONSTRAINT_NAME "
+                "WHERE c.CONSTRAINT_SCHEMA = DATABASE() AND t.CONSTRAINT_TYPE = 'CHECK'"
+            )):
+                if table in reflected:
+                    reflected[table][5].append({"name": name, "sqltext": expression})
+        except Exception:
+            conn.rollback()  # CHECK_CONSTRAINTS exists from MySQL 8.0.16
+        
+        return reflected
+    
+    def _snapshot_table(self, connection_id: str, table_name: str) -> Optional[Dict[str, Any]]:
+        """A table's entry in the schema snapshot; None for views and other unlisted relations"""
+        for table in self.get_schema_snapshot(connection_id)["tables"]:
+            if table["name"] == table_name:
+                return table
+        return None
+    
+    @latency.timed("metadata")
     def get_tables(self, connection_id: str) -> List[TableMetadata]:
         """Get all tables in the database"""
         engine = self.get_connection(connection_id)
-        inspector = inspect(engine)
         tables = []
         
-        for table_name in inspector.get_table_names():
+        for table in self.get_schema_snapshot(connection_id)["tables"]:
+            table_name = table["name"]
             with engine.connect() as conn:
                 result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
                 count = result.scalar()
             
-            columns = inspector.get_columns(table_name)
-            
             tables.append(TableMetadata(
                 name=table_name,
                 rowCount=count,
-                columnCount=len(columns)
+                columnCount=len(table["columns"])
             ))
         
         return tables
     
+    @latency.timed("metadata")
+    def list_tables(self, connection_id: str, search: Optional[str] = None, prefix: Optional[str] = None,
+                    sort: str = "name", descending: bool = False, limit: int = 100,
+                    cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of tables, filtered and sorted from a single catalog query.
+        
+        Only the tables on the page get row and column counts. Rows come from
+        planner estimates where the database keeps them, and from COUNT(*)
+        otherwise. `cursor` is the `nextCursor` of the previous page.
+        """
+        if sort not in TABLE_SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {sort}")
+        engine = self.get_connection(connection_id)
+        
+        with engine.connect() as conn:
+            catalog = self._table_catalog(conn, engine.dialect.name)
+        if prefix:
+            catalog = [entry for entry in catalog if entry["name"].lower().startswith(prefix.lower())]
+        if search:
+            catalog = [entry for entry in catalog if search.lower() in entry["name"].lower()]
+        
+        def sort_key(entry: Dict[str, Any]) -> List[Any]:
+            # The name breaks ties so every position in the order is unique
+            if sort == "name":
+                return [entry["name"].lower(), entry["name"]]
+            value = entry["sizeBytes"] if sort == "size" else entry["rowEstimate"]
+            return [value if value is not None else -1, entry["name"]]
+        
+        catalog.sort(key=sort_key, reverse=descending)
+        if cursor:
+            last = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            catalog_keys = [sort_key(entry) for entry in catalog]
+            start = next((i for i, key in enumerate(catalog_keys) if (key < last if descending else key > last)),
+                         len(catalog))
+        else:
+            start = 0
+        page = catalog[start:start + limit]
+        
+        snapshot = self._cached_snapshot(connection_id)
+        snapshot_columns = {table["name"]: len(table["columns"]) for table in snapshot["tables"]} if snapshot else {}
+        inspector = inspect(engine)
+        tables = []
+        with engine.connect() as conn:
+            for entry in page:
+                name = entry["name"]
+                estimated = entry["rowEstimate"] is not None and engine.dialect.name != 'sqlite'
+                row_count = entry["rowEstimate"] if estimated else conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+                column_count = snapshot_columns.get(name)
+                if column_count is None:
+                    column_count = len(inspector.get_columns(name))
+                tables.append(TableMetadata(name=name, rowCount=row_count, columnCount=column_count,
+                                            rowCountEstimated=estimated, sizeBytes=entry["sizeBytes"]))
+        
+        has_more = start + limit < len(catalog)
+        next_cursor = base64.urlsafe_b64encode(
+            json.dumps(sort_key(page[-1])).encode("utf-8")).decode("ascii") if page and has_more else None
+        return {"tables": tables, "nextCursor": next_cursor, "total": len(catalog)}
+    
+    def _table_catalog(self, conn, dialect: str) -> List[Dict[str, Any]]:
+        """Name, size and row estimate of every table in one catalog query"""
+        if dialect == 'postgresql':
+            rows = conn.execute(text(
+                "SELECT c.relname, pg_total_relation_size(c.oid), c.reltuples::bigint FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()"
+            )).all()
+        elif dialect == 'mysql':
+            rows = conn.execute(text(
+                "SELECT TABLE_NAME, DATA_LENGTH + INDEX_LENGTH, TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'"
+            )).all()
+        else:
+            names = [row[0] for row in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"))]
+            sizes, estimates = {}, {}
+            try:
+                sizes = dict(conn.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all())
+            except Exception:
+                conn.rollback()  # dbstat is an optional compile-time feature
+            try:
+                # The first number of a sqlite_stat1 entry is the table's row count at the last ANALYZE
+                estimates = dict(conn.execute(text(
+                    "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl")).all())
+            except Exception:
+                conn.rollback()  # Never analyzed
+            rows = [(name, sizes.get(name), estimates.get(name)) for name in names]
+        
+        # reltuples is -1 for tables that were never vacuumed or analyzed
+        return [{"name": name, "sizeBytes": size, "rowEstimate": estimate if estimate is None or estimate >= 0 else None}
+                for name, size, estimate in rows]
+    
+    @latency.timed("metadata")
     def get_columns(self, connection_id: str, table_name: str) -> List[ColumnMetadata]:
         """Get columns for a table"""
+        table = self._snapshot_table(connection_id, table_name)
+        if table is not None:
+            return [ColumnMetadata(**col) for col in table["columns"]]
+        
         engine = self.get_connection(connection_id)
         inspector = inspect(engine)
-        columns_data = inspector.get_columns(table_name)
-        pk_constraint = inspector.get_pk_constraint(table_name)
-        fk_constraints = inspector.get_foreign_keys(table_name)
-        indexes = inspector.get_indexes(table_name)
-        
+        return self._column_metadata(
+            inspector.get_columns(table_name),
+            inspector.get_pk_constraint(table_name),
+            inspector.get_foreign_keys(table_name),
+            inspector.get_indexes(table_name)
+        )
+    
+    def _column_metadata(self, columns_data: List[Dict], pk_constraint: Dict, fk_constraints: List[Dict],
+                         indexes: List[Dict]) -> List[ColumnMetadata]:
+        """Build column metadata from reflected columns, primary key, foreign keys and indexes"""
         # Create foreign key map
         fk_map = {}
         for fk in fk_constraints:
@@ -134,6 +460,7 @@ class DatabaseService:
         
         return columns
     
+    @latency.timed("metadata")
     def get_indexes(self, connection_id: str, table_name: str) -> List[IndexMetadata]:
         """Get indexes for a table"""
         engine = self.get_connection(connection_id)
@@ -162,6 +489,135 @@ class DatabaseService:
         
         return indexes
     
+    @latency.timed("metadata")
+    def get_index_health(self, connection_id: str, table_name: str) -> Dict[str, Any]:
+        """Report unused, duplicate and prefix-redundant indexes with their size and write cost"""
+        engine = self.get_connection(connection_id)
+        inspector = inspect(engine)
+        dialect = engine.dialect.name
+        
+        pk_constraint = inspector.get_pk_constraint(table_name)
+        entries = []
+        if pk_constraint and pk_constraint.get('constrained_columns'):
+            entries.append({"name": pk_constraint.get('name') or 'PRIMARY', "columns": pk_constraint['constrained_columns'],
+                            "unique": True, "primary": True, "ordered": True, "partial": False})
+        for idx in inspector.get_indexes(table_name):
+            options = idx.get("dialect_options", {})
+            entries.append({
+                "name": idx["name"],
+                "columns": idx["column_names"],
+                "unique": bool(idx.get("unique")),
+                "primary": False,
+                # Only B-tree indexes can serve a query on a leading prefix
+                "ordered": options.get("postgresql_using", "btree") == "btree" and options.get("mysql_prefix") is None,
+                "partial": (options.get("postgresql_where") is not None or options.get("sqlite_where") is not None
+                            or None in idx["column_names"])
+            })
+        
+        usage: Dict[str, Dict[str, Any]] = {}
+        table_size = table_writes = stats_since = stats_source = None
+        with engine.connect() as conn:
+            try:
+                if dialect == 'postgresql':
+                    stats_source = "pg_stat_user_indexes"
+                    for name, scans, size in conn.execute(text(
+                        "SELECT indexrelname, idx_scan, pg_relation_size(indexrelid) FROM pg_stat_user_indexes "
+                        "WHERE relid = to_regclass(:table)"
+                    ), {"table": table_name}):
+                        usage[name] = {"scans": scans, "sizeBytes": size}
+                    row = conn.execute(text(
+                        "SELECT pg_relation_size(relid), n_tup_ins + n_tup_upd - n_tup_hot_upd FROM pg_stat_user_tables "
+                        "WHERE relid = to_regclass(:table)"
+                    ), {"table": table_name}).first()
+                    if row:
+                        # HOT updates do not touch any index, so they are left out
+                        table_size, table_writes = row
+                    stats_since = conn.execute(text(
+                        "SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()"
+                    )).scalar()
+                elif dialect == 'mysql':
+                    stats_source = "performance_schema"
+                    table_writes = 0
+                    for name, scans, writes in conn.execute(text(
+                        "SELECT INDEX_NAME, COUNT_FETCH, COUNT_WRITE "
+                        "FROM performance_schema.table_io_waits_summary_by_index_usage "
+                        "WHERE OBJECT_SCHEMA = DATABASE() AND OBJECT_NAME = :table"
+                    ), {"table": table_name}):
+                        table_writes += writes or 0
+                        if name is not None:
+                            usage.setdefault(name, {})["scans"] = scans
+                    for name, size in conn.execute(text(
+                        "SELECT index_name, stat_value * @@innodb_page_size FROM mysql.innodb_index_stats "
+                        "WHERE database_name = DATABASE() AND table_name = :table AND stat_name = 'size'"
+                    ), {"table": table_name}):
+                        usage.setdefault(name, {})["sizeBytes"] = size
+                    # The clustered index is the table itself
+                    table_size = usage.get("PRIMARY", {}).get("sizeBytes")
+                else:  # SQLite keeps no usage counters; sizes need the dbstat table
+                    names = [table_name] + [entry["name"] for entry in entries if not entry["primary"]]
+                    sizes = dict(conn.execute(
+                        text("SELECT name, SUM(pgsize) FROM dbstat WHERE name IN :names GROUP BY name").bindparams(
+                            bindparam("names", expanding=True)),
+                        {"names": names}
+                    ).all())
+                    table_size = sizes.pop(table_name, None)
+                    for name, size in sizes.items():
+                        usage[name] = {"sizeBytes": size}
+            except Exception:
+                conn.rollback()  # Statistics need privileges or extensions that may be missing
+        
+        secondary = [entry for entry in entries if not entry["primary"]]
+        report_indexes = []
+        for entry in entries:
+            stats = usage.get(entry["name"], {})
+            size = stats.get("sizeBytes")
+            issues = []
+            
+            if stats.get("scans") == 0 and not entry["unique"]:
+                issues.append({"type": "unused", "detail": "No scans since statistics were last reset"})
+            
+            if not entry["primary"] and not entry["partial"]:
+                for other in entries:
+                    if other is entry or other["partial"]:
+                        continue
+                    if other["columns"] == entry["columns"]:
+                        # Keep the primary key, then unique indexes, then the first by name
+                        rank = (not other["primary"], not other["unique"], other["name"])
+                        if rank < (not entry["primary"], not entry["unique"], entry["name"]):
+                            issues.append({"type": "duplicate", "coveredBy": other["name"],
+                                           "detail": f"Same columns as {other['name']}"})
+                            break
+                    elif (not entry["unique"] and other["ordered"] and len(other["columns"]) > len(entry["columns"])
+                          and other["columns"][:len(entry["columns"])] == entry["columns"]):
+                        issues.append({"type": "redundant_prefix", "coveredBy": other["name"],
+                                       "detail": f"Leading columns of {other['name']}"})
+                        break
+            
+            report_indexes.append({
+                "name": entry["name"],
+                "columns": entry["columns"],
+                "unique": entry["unique"],
+                "primary": entry["primary"],
+                "sizeBytes": size,
+                "scans": stats.get("scans"),
+                # Every secondary index gets its own write for each row written to the table
+                "estimatedWrites": table_writes if not entry["primary"] else None,
+                "writeAmplification": round(size / table_size, 3) if size is not None and table_size else None,
+                "issues": issues
+            })
+        
+        return {
+            "table": table_name,
+            "statsSource": stats_source,
+            "statsSince": stats_since.isoformat() if isinstance(stats_since, datetime) else stats_since,
+            "tableSizeBytes": table_size,
+            "rowWrites": table_writes,
+            "writesPerInsert": 1 + len(secondary),
+            "indexes": report_indexes,
+            "dropCandidates": [index["name"] for index in report_indexes if index["issues"] and not index["primary"]]
+        }
+    
+    @latency.timed("get_rows")
     def get_rows(
         self,
         connection_id: str,
@@ -199,24 +655,31 @@ class DatabaseService:
         if offset:
             base_query += f" OFFSET {offset}"
         
-        with engine.connect() as conn:
-            # Get total count
-            if search:
-                count_result = conn.execute(text(count_query), {"search": f"%{search}%"})
-            else:
-                count_result = conn.execute(text(count_query))
-            total = count_result.scalar()
+        with phase("checkout"):
+            conn = engine.connect()
+        with conn:
+            with phase("sql", statement="count"):
+                # Get total count
+                if search:
+                    count_result = conn.execute(text(count_query), {"search": f"%{search}%"})
+                else:
+                    count_result = conn.execute(text(count_query))
+                total = count_result.scalar()
             
             # Get rows
-            if search:
-                result = conn.execute(text(base_query), {"search": f"%{search}%"})
-            else:
-                result = conn.execute(text(base_query))
-            
-            rows = [dict(row._mapping) for row in result]
+            with phase("sql", statement="select"):
+                if search:
+                    result = conn.execute(text(base_query), {"search": f"%{search}%"})
+                else:
+                    result = conn.execute(text(base_query))
+            with phase("fetch"):
+                fetched = result.fetchall()
+            with phase("convert"):
+                rows = [dict(row._mapping) for row in fetched]
         
         return rows, total
     
+    @latency.timed("write")
     def insert_row(self, connection_id: str, table_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Insert a new row"""
         engine = self.get_connection(connection_id)
@@ -226,23 +689,36 @@ class DatabaseService:
         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
         
         with engine.connect() as conn:
+            # PostgreSQL, SQLite 3.35+ and MariaDB 10.5+ hand the row back in the same round-trip
+            if engine.dialect.insert_returning:
+                result = conn.execute(text(f"{query} RETURNING *"), data)
+                row = result.first()
+                conn.commit()
+                return dict(row._mapping)
+            
             result = conn.execute(text(query), data)
             conn.commit()
             
-            # Get the inserted row
-            if engine.dialect.name == 'sqlite':
-                row_id = result.lastrowid
+            # Otherwise read the row back by whichever key identifies it
+            pk_cols = self._get_primary_key_columns(connection_id, table_name)
+            if pk_cols and all(col in data for col in pk_cols):
+                key = {col: data[col] for col in pk_cols}
+            elif engine.dialect.name == 'sqlite' and result.lastrowid:
+                # lastrowid is the rowid, which is not the primary key for e.g. TEXT keys
+                key = {"rowid": result.lastrowid}
+            elif len(pk_cols) == 1 and result.lastrowid:
+                # MySQL reports LAST_INSERT_ID(), the value of the AUTO_INCREMENT key
+                key = {pk_cols[0]: result.lastrowid}
             else:
-                row_id = result.inserted_primary_key[0] if hasattr(result, 'inserted_primary_key') else None
+                return data
             
-            if row_id:
-                pk_col = self._get_primary_key_column(connection_id, table_name)
-                select_query = f"SELECT * FROM {table_name} WHERE {pk_col} = :id"
-                result = conn.execute(text(select_query), {"id": row_id})
-                return dict(result.first()._mapping)
+            where_clause = " AND ".join([f"{col} = :{col}" for col in key])
+            result = conn.execute(text(f"SELECT * FROM {table_name} WHERE {where_clause}"), key)
+            row = result.first()
         
-        return data
+        return dict(row._mapping) if row else data
     
+    @latency.timed("write")
     def update_row(self, connection_id: str, table_name: str, row_id: Any, data: Dict[str, Any]) -> Dict[str, Any]:
         """Update a row"""
         engine = self.get_connection(connection_id)
@@ -252,14 +728,24 @@ class DatabaseService:
         query = f"UPDATE {table_name} SET {set_clause} WHERE {pk_col} = :row_id"
         
         with engine.connect() as conn:
-            conn.execute(text(query), {**data, "row_id": row_id})
-            conn.commit()
-            
-            # Get the updated row
-            select_query = f"SELECT * FROM {table_name} WHERE {pk_col} = :row_id"
-            result = conn.execute(text(select_query), {"row_id": row_id})
-            return dict(result.first()._mapping)
+            if engine.dialect.update_returning:
+                result = conn.execute(text(f"{query} RETURNING *"), {**data, "row_id": row_id})
+                row = result.first()
+                conn.commit()
+            else:
+                conn.execute(text(query), {**data, "row_id": row_id})
+                conn.commit()
+                
+                # Get the updated row, following the key if it was changed
+                select_query = f"SELECT * FROM {table_name} WHERE {pk_col} = :row_id"
+                result = conn.execute(text(select_query), {"row_id": data.get(pk_col, row_id)})
+                row = result.first()
+        
+        if row is None:
+            raise ValueError("Row not found")
+        return dict(row._mapping)
     
+    @latency.timed("write")
     def delete_row(self, connection_id: str, table_name: str, row_id: Any) -> None:
         """Delete a row"""
         engine = self.get_connection(connection_id)
@@ -271,20 +757,30 @@ class DatabaseService:
             conn.execute(text(query), {"row_id": row_id})
             conn.commit()
     
-    def execute_query(self, connection_id: str, query: str) -> QueryResult:
+    @latency.timed("query")
+    def execute_query(self, connection_id: str, query: str, timeout_ms: Optional[int] = None,
+                      request_id: Optional[str] = None) -> QueryResult:
         """Execute a custom SQL query"""
         engine = self.get_connection(connection_id)
         start_time = time.time()
         
-        with engine.connect() as conn:
-            result = conn.execute(text(query))
+        with phase("checkout"):
+            conn = engine.connect()
+        with conn, self._statement_guard(conn, connection_id, timeout_ms, request_id):
+            with phase("sql"):
+                result = conn.execute(text(query))
             
             # Handle different query types
             if result.returns_rows:
-                rows = [dict(row._mapping) for row in result]
+                with phase("fetch"):
+                    fetched = result.fetchall()
+                with phase("convert"):
+                    rows = [dict(row._mapping) for row in fetched]
                 columns = list(rows[0].keys()) if rows else []
             else:
                 conn.commit()
+                # Ad-hoc statements may be DDL
+                self._invalidate_schema_cache(connection_id)
                 rows = []
                 columns = []
             
@@ -297,6 +793,75 @@ class DatabaseService:
             executionTime=execution_time
         )
     
+    @contextmanager
+    def _statement_guard(self, conn, connection_id: str, timeout_ms: Optional[int] = None,
+                         request_id: Optional[str] = None):
+        """Apply a statement timeout to a connection and register it for cancellation"""
+        dialect = conn.engine.dialect.name
+        driver_connection = conn.connection.driver_connection
+        if timeout_ms is None:
+            timeout_ms = self.statement_timeouts.get(connection_id)
+        
+        if timeout_ms:
+            if dialect == 'postgresql':
+                # SET LOCAL lapses when the transaction ends, so pooled connections come back clean
+                conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+            elif dialect == 'mysql':
+                # Only applies to read-only SELECT statements
+                conn.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout_ms)}"))
+            else:  # SQLite
+                deadline = time.monotonic() + timeout_ms / 1000
+                driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        
+        if request_id:
+            if dialect == 'postgresql':
+                backend = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+            elif dialect == 'mysql':
+                backend = conn.execute(text("SELECT CONNECTION_ID()")).scalar()
+            else:  # SQLite is interrupted through the connection object itself
+                backend = driver_connection
+            with self._running_queries_lock:
+                if request_id in self.running_queries:
+                    raise ValueError(f"Request ID already in use: {request_id}")
+                self.running_queries[request_id] = {"connectionId": connection_id, "backend": backend}
+        
+        try:
+            yield
+        finally:
+            if request_id:
+                with self._running_queries_lock:
+                    self.running_queries.pop(request_id, None)
+            if timeout_ms:
+                if dialect == 'mysql':
+                    try:
+                        conn.execute(text("SET SESSION MAX_EXECUTION_TIME = DEFAULT"))
+                    except Exception:
+                        conn.invalidate()  # Never return the connection with the timeout still set
+                elif dialect == 'sqlite':
+                    driver_connection.set_progress_handler(None, 0)
+    
+    def cancel_query(self, connection_id: str, request_id: str) -> bool:
+        """Cancel a running statement by its request ID"""
+        with self._running_queries_lock:
+            running = self.running_queries.get(request_id)
+        if not running or running["connectionId"] != connection_id:
+            return False
+        
+        engine = self.get_connection(connection_id)
+        backend = running["backend"]
+        
+        if engine.dialect.name == 'postgresql':
+            with engine.connect() as conn:
+                return bool(conn.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": backend}).scalar())
+        elif engine.dialect.name == 'mysql':
+            with engine.connect() as conn:
+                conn.execute(text(f"KILL QUERY {int(backend)}"))
+            return True
+        else:  # SQLite
+            backend.interrupt()
+            return True
+    
+    @latency.timed("ddl")
     def create_table(self, connection_id: str, table_name: str, columns: List[Dict[str, Any]]) -> None:
         """Create a new table"""
         engine = self.get_connection(connection_id)
@@ -321,7 +886,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def drop_table(self, connection_id: str, table_name: str) -> None:
         """Drop a table"""
         engine = self.get_connection(connection_id)
@@ -329,7 +896,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(f"DROP TABLE {table_name}"))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def rename_table(self, connection_id: str, old_name: str, new_name: str) -> None:
         """Rename a table"""
         engine = self.get_connection(connection_id)
@@ -342,7 +911,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def truncate_table(self, connection_id: str, table_name: str) -> None:
         """Truncate a table"""
         engine = self.get_connection(connection_id)
@@ -353,7 +924,9 @@ class DatabaseService:
             else:
                 conn.execute(text(f"TRUNCATE TABLE {table_name}"))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def add_column(self, connection_id: str, table_name: str, column: Dict[str, Any]) -> None:
         """Add a column to a table"""
         engine = self.get_connection(connection_id)
@@ -371,7 +944,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def drop_column(self, connection_id: str, table_name: str, column_name: str) -> None:
         """Drop a column from a table"""
         engine = self.get_connection(connection_id)
@@ -384,7 +959,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def modify_column(self, connection_id: str, table_name: str, column_name: str, changes: Dict[str, Any]) -> None:
         """Modify a column"""
         engine = self.get_connection(connection_id)
@@ -405,31 +982,59 @@ class DatabaseService:
                 conn.execute(text(query))
             
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
-    def export_data(self, connection_id: str, table_name: str, format: str) -> str:
+    @latency.timed("export")
+    def export_data(self, connection_id: str, table_name: str, format: str,
+                    progress: Optional[Callable[..., None]] = None) -> str:
         """Export table data"""
-        rows, _ = self.get_rows(connection_id, table_name)
+        if format not in ('json', 'csv'):
+            raise ValueError(f"Unsupported format: {format}")
+        
+        rows = []
+        for chunk, total in self._iter_row_chunks(connection_id, table_name, count=progress is not None):
+            rows.extend(chunk)
+            if progress:
+                progress(rows=len(chunk), total_rows=total)
         
         if format == 'json':
-            return json.dumps(rows, indent=2, default=str)
-        elif format == 'csv':
-            if not rows:
-                return ''
-            
+            content = json.dumps(rows, indent=2, default=str)
+        elif not rows:
+            content = ''
+        else:
             output = io.StringIO()
             writer = csv.DictWriter(output, fieldnames=rows[0].keys())
             writer.writeheader()
             writer.writerows(rows)
-            return output.getvalue()
+            content = output.getvalue()
         
-        raise ValueError(f"Unsupported format: {format}")
+        if progress:
+            progress(nbytes=len(content))
+        transfer_rows.inc(len(rows), connection_id=connection_id, direction="export")
+        transfer_bytes.inc(len(content), connection_id=connection_id, direction="export")
+        return content
     
-    def export_sql_dump(self, connection_id: str, table_name: Optional[str] = None) -> str:
+    def _iter_row_chunks(self, connection_id: str, table_name: str, chunk_size: int = 1000,
+                         count: bool = False):
+        """Stream a table's rows in chunks, yielding (rows, total row count or None)"""
+        engine = self.get_connection(connection_id)
+        
+        with engine.connect() as conn:
+            total = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar() if count else None
+            result = conn.execution_options(stream_results=True).execute(text(f"SELECT * FROM {table_name}"))
+            for partition in result.partitions(chunk_size):
+                yield [dict(row._mapping) for row in partition], total
+    
+    @latency.timed("export")
+    def export_sql_dump(self, connection_id: str, table_name: Optional[str] = None,
+                        progress: Optional[Callable[..., None]] = None) -> str:
         """Export SQL dump"""
         engine = self.get_connection(connection_id)
         tables = [table_name] if table_name else [t.name for t in self.get_tables(connection_id)]
         
         sql_dump = ""
+        dumped_bytes = 0
+        dumped_rows = 0
         
         for table in tables:
             columns = self.get_columns(connection_id, table)
@@ -469,10 +1074,19 @@ class DatabaseService:
                 sql_dump += f"INSERT INTO {table} ({cols}) VALUES ({', '.join(vals)});\n"
             
             sql_dump += "\n"
+            dumped_rows += len(rows)
+            
+            if progress:
+                progress(rows=len(rows), nbytes=len(sql_dump) - dumped_bytes, message=f"Exported {table}")
+                dumped_bytes = len(sql_dump)
         
+        transfer_rows.inc(dumped_rows, connection_id=connection_id, direction="export")
+        transfer_bytes.inc(len(sql_dump), connection_id=connection_id, direction="export")
         return sql_dump
     
-    def import_data(self, connection_id: str, table_name: str, format: str, data: str) -> Dict[str, Any]:
+    @latency.timed("import")
+    def import_data(self, connection_id: str, table_name: str, format: str, data: str,
+                    progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
         """Import data into a table"""
         errors = []
         imported = 0
@@ -488,6 +1102,9 @@ class DatabaseService:
             else:
                 raise ValueError(f"Unsupported format: {format}")
             
+            if progress:
+                progress(nbytes=len(data), total_rows=len(rows), total_bytes=len(data))
+            
             for i, row in enumerate(rows):
                 try:
                     # Convert empty strings to None
@@ -496,7 +1113,11 @@ class DatabaseService:
                     imported += 1
                 except Exception as e:
                     errors.append(f"Row {i + 1}: {str(e)}")
+                if progress:
+                    progress(rows=1)
             
+            transfer_rows.inc(imported, connection_id=connection_id, direction="import")
+            transfer_bytes.inc(len(data), connection_id=connection_id, direction="import")
             return {"imported": imported, "errors": errors}
         
         except Exception as e:
@@ -504,12 +1125,22 @@ class DatabaseService:
     
     def _get_primary_key_column(self, connection_id: str, table_name: str) -> str:
         """Get the primary key column name"""
-        columns = self.get_columns(connection_id, table_name)
-        for col in columns:
-            if col.primaryKey:
-                return col.name
-        return 'id'
+        pk_cols = self._get_primary_key_columns(connection_id, table_name)
+        return pk_cols[0] if pk_cols else 'id'
+
+    def _get_primary_key_columns(self, connection_id: str, table_name: str) -> List[str]:
+        """Get all primary key column names, cached until the next schema change"""
+        key = (connection_id, table_name)
+        if key in self.primary_keys:
+            cache_requests.inc(cache="primary_keys", result="hit")
+        else:
+            cache_requests.inc(cache="primary_keys", result="miss")
+            engine = self.get_connection(connection_id)
+            pk_constraint = inspect(engine).get_pk_constraint(table_name)
+            self.primary_keys[key] = pk_constraint.get('constrained_columns', []) if pk_constraint else []
+        return self.primary_keys[key]
     
+    @latency.timed("write")
     def bulk_insert(self, connection_id: str, table_name: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Bulk insert rows"""
         engine = self.get_connection(connection_id)
@@ -530,7 +1161,133 @@ class DatabaseService:
             conn.commit()
         
         return {"inserted": inserted, "errors": errors}
-    
+
+    @latency.timed("write")
+    def bulk_upsert(self, connection_id: str, table_name: str, rows: List[Dict[str, Any]],
+                    conflict_columns: Optional[List[str]] = None, update_columns: Optional[List[str]] = None,
+                    batch_size: int = 500) -> Dict[str, Any]:
+        """Bulk insert rows in batches, updating rows that conflict on the given columns"""
+        engine = self.get_connection(connection_id)
+        dialect = engine.dialect.name
+
+        if not conflict_columns:
+            conflict_columns = self._get_primary_key_columns(connection_id, table_name)
+        if not conflict_columns:
+            raise ValueError("Conflict columns are required for tables without a primary key")
+        if batch_size < 1:
+            raise ValueError("Batch size must be positive")
+
+        # Group rows by their column set; within a group the last row for a conflict key wins,
+        # since PostgreSQL refuses to update the same row twice in one statement
+        groups: Dict[Tuple[str, ...], Dict[Tuple[Any, ...], Dict[str, Any]]] = {}
+        for i, row in enumerate(rows):
+            missing = [col for col in conflict_columns if col not in row]
+            if missing:
+                raise ValueError(f"Row {i + 1}: missing conflict column(s) {', '.join(missing)}")
+            key = tuple(row[col] for col in conflict_columns)
+            groups.setdefault(tuple(row.keys()), {})[key] = row
+
+        batches = []
+        errors = []
+        inserted = 0
+        updated = 0
+
+        with engine.connect() as conn:
+            for cols, keyed_rows in groups.items():
+                group_rows = list(keyed_rows.values())
+                set_cols = [col for col in (update_columns or cols) if col in cols and col not in conflict_columns]
+                group_batch_size = min(batch_size, MAX_UPSERT_BATCH_SIZE)
+                if dialect == 'sqlite':
+                    group_batch_size = min(group_batch_size, max(1, SQLITE_MAX_VARIABLES // len(cols)))
+
+                for start in range(0, len(group_rows), group_batch_size):
+                    batch = group_rows[start:start + group_batch_size]
+                    batch_number = len(batches) + 1
+
+                    params = {}
+                    value_rows = []
+                    for i, row in enumerate(batch):
+                        placeholders = []
+                        for j, col in enumerate(cols):
+                            params[f"r{i}_{j}"] = row[col]
+                            placeholders.append(f":r{i}_{j}")
+                        value_rows.append(f"({', '.join(placeholders)})")
+                    query = f"INSERT INTO {table_name} ({', '.join(cols)}) VALUES {', '.join(value_rows)}"
+
+                    try:
+                        if dialect == 'postgresql':
+                            # xmax is zero only for freshly inserted tuples
+                            if set_cols:
+                                set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in set_cols])
+                                query += f" ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {set_clause}"
+                            else:
+                                query += f" ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING"
+                            query += " RETURNING (xmax = 0) AS inserted"
+                            flags = [row[0] for row in conn.execute(text(query), params)]
+                            batch_inserted = sum(1 for flag in flags if flag)
+                            batch_updated = len(flags) - batch_inserted
+                        else:
+                            # Count the keys that already exist so inserts and updates can be told apart
+                            existing = self._count_existing_keys(conn, table_name, conflict_columns, batch)
+
+                            if dialect == 'mysql':
+                                # MySQL resolves conflicts against every unique key; the target is implied
+                                if set_cols:
+                                    set_clause = ", ".join([f"{col} = VALUES({col})" for col in set_cols])
+                                else:
+                                    set_clause = f"{conflict_columns[0]} = {conflict_columns[0]}"
+                                query += f" ON DUPLICATE KEY UPDATE {set_clause}"
+                            else:  # SQLite
+                                if set_cols:
+                                    set_clause = ", ".join([f"{col} = excluded.{col}" for col in set_cols])
+                                    query += f" ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {set_clause}"
+                                else:
+                                    query += f" ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING"
+
+                            conn.execute(text(query), params)
+                            batch_inserted = len(batch) - existing
+                            batch_updated = existing if set_cols else 0
+
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        errors.append(f"Batch {batch_number}: {str(e)}")
+                        batches.append({"batch": batch_number, "rows": len(batch), "inserted": 0, "updated": 0})
+                        continue
+
+                    inserted += batch_inserted
+                    updated += batch_updated
+                    batches.append({
+                        "batch": batch_number,
+                        "rows": len(batch),
+                        "inserted": batch_inserted,
+                        "updated": batch_updated
+                    })
+
+        return {"inserted": inserted, "updated": updated, "batches": batches, "errors": errors}
+
+    def _count_existing_keys(self, conn, table_name: str, key_columns: List[str], rows: List[Dict[str, Any]]) -> int:
+        """Count how many of the rows' keys are already present in the table"""
+        if len(key_columns) == 1:
+            query = text(f"SELECT COUNT(*) FROM {table_name} WHERE {key_columns[0]} IN :keys").bindparams(
+                bindparam("keys", expanding=True)
+            )
+            return conn.execute(query, {"keys": [row[key_columns[0]] for row in rows]}).scalar()
+
+        # Composite keys are matched as row values; SQLite only takes a list of them as VALUES
+        params = {}
+        value_rows = []
+        for i, row in enumerate(rows):
+            placeholders = []
+            for j, col in enumerate(key_columns):
+                params[f"k{i}_{j}"] = row[col]
+                placeholders.append(f":k{i}_{j}")
+            value_rows.append(f"({', '.join(placeholders)})")
+        values = f"VALUES {', '.join(value_rows)}" if conn.dialect.name == 'sqlite' else ", ".join(value_rows)
+        query = f"SELECT COUNT(*) FROM {table_name} WHERE ({', '.join(key_columns)}) IN ({values})"
+        return conn.execute(text(query), params).scalar()
+
+    @latency.timed("write")
     def bulk_update(self, connection_id: str, table_name: str, updates: Dict[str, Any], where: Dict[str, Any]) -> int:
         """Bulk update rows matching criteria"""
         engine = self.get_connection(connection_id)
@@ -548,7 +1305,107 @@ class DatabaseService:
             result = conn.execute(text(query), params)
             conn.commit()
             return result.rowcount
-    
+
+    @latency.timed("write")
+    def bulk_changeset(self, connection_id: str, table_name: str, changes: List[Dict[str, Any]],
+                       batch_size: int = 500) -> Dict[str, Any]:
+        """Apply per-row changes ({pk, changes}) in one transaction and return the updated rows"""
+        engine = self.get_connection(connection_id)
+        dialect = engine.dialect.name
+        pk_col = self._get_primary_key_column(connection_id, table_name)
+
+        # Merge repeated edits of the same row so every statement touches a row at most once
+        merged: Dict[Any, Dict[str, Any]] = {}
+        for change in changes:
+            merged.setdefault(change["pk"], {}).update(change["changes"])
+
+        # Group rows by the columns they change so each batch shares one statement shape
+        groups: Dict[Tuple[str, ...], List[Tuple[Any, Dict[str, Any]]]] = {}
+        for pk, row_changes in merged.items():
+            if row_changes:
+                groups.setdefault(tuple(row_changes.keys()), []).append((pk, row_changes))
+
+        column_types = self._get_column_sql_types(engine, table_name) if dialect == 'postgresql' else {}
+        updated = 0
+
+        with engine.connect() as conn:
+            for cols, group in groups.items():
+                for start in range(0, len(group), batch_size):
+                    batch = group[start:start + batch_size]
+
+                    if dialect == 'postgresql':
+                        # UPDATE ... FROM (VALUES ...), casting the first row so the VALUES list is typed
+                        params = {}
+                        value_rows = []
+                        for i, (pk, row_changes) in enumerate(batch):
+                            placeholders = []
+                            for j, col in enumerate((pk_col,) + cols):
+                                name = f"p{i}_{j}"
+                                params[name] = pk if j == 0 else row_changes[col]
+                                if i == 0 and col in column_types:
+                                    placeholders.append(f"CAST(:{name} AS {column_types[col]})")
+                                else:
+                                    placeholders.append(f":{name}")
+                            value_rows.append(f"({', '.join(placeholders)})")
+
+                        set_clause = ", ".join([f"{col} = v.{col}" for col in cols])
+                        alias_cols = ", ".join(("changeset_pk",) + cols)
+                        query = (f"UPDATE {table_name} SET {set_clause} "
+                                 f"FROM (VALUES {', '.join(value_rows)}) AS v({alias_cols}) "
+                                 f"WHERE {table_name}.{pk_col} = v.changeset_pk")
+                        result = conn.execute(text(query), params)
+
+                    elif dialect == 'mysql':
+                        # One UPDATE per batch with a CASE per changed column
+                        params = {f"pk{i}": pk for i, (pk, _) in enumerate(batch)}
+                        set_parts = []
+                        for j, col in enumerate(cols):
+                            whens = []
+                            for i, (_, row_changes) in enumerate(batch):
+                                params[f"v{i}_{j}"] = row_changes[col]
+                                whens.append(f"WHEN :pk{i} THEN :v{i}_{j}")
+                            set_parts.append(f"{col} = CASE {pk_col} {' '.join(whens)} ELSE {col} END")
+                        # MySQL assigns left to right, so the key must change after the CASEs that match on it
+                        set_parts.sort(key=lambda part: part.startswith(f"{pk_col} = "))
+
+                        pk_list = ", ".join([f":pk{i}" for i in range(len(batch))])
+                        query = f"UPDATE {table_name} SET {', '.join(set_parts)} WHERE {pk_col} IN ({pk_list})"
+                        result = conn.execute(text(query), params)
+
+                    else:  # SQLite
+                        set_clause = ", ".join([f"{col} = :{col}" for col in cols])
+                        query = f"UPDATE {table_name} SET {set_clause} WHERE {pk_col} = :changeset_pk"
+                        params = [{**row_changes, "changeset_pk": pk} for pk, row_changes in batch]
+                        result = conn.execute(text(query), params)
+
+                    updated += result.rowcount
+
+            conn.commit()
+
+            # Read every updated row back in one query per batch of keys, by its new key if the change set one
+            rows = []
+            pks = [row_changes.get(pk_col, pk) for group in groups.values() for pk, row_changes in group]
+            select_query = text(f"SELECT * FROM {table_name} WHERE {pk_col} IN :pks").bindparams(
+                bindparam("pks", expanding=True)
+            )
+            for start in range(0, len(pks), batch_size):
+                result = conn.execute(select_query, {"pks": pks[start:start + batch_size]})
+                rows.extend(dict(row._mapping) for row in result)
+
+        return {"updated": updated, "rows": rows}
+
+    def _get_column_sql_types(self, engine: Engine, table_name: str) -> Dict[str, str]:
+        """Get the dialect-specific SQL type of each column"""
+        inspector = inspect(engine)
+        column_types = {}
+        for col in inspector.get_columns(table_name):
+            try:
+                column_types[col['name']] = col['type'].compile(dialect=engine.dialect)
+            except Exception:
+                pass  # Types the dialect cannot render are left uncast
+        return column_types
+
+    @latency.timed("write")
     def bulk_delete(self, connection_id: str, table_name: str, ids: List[Any]) -> int:
         """Bulk delete rows by ID"""
         engine = self.get_connection(connection_id)
@@ -564,40 +1421,105 @@ class DatabaseService:
             conn.commit()
             return deleted
     
+    @latency.timed("metadata")
     def get_table_relationships(self, connection_id: str, table_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get foreign key relationships"""
-        engine = self.get_connection(connection_id)
-        inspector = inspect(engine)
-        relationships = []
-        
-        tables = [table_name] if table_name else inspector.get_table_names()
-        
-        for tbl in tables:
-            fks = inspector.get_foreign_keys(tbl)
-            for fk in fks:
-                relationships.append({
-                    "fromTable": tbl,
-                    "fromColumn": ", ".join(fk["constrained_columns"]),
-                    "toTable": fk["referred_table"],
-                    "toColumn": ", ".join(fk["referred_columns"]),
-                    "onDelete": fk.get("ondelete"),
-                    "onUpdate": fk.get("onupdate")
-                })
-        
+        relationships = self.get_schema_snapshot(connection_id)["relationships"]
+        if table_name:
+            return [rel for rel in relationships if rel["fromTable"] == table_name]
         return relationships
     
-    def create_index(self, connection_id: str, table_name: str, index_name: str, columns: List[str], unique: bool = False) -> None:
-        """Create an index"""
+    @latency.timed("ddl")
+    def create_index(self, connection_id: str, table_name: str, index_name: str, columns: List[str], unique: bool = False,
+                     online: bool = False, progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """Create an index, optionally without blocking writes to the table.
+
+        Online builds use CREATE INDEX CONCURRENTLY on PostgreSQL and
+        ALGORITHM=INPLACE, LOCK=NONE on MySQL; SQLite has no online build and
+        runs a plain CREATE INDEX. With `progress`, the build is polled from a
+        second connection while it runs. A concurrent build that fails leaves
+        an invalid index behind, which is dropped.
+        """
         engine = self.get_connection(connection_id)
+        dialect = engine.dialect.name
+        online = online and dialect in ('postgresql', 'mysql')
         
         unique_clause = "UNIQUE " if unique else ""
         cols = ", ".join(columns)
-        query = f"CREATE {unique_clause}INDEX {index_name} ON {table_name} ({cols})"
+        if online and dialect == 'postgresql':
+            query = f"CREATE {unique_clause}INDEX CONCURRENTLY {index_name} ON {table_name} ({cols})"
+            # An invalid index left by an earlier failed build would block the name
+            self._drop_invalid_indexes(engine, names=[index_name])
+        elif online:
+            query = f"ALTER TABLE {table_name} ADD {unique_clause}INDEX {index_name} ({cols}), ALGORITHM=INPLACE, LOCK=NONE"
+        else:
+            query = f"CREATE {unique_clause}INDEX {index_name} ON {table_name} ({cols})"
         
+        started = time.perf_counter()
+        watcher = None
         with engine.connect() as conn:
-            conn.execute(text(query))
-            conn.commit()
+            if online and dialect == 'postgresql':
+                # CONCURRENTLY cannot run inside a transaction block
+                conn.execution_options(isolation_level="AUTOCOMMIT")
+            if progress:
+                progress(message=f"Building {index_name}" + (" online" if online else ""))
+                if dialect != 'sqlite':
+                    backend_id = conn.execute(text(
+                        "SELECT pg_backend_pid()" if dialect == 'postgresql' else "SELECT CONNECTION_ID()")).scalar()
+                    watcher = IndexBuildWatcher(engine, backend_id, progress)
+                    watcher.start()
+            try:
+                conn.execute(text(query))
+                conn.commit()
+            except Exception:
+                if online and dialect == 'postgresql':
+                    self._drop_invalid_indexes(engine, names=[index_name])
+                if watcher and watcher.cancelled:
+                    progress()  # Raises JobCancelled, which the failed statement was
+                raise
+            finally:
+                if watcher:
+                    watcher.stop()
+        
+        self._invalidate_schema_cache(connection_id)
+        return {
+            "indexName": index_name,
+            "tableName": table_name,
+            "method": ("concurrent" if dialect == 'postgresql' else "inplace") if online else "blocking",
+            "durationMs": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    def _drop_invalid_indexes(self, engine: Engine, table_name: Optional[str] = None,
+                              names: Optional[List[str]] = None) -> List[str]:
+        """Drop PostgreSQL indexes marked invalid that no build is still working on"""
+        if engine.dialect.name != 'postgresql':
+            return []
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT")
+            invalid = conn.execute(text(
+                "SELECT c.relname FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE NOT i.indisvalid AND n.nspname = current_schema() "
+                "AND (CAST(:table AS text) IS NULL OR i.indrelid = to_regclass(CAST(:table AS text))) "
+                "AND i.indexrelid NOT IN (SELECT index_relid FROM pg_stat_progress_create_index "
+                "WHERE index_relid IS NOT NULL)"
+            ), {"table": table_name}).scalars().all()
+            if names is not None:
+                invalid = [name for name in invalid if name in names]
+            for name in invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        return invalid
     
+    @latency.timed("ddl")
+    def drop_invalid_indexes(self, connection_id: str, table_name: Optional[str] = None) -> List[str]:
+        """Drop invalid indexes left by failed concurrent builds; returns their names"""
+        dropped = self._drop_invalid_indexes(self.get_connection(connection_id), table_name)
+        if dropped:
+            self._invalidate_schema_cache(connection_id)
+        return dropped
+    
+    @latency.timed("ddl")
     def drop_index(self, connection_id: str, index_name: str, table_name: Optional[str] = None) -> None:
         """Drop an index"""
         engine = self.get_connection(connection_id)
@@ -614,45 +1536,45 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
-    def get_index_suggestions(self, connection_id: str, table_name: str) -> List[Dict[str, Any]]:
-        """Analyze table and suggest indexes"""
+    @latency.timed("metadata")
+    def get_index_suggestions(self, connection_id: str, table_name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Suggest indexes from the recorded workload, plus any unindexed foreign keys"""
         engine = self.get_connection(connection_id)
         inspector = inspect(engine)
-        suggestions = []
-        
-        # Get foreign key columns
-        fks = inspector.get_foreign_keys(table_name)
-        existing_indexes = inspector.get_indexes(table_name)
-        indexed_cols = set()
-        for idx in existing_indexes:
-            indexed_cols.update(idx["column_names"])
-        
-        # Suggest indexes for foreign key columns
-        for fk in fks:
-            for col in fk["constrained_columns"]:
-                if col not in indexed_cols:
-                    suggestions.append({
-                        "table": table_name,
-                        "columns": [col],
-                        "reason": f"Foreign key column '{col}' is not indexed",
-                        "impact": "high"
-                    })
         
-        # Check for frequently queried columns (basic heuristic)
-        columns = inspector.get_columns(table_name)
-        for col in columns:
-            col_name = col["name"]
-            if col_name not in indexed_cols and col["type"].__class__.__name__ in ["VARCHAR", "INTEGER"]:
+        columns = [col["name"] for col in inspector.get_columns(table_name)]
+        existing = [idx["column_names"] for idx in inspector.get_indexes(table_name)]
+        primary_key = self._get_primary_key_columns(connection_id, table_name)
+        if primary_key:
+            existing.append(primary_key)
+        
+        # Column statistics from a previous analyze_table order composite keys by selectivity
+        column_stats = self.table_statistics.get((connection_id, table_name), {}).get("columnStats", {})
+        distinct = {name: stats.get("distinctEstimate", 0) for name, stats in column_stats.items()}
+        
+        suggestions = index_advisor.suggest(engine, connection_id, table_name, columns, existing, distinct, limit)
+        
+        # Suggest indexes for foreign key columns the workload has not covered
+        suggested = [suggestion["columns"] for suggestion in suggestions]
+        for fk in inspector.get_foreign_keys(table_name):
+            fk_columns = fk["constrained_columns"]
+            covered = existing + suggested
+            if len(suggestions) < limit and not any(index[:len(fk_columns)] == fk_columns for index in covered):
                 suggestions.append({
                     "table": table_name,
-                    "columns": [col_name],
-                    "reason": f"Column '{col_name}' may benefit from an index",
-                    "impact": "medium"
+                    "columns": fk_columns,
+                    "reason": f"Foreign key column(s) {', '.join(fk_columns)} are not indexed",
+                    "impact": "medium",
+                    "ddl": f"CREATE INDEX {index_advisor.index_name(table_name, tuple(fk_columns))} "
+                           f"ON {table_name} ({', '.join(fk_columns)})"
                 })
+                suggested.append(fk_columns)
         
-        return suggestions[:5]  # Return top 5 suggestions
+        return suggestions
     
+    @latency.timed("ddl")
     def add_constraint(self, connection_id: str, table_name: str, constraint_type: str, 
                       constraint_name: str, columns: List[str], **kwargs) -> None:
         """Add a constraint to a table"""
@@ -684,7 +1606,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("ddl")
     def drop_constraint(self, connection_id: str, table_name: str, constraint_name: str) -> None:
         """Drop a constraint"""
         engine = self.get_connection(connection_id)
@@ -694,7 +1618,9 @@ class DatabaseService:
         with engine.connect() as conn:
             conn.execute(text(query))
             conn.commit()
+        self._invalidate_schema_cache(connection_id)
     
+    @latency.timed("metadata")
     def get_table_constraints(self, connection_id: str, table_name: str) -> List[Dict[str, Any]]:
         """Get all constraints for a table"""
         engine = self.get_connection(connection_id)
@@ -735,15 +1661,28 @@ class DatabaseService:
         
         return constraints
     
-    def analyze_table(self, connection_id: str, table_name: str) -> Dict[str, Any]:
-        """Analyze table and provide statistics"""
+    @latency.timed("analyze")
+    def analyze_table(self, connection_id: str, table_name: str,
+                      progress: Optional[Callable[..., None]] = None,
+                      sample_size: int = 10000, refresh: bool = False) -> Dict[str, Any]:
+        """Analyze table and provide statistics, with per-column statistics from a row sample"""
+        key = (connection_id, table_name)
+        if not refresh and key in self.table_statistics:
+            return self.table_statistics[key]
+        
         engine = self.get_connection(connection_id)
         inspector = inspect(engine)
         
-        # Get row count
         with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            row_count = result.scalar()
+            row_count, estimated = self._estimate_row_count(conn, engine.dialect.name, table_name)
+            if progress:
+                progress(total_rows=row_count, message="Sampling rows")
+            
+            sample, method = self._sample_rows(conn, engine.dialect.name, connection_id, table_name,
+                                               row_count, sample_size)
+        
+        if progress:
+            progress(rows=len(sample), message="Computing column statistics")
         
         # Get columns
         columns = inspector.get_columns(table_name)
@@ -754,17 +1693,137 @@ class DatabaseService:
         # Get foreign keys
         foreign_keys = inspector.get_foreign_keys(table_name)
         
-        return {
+        frame = pd.DataFrame(sample, columns=[col["name"] for col in columns])
+        # A sample that covers the whole table gives exact statistics
+        population = len(frame) if method == "full" else max(row_count, len(frame))
+        
+        analysis = {
             "tableName": table_name,
             "rowCount": row_count,
+            "rowCountEstimated": estimated,
             "columnCount": len(columns),
             "indexCount": len(indexes),
             "foreignKeyCount": len(foreign_keys),
             "columns": [{"name": col["name"], "type": str(col["type"])} for col in columns],
-            "indexes": [{"name": idx["name"], "columns": idx["column_names"], "unique": idx["unique"]} for idx in indexes]
+            "indexes": [{"name": idx["name"], "columns": idx["column_names"], "unique": idx["unique"]} for idx in indexes],
+            "sample": {"rows": len(frame), "method": method},
+            "columnStats": {name: self._column_statistics(frame[name], population) for name in frame.columns},
+            "analyzedAt": datetime.utcnow().isoformat()
         }
+        self.table_statistics[key] = analysis
+        return analysis
     
-    def explain_query(self, connection_id: str, query: str, analyze: bool = False) -> Dict[str, Any]:
+    def _estimate_row_count(self, conn, dialect: str, table_name: str) -> Tuple[int, bool]:
+        """Row count from planner statistics where available, else COUNT(*); returns (count, estimated)"""
+        estimate = None
+        if dialect == 'postgresql':
+            estimate = conn.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+                {"table": table_name}
+            ).scalar()
+        elif dialect == 'mysql':
+            estimate = conn.execute(
+                text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                     "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"),
+                {"table": table_name}
+            ).scalar()
+        
+        # reltuples is -1 for tables that were never vacuumed or analyzed
+        if estimate is not None and estimate >= 0:
+            return int(estimate), True
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar(), False
+    
+    def _sample_rows(self, conn, dialect: str, connection_id: str, table_name: str,
+                     row_count: int, sample_size: int) -> Tuple[List[Tuple], str]:
+        """Read about sample_size random rows; returns (rows, sampling method)"""
+        if row_count <= sample_size:
+            return [tuple(row) for row in conn.execute(text(f"SELECT * FROM {table_name}"))], "full"
+        
+        if dialect == 'postgresql':
+            # Block sampling reads only the sampled pages; oversample a little and trim
+            percent = min(100.0, sample_size * 120.0 / row_count)
+            result = conn.execute(text(
+                f"SELECT * FROM {table_name} TABLESAMPLE SYSTEM ({percent:.6f}) LIMIT {sample_size}"
+            ))
+            return [tuple(row) for row in result], "tablesample"
+        
+        # Probe random keys of an integer rowid/primary key
+        if dialect == 'sqlite':
+            key_column = 'rowid'
+        else:
+            pk_cols = self._get_primary_key_columns(connection_id, table_name)
+            key_column = pk_cols[0] if len(pk_cols) == 1 else None
+        
+        if key_column:
+            try:
+                low, high = conn.execute(text(f"SELECT MIN({key_column}), MAX({key_column}) FROM {table_name}")).one()
+                if isinstance(low, int) and isinstance(high, int):
+                    span = high - low + 1
+                    # Oversample to make up for gaps left by deleted rows
+                    keys = random.sample(range(low, high + 1), min(span, int(sample_size * span / row_count * 1.2) + 1))
+                    query = text(f"SELECT * FROM {table_name} WHERE {key_column} IN :keys").bindparams(
+                        bindparam("keys", expanding=True))
+                    rows = []
+                    for start in range(0, len(keys), 500):
+                        rows.extend(tuple(row) for row in conn.execute(query, {"keys": keys[start:start + 500]}))
+                    return rows[:sample_size], "random_keys"
+            except Exception:
+                conn.rollback()  # e.g. a WITHOUT ROWID table; fall through
+        
+        random_fn = 'RAND()' if dialect == 'mysql' else 'random()'
+        result = conn.execute(text(f"SELECT * FROM {table_name} ORDER BY {random_fn} LIMIT {sample_size}"))
+        return [tuple(row) for row in result], "random_order"
+    
+    def _column_statistics(self, series: pd.Series, population: int, mcv_count: int = 10,
+                           histogram_buckets: int = 10) -> Dict[str, Any]:
+        """Null fraction, distinct estimate, min/max, most common values and an equi-depth histogram"""
+        sample_rows = len(series)
+        if sample_rows == 0:
+            return {"nullFraction": 0.0, "distinctEstimate": 0}
+        
+        # Unhashable driver values (JSON, arrays) are compared by their text form
+        if series.dtype == object:
+            series = series.map(lambda v: v if v is None or isinstance(v, (str, bytes, int, float, bool, Decimal, datetime, date, time_type)) else str(v))
+        values = series.dropna()
+        stats: Dict[str, Any] = {"nullFraction": round(1 - len(values) / sample_rows, 4)}
+        if values.empty:
+            stats["distinctEstimate"] = 0
+            return stats
+        
+        counts = values.value_counts()
+        distinct = len(counts)
+        if population > sample_rows:
+            # Duj1 estimator (Haas & Stokes), as used by PostgreSQL's ANALYZE
+            singletons = int((counts == 1).sum())
+            n = len(values)
+            denominator = n - singletons + singletons * n / population
+            if singletons < n and denominator > 0:
+                distinct = min(int(round(n * distinct / denominator)), population)
+            else:
+                distinct = population  # Every sampled value is unique; assume a unique column
+        stats["distinctEstimate"] = distinct
+        
+        common = counts[counts > 1].head(mcv_count)
+        stats["mostCommonValues"] = [
+            {"value": _to_python(value), "frequency": round(count / sample_rows, 4)}
+            for value, count in common.items()
+        ]
+        
+        try:
+            ordered = values.sort_values().to_numpy()
+        except TypeError:
+            return stats  # Mixed types cannot be ordered
+        stats["min"] = _to_python(ordered[0])
+        stats["max"] = _to_python(ordered[-1])
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            stats["mean"] = _to_python(values.mean())
+        positions = np.linspace(0, len(ordered) - 1, histogram_buckets + 1).round().astype(int)
+        stats["histogramBounds"] = [_to_python(ordered[i]) for i in positions]
+        return stats
+    
+    @latency.timed("query")
+    def explain_query(self, connection_id: str, query: str, analyze: bool = False,
+                      timeout_ms: Optional[int] = None, request_id: Optional[str] = None) -> Dict[str, Any]:
         """Explain/analyze a query to show execution plan"""
         from storage import storage
         engine = self.get_connection(connection_id)
@@ -773,7 +1832,7 @@ class DatabaseService:
         start_time = time.time()
         warnings = []
         
-        with engine.connect() as conn:
+        with engine.connect() as conn, self._statement_guard(conn, connection_id, timeout_ms, request_id):
             if connection_config.type == 'postgresql':
                 explain_cmd = f"EXPLAIN (FORMAT JSON, ANALYZE {str(analyze).upper()}) {query}"
                 try:
@@ -789,7 +1848,12 @@ class DatabaseService:
                         plan = str(plan_data)
                         
                 except Exception as e:
+                    # A timed-out or cancelled ANALYZE must not fall back to another run
+                    if getattr(getattr(e, 'orig', None), 'pgcode', None) == '57014':
+                        raise
+                    
                     # Fallback to simple EXPLAIN
+                    conn.rollback()
                     result = conn.execute(text(f"EXPLAIN {query}"))
                     rows = result.fetchall()
                     plan_text = "\n".join([row[0] for row in rows])
@@ -851,9 +1915,11 @@ class DatabaseService:
             
         return result
     
+    @latency.timed("export")
     def create_backup(self, connection_id: str, tables: Optional[List[str]] = None, 
                      format: str = "sql", include_schema: bool = True, 
-                     include_data: bool = True) -> Tuple[str, int]:
+                     include_data: bool = True,
+                     progress: Optional[Callable[..., None]] = None) -> Tuple[str, int]:
         """Create a database backup"""
         from storage import storage
         engine = self.get_connection(connection_id)
@@ -913,6 +1979,9 @@ class DatabaseService:
                             
                             insert_stmt = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(values)});\n"
                             backup_data.append(insert_stmt)
+                        
+                        if progress:
+                            progress(rows=len(rows), message=f"Backed up {table_name}")
             
             backup_content = ''.join(backup_data)
             
@@ -939,12 +2008,20 @@ class DatabaseService:
                         } if include_schema else None,
                         "data": table_data if include_data else []
                     }
+                    
+                    if progress:
+                        progress(rows=len(table_data), message=f"Backed up {table_name}")
             
             backup_content = json.dumps(backup_obj, indent=2)
         
+        if progress:
+            progress(nbytes=len(backup_content))
+        
         return backup_content, len(backup_content)
     
-    def restore_backup(self, connection_id: str, backup_content: str, format: str = "sql") -> Dict[str, Any]:
+    @latency.timed("import")
+    def restore_backup(self, connection_id: str, backup_content: str, format: str = "sql",
+                       progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
         """Restore from a backup"""
         engine = self.get_connection(connection_id)
         
@@ -954,6 +2031,9 @@ class DatabaseService:
             executed = 0
             errors = []
             
+            if progress:
+                progress(total_rows=len(statements), total_bytes=len(backup_content))
+            
             with engine.connect() as conn:
                 for stmt in statements:
                     try:
@@ -962,13 +2042,20 @@ class DatabaseService:
                         executed += 1
                     except Exception as e:
                         errors.append(f"Error executing: {stmt[:50]}... - {str(e)}")
+                    if progress:
+                        progress(rows=1, nbytes=len(stmt) + 1)
             
+            self._invalidate_schema_cache(connection_id)
             return {"executed": executed, "errors": errors}
             
         else:  # JSON format
             backup_data = json.loads(backup_content)
             errors = []
             
+            if progress:
+                total_rows = sum(len(table_data.get("data") or []) for table_data in backup_data.values())
+                progress(nbytes=len(backup_content), total_rows=total_rows, total_bytes=len(backup_content))
+            
             with engine.connect() as conn:
                 for table_name, table_data in backup_data.items():
                     if table_data.get("data"):
@@ -984,108 +2071,198 @@ class DatabaseService:
                                 conn.commit()
                             except Exception as e:
                                 errors.append(f"Error inserting into {table_name}: {str(e)}")
+                            if progress:
+                                progress(rows=1)
             
             return {"restored": len(backup_data), "errors": errors}
     
+    @latency.timed("analyze")
     def validate_data(self, connection_id: str, table_name: str, 
-                      validation_rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Validate data against rules"""
+                      validation_rules: List[Dict[str, Any]],
+                      progress: Optional[Callable[..., None]] = None,
+                      incremental: bool = False, reconcile: bool = False) -> List[Dict[str, Any]]:
+        """Validate data against rules in a single scan of the table.
+        
+        With `incremental`, each rule only checks rows past its stored
+        watermark and merges the violations into its stored totals; rules
+        without a watermark column, or due for reconciliation, get a full pass.
+        """
         engine = self.get_connection(connection_id)
-        results = []
+        if not incremental and not reconcile:
+            plan = ValidationPlan(engine.dialect.name, table_name, validation_rules)
+            with engine.connect() as conn:
+                return plan.run(conn, progress)
+        
+        from storage import storage
         
+        primary_key = self._get_primary_key_columns(connection_id, table_name)
+        default_column = primary_key[0] if len(primary_key) == 1 else None
+        
+        # Rules sharing a watermark column and position are checked in one plan
+        groups: Dict[Tuple[Optional[str], bool, Any], List[int]] = {}
+        states = []
+        for i, rule in enumerate(validation_rules):
+            state = storage.get_validation_state(rule["id"])
+            column = rule.get("watermarkColumn") or default_column
+            full = (reconcile or state is None or column is None or state.watermarkColumn != column
+                    or (rule.get("reconcileEvery") is not None and state.incrementalRuns >= rule["reconcileEvery"]))
+            states.append((state, column, full))
+            groups.setdefault((column, full, None if full else state.watermark), []).append(i)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(validation_rules)
+        now = datetime.utcnow().isoformat()
         with engine.connect() as conn:
-            for rule in validation_rules:
-                column_name = rule["columnName"]
-                rule_type = rule["ruleType"]
-                
-                violations = []
-                violation_count = 0
+            high_watermarks: Dict[str, Any] = {}
+            for (column, full, low), indexes in groups.items():
+                where, params = None, {}
+                if column is not None:
+                    # Fix the upper bound first so rows inserted during the run wait for the next one
+                    if column not in high_watermarks:
+                        high_watermarks[column] = conn.execute(text(f"SELECT MAX({column}) FROM {table_name}")).scalar()
+                    high = high_watermarks[column]
+                    if high is None:
+                        where = "1 = 0"
+                    elif full or low is None:
+                        where, params = f"{column} <= :wm_high", {"wm_high": high}
+                    else:
+                        where, params = f"{column} > :wm_low AND {column} <= :wm_high", {"wm_low": low, "wm_high": high}
                 
-                if rule_type == "required":
-                    # Check for NULL values
-                    result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name} WHERE {column_name} IS NULL"))
-                    violation_count = result.scalar()
+                plan = ValidationPlan(engine.dialect.name, table_name, [validation_rules[i] for i in indexes],
+                                      where, params, incremental=not full)
+                for i, result in zip(indexes, plan.run(conn, progress)):
+                    state, _, _ = states[i]
+                    high = high_watermarks.get(column)
+                    watermark = high if isinstance(high, (int, float)) or high is None else str(high)
+                    if full or state is None:
+                        state = ValidationState(validationId=validation_rules[i]["id"], connectionId=connection_id,
+                                                lastFullRun=now)
+                        total, sample = result["violationCount"], result["sampleViolations"]
+                    else:
+                        total = state.violationCount + result["violationCount"]
+                        sample = (result["sampleViolations"] + state.sampleViolations)[:SAMPLE_LIMIT]
+                        state.incrementalRuns += 1
+                    state.watermarkColumn = column
+                    # With no rows yet, keep the old position rather than restarting from the beginning
+                    state.watermark = watermark if watermark is not None else state.watermark
+                    state.violationCount = total
+                    state.sampleViolations = sample
+                    state.lastRun = now
+                    storage.save_validation_state(state)
                     
-                    if violation_count > 0:
-                        result = conn.execute(text(f"SELECT * FROM {table_name} WHERE {column_name} IS NULL LIMIT 5"))
-                        violations = [dict(zip(result.keys(), row)) for row in result.fetchall()]
-                
-                elif rule_type == "unique":
-                    # Check for duplicate values
-                    result = conn.execute(text(f"""
-                        SELECT {column_name}, COUNT(*) as count 
-                        FROM {table_name} 
-                        GROUP BY {column_name} 
-                        HAVING COUNT(*) > 1
-                    """))
-                    duplicates = result.fetchall()
-                    violation_count = len(duplicates)
-                    violations = [{"value": row[0], "count": row[1]} for row in duplicates[:5]]
-                
-                elif rule_type == "range":
-                    # Check for values outside range
-                    rule_value = rule.get("ruleValue", "")
-                    if rule_value:
-                        min_val, max_val = rule_value.split(",")
-                        result = conn.execute(text(f"""
-                            SELECT COUNT(*) FROM {table_name} 
-                            WHERE {column_name} < {min_val} OR {column_name} > {max_val}
-                        """))
-                        violation_count = result.scalar()
-                
-                elif rule_type == "custom":
-                    # Custom SQL expression
-                    custom_expr = rule.get("customExpression", "")
-                    if custom_expr:
-                        result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name} WHERE NOT ({custom_expr})"))
-                        violation_count = result.scalar()
-                
-                results.append({
-                    "tableName": table_name,
-                    "columnName": column_name,
-                    "rule": rule_type,
-                    "violationCount": violation_count,
-                    "sampleViolations": violations
-                })
-        
+                    results[i] = {
+                        **result,
+                        "violationCount": total,
+                        "sampleViolations": sample,
+                        "newViolations": result["violationCount"],
+                        "mode": "full" if full else "incremental",
+                        "watermarkColumn": column,
+                        "watermark": state.watermark
+                    }
         return results
     
-    def get_performance_stats(self, connection_id: str) -> Dict[str, Any]:
+    @latency.timed("write")
+    def copy_table(self, connection_id: str, table_name: str, target_connection_id: str,
+                   target_table: Optional[str] = None, if_exists: str = "fail", readers: int = READERS,
+                   batch_size: int = BATCH_SIZE, checkpoint: Optional[Dict[str, Any]] = None,
+                   progress: Optional[Callable[..., None]] = None,
+                   save_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Stream a table into another connection, creating it there with mapped types"""
+        target_table = target_table or table_name
+        if target_connection_id == connection_id and target_table == table_name:
+            raise ValueError("Choose a different target table or connection")
+        if batch_size < 1:
+            raise ValueError("Batch size must be positive")
+        source_engine = self.get_connection(connection_id)
+        target_engine = self.get_connection(target_connection_id)
+        
+        with source_engine.connect() as conn:
+            total_rows, _ = self._estimate_row_count(conn, source_engine.dialect.name, table_name)
+        copy = TableCopy(source_engine, table_name, target_engine, target_table, readers=readers,
+                         batch_size=batch_size, progress=progress, save_checkpoint=save_checkpoint)
+        result = copy.run(if_exists=if_exists, checkpoint=checkpoint, total_rows=total_rows)
+        self._invalidate_schema_cache(target_connection_id)
+        return result
+    
+    @latency.timed("analyze")
+    def compare_table_data(self, connection_id: str, table_name: str, target_connection_id: Optional[str] = None,
+                           target_table: Optional[str] = None, columns: Optional[List[str]] = None,
+                           leaf_size: int = LEAF_SIZE, max_differences: int = MAX_DIFFERENCES,
+                           progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """Find the rows that differ between a table and its copy, which may be on another connection"""
+        target_connection_id = target_connection_id or connection_id
+        target_table = target_table or table_name
+        if target_connection_id == connection_id and target_table == table_name:
+            raise ValueError("Choose a different target table or connection")
+        if leaf_size < 1 or max_differences < 1:
+            raise ValueError("leafSize and maxDifferences must be at least 1")
+        source_engine = self.get_connection(connection_id)
+        target_engine = self.get_connection(target_connection_id)
+        
+        source_meta = self._snapshot_table(connection_id, table_name)
+        target_meta = self._snapshot_table(target_connection_id, target_table)
+        if source_meta is None or target_meta is None:
+            raise ValueError(f"Table {table_name if source_meta is None else target_table} not found")
+        key_columns = source_meta["primaryKey"]
+        if not key_columns:
+            raise ValueError(f"{table_name} has no primary key to split into ranges")
+        
+        source_names = [column["name"] for column in source_meta["columns"]]
+        target_names = [column["name"] for column in target_meta["columns"]]
+        shared = {name.lower() for name in target_names}
+        if any(key.lower() not in shared for key in key_columns):
+            raise ValueError(f"{target_table} is missing primary key column(s) of {table_name}")
+        if columns:
+            unknown = [column for column in columns if column not in source_names or column.lower() not in shared]
+            if unknown:
+                raise ValueError(f"Column(s) not in both tables: {', '.join(unknown)}")
+            compared = key_columns + [column for column in columns if column not in key_columns]
+        else:
+            compared = [name for name in source_names if name.lower() in shared]
+        source_lower = {name.lower() for name in source_names}
+        
+        key_type = next(column["type"] for column in source_meta["columns"] if column["name"] == key_columns[0])
+        # First word of the base type, so MySQL's "INT UNSIGNED" counts and INTERVAL or POINT do not
+        base_type = normalize_type(key_type).partition("(")[0].split()
+        integer_key = len(key_columns) == 1 and bool(base_type) and normalize_type(base_type[0]) in INTEGER_TYPES
+        with source_engine.connect() as source_conn, target_engine.connect() as target_conn:
+            result = DataCompare(
+                (source_conn, source_engine.dialect.name, table_name),
+                (target_conn, target_engine.dialect.name, target_table),
+                key_columns, compared, integer_key,
+                leaf_size=leaf_size, max_differences=max_differences, progress=progress
+            ).run()
+        
+        result["columns"] = compared
+        result["ignoredColumns"] = {
+            "source": [name for name in source_names if name.lower() not in shared],
+            "target": [name for name in target_names if name.lower() not in source_lower]
+        }
+        return result
+    
+    def get_performance_stats(self, connection_id: str, window: str = "1h") -> Dict[str, Any]:
         """Get performance statistics for a connection"""
-        from storage import storage
-        
-        # Get recent query history
-        history = storage.get_query_history(connection_id, limit=100)
-        
-        if not history:
-            return {
-                "totalQueries": 0,
-                "slowQueries": 0,
-                "avgExecutionTime": 0,
-                "p95ExecutionTime": 0,
-                "errorRate": 0
-            }
-        
-        execution_times = [h.executionTime for h in history if h.success]
-        error_count = sum(1 for h in history if not h.success)
-        slow_threshold = 1.0  # 1 second
-        slow_queries = sum(1 for t in execution_times if t > slow_threshold)
-        
-        # Calculate percentiles
-        sorted_times = sorted(execution_times)
-        p95_index = int(len(sorted_times) * 0.95) if sorted_times else 0
-        p95_time = sorted_times[p95_index] if sorted_times else 0
-        
-        avg_time = sum(execution_times) / len(execution_times) if execution_times else 0
+        queries = latency.window(connection_id, "query", window)
+        slow_threshold = slow_log.threshold(connection_id)
         
         return {
-            "totalQueries": len(history),
-            "slowQueries": slow_queries,
-            "avgExecutionTime": round(avg_time, 3),
-            "p95ExecutionTime": round(p95_time, 3),
-            "errorRate": round(error_count / len(history), 3) if history else 0
+            "totalQueries": queries.count,
+            "slowQueries": queries.count_above(slow_threshold),
+            "avgExecutionTime": round(queries.total / queries.count, 3) if queries.count else 0,
+            "p95ExecutionTime": round(queries.quantile(0.95), 3),
+            "errorRate": round(queries.errors / queries.count, 3) if queries.count else 0,
+            "window": window,
+            "latency": latency.summary(connection_id)
         }
 
 
+def _to_python(value: Any) -> Any:
+    """Convert numpy/pandas scalars to plain Python values for JSON responses"""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
 # Global database service instance
 db_service = DatabaseService()
@@ -0,0 +1,474 @@
+from typing import Dict, Optional, List, Any, Tuple, Set
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from query_stats import fingerprint, normalize_query, statement_stats
+from slow_log import EXPLAINABLE
+from storage import storage, QUERY_HISTORY_LIMIT
+import json
+import math
+import re
+
+
+_IDENT = r'[`"\[]?(\w+)[`"\]]?'
+_COLUMN = r'(?:[`"\[]?(\w+)[`"\]]?\.)?' + _IDENT
+_CLAUSE_END = r"(?=\bwhere\b|\bjoin\b|\binner\b|\bleft\b|\bright\b|\bfull\b|\bcross\b|\bnatural\b|\bgroup\b|\border\b|\blimit\b|\bhaving\b|\bunion\b|\bset\b|\)|$)"
+_FROM = re.compile(r"\b(?:from|update|into)\s+(.+?)" + _CLAUSE_END)
+_JOIN = re.compile(r"\bjoin\s+(?:\w+\.)?" + _IDENT + r"(?:\s+(?:as\s+)?(\w+))?")
+_JOIN_CONDITION = re.compile(_COLUMN + r"\s*=\s*" + _COLUMN + r"(?!\s*\()")
+_PREDICATE = re.compile(_COLUMN + r"\s*(<=|>=|<>|!=|=|<|>|\bnot\s+in\b|\bin\b|\bnot\s+like\b|\blike\b|\bbetween\b|\bis\s+not\b|\bis\b)")
+_SET_CLAUSE = re.compile(r"\bset\b.*?(?=\bwhere\b|$)")
+_ORDER_BY = re.compile(r"\border by\s+(.+?)(?=\blimit\b|\boffset\b|\bfor\b|\)|$)")
+_ORDER_ITEM = re.compile(r"^\s*" + _COLUMN + r"(?:\s+(?:asc|desc))?(?:\s+nulls\s+(?:first|last))?\s*$")
+
+_KEYWORDS = {
+    "where", "join", "inner", "left", "right", "full", "outer", "cross", "natural", "on", "using", "group",
+    "order", "limit", "having", "union", "set", "and", "or", "not", "select", "from", "as", "values", "is",
+    "null", "in", "like", "between", "exists", "case", "when", "then", "else", "end", "offset", "lateral"
+}
+_EQUALITY = {"=", "in", "is"}
+_RANGE = {"<", ">", "<=", ">=", "between", "like"}
+
+
+class QueryShape:
+    """Columns a statement filters, joins and sorts on, per table"""
+
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}  # Alias or table name -> table name
+        self.equality: Dict[str, List[str]] = {}
+        self.ranges: Dict[str, List[str]] = {}
+        self.joins: Dict[str, List[str]] = {}
+        self.order: Dict[str, List[str]] = {}
+
+    def tables(self) -> Set[str]:
+        return set(self.aliases.values())
+
+
+def parse_query(query: str) -> QueryShape:
+    """Extract WHERE, JOIN and ORDER BY column usage from a statement.
+
+    This is a pattern-based reading of the normalized statement, not a full
+    SQL parser; subqueries are folded into the outer statement, which is
+    good enough to find the columns worth indexing.
+    """
+    sql = normalize_query(query)
+    shape = QueryShape()
+    # Assignments in an UPDATE are not filters
+    predicates = _SET_CLAUSE.sub(" ", sql)
+
+    for match in _FROM.finditer(sql):
+        for item in match.group(1).split(","):
+            words = item.replace(" as ", " ").split()
+            if not words or words[0] in _KEYWORDS or words[0].startswith("("):
+                continue
+            table = words[0].split(".")[-1].strip('`"[]')
+            shape.aliases[table] = table
+            if len(words) > 1 and words[1] not in _KEYWORDS:
+                shape.aliases[words[1]] = table
+    for match in _JOIN.finditer(sql):
+        table, alias = match.group(1), match.group(2)
+        shape.aliases[table] = table
+        if alias and alias not in _KEYWORDS:
+            shape.aliases[alias] = table
+
+    def resolve(qualifier: Optional[str], column: str) -> Optional[Tuple[str, str]]:
+        if column in _KEYWORDS or column == "?":
+            return None
+        if qualifier:
+            table = shape.aliases.get(qualifier)
+            return (table, column) if table else None
+        tables = shape.tables()
+        # Unqualified columns are attributed to every table in the statement;
+        # callers discard the ones that do not exist on their table
+        return ("*", column) if len(tables) != 1 else (next(iter(tables)), column)
+
+    def add(target: Dict[str, List[str]], ref: Optional[Tuple[str, str]]) -> None:
+        if ref and ref[1] not in target.setdefault(ref[0], []):
+            target[ref[0]].append(ref[1])
+
+    join_spans = []
+    for match in _JOIN_CONDITION.finditer(predicates):
+        add(shape.joins, resolve(match.group(1), match.group(2)))
+        add(shape.joins, resolve(match.group(3), match.group(4)))
+        join_spans.append(match.span())
+
+    for match in _PREDICATE.finditer(predicates):
+        if any(start <= match.start() < end for start, end in join_spans):
+            continue
+        operator = " ".join(match.group(3).split())
+        ref = resolve(match.group(1), match.group(2))
+        if operator in _EQUALITY:
+            add(shape.equality, ref)
+        elif operator in _RANGE:
+            add(shape.ranges, ref)
+
+    order_by = _ORDER_BY.search(sql)
+    if order_by:
+        refs = [_ORDER_ITEM.match(item) for item in order_by.group(1).split(",")]
+        # Only an ORDER BY made of plain columns can be served by an index
+        if all(refs):
+            for ref in refs:
+                add(shape.order, resolve(ref.group(1), ref.group(2)))
+
+    return shape
+
+
+class _Statement:
+    """A workload entry: one fingerprint with its cost and an example statement"""
+    __slots__ = ("fingerprint", "query", "executable", "calls", "total_time")
+
+    def __init__(self, fingerprint_id: str, query: str, executable: bool):
+        self.fingerprint = fingerprint_id
+        self.query = query
+        self.executable = executable
+        self.calls = 0
+        self.total_time = 0.0
+
+    @property
+    def weight(self) -> float:
+        # Time spent, with a 1 ms floor per call so frequent fast statements still count
+        return max(self.total_time, float(self.calls))
+
+
+class IndexAdvisor:
+    """Suggests indexes from the recorded workload of a connection.
+
+    Statements come from query history, the slow query log and statement
+    statistics. Each statement proposes one composite index per table:
+    equality and join columns first (most selective first), then a range
+    column, or else the ORDER BY columns. Candidates are ranked by the time
+    the workload spent in the statements they serve, and where the database
+    can plan against a hypothetical index (HypoPG on PostgreSQL, a scratch
+    copy of the schema on SQLite) by the drop in estimated plan cost.
+    """
+
+    # Statements costed per candidate
+    MAX_COSTED_STATEMENTS = 5
+    MAX_INDEX_COLUMNS = 4
+
+    def workload(self, connection_id: str) -> List[_Statement]:
+        """Statements recorded for a connection, merged by fingerprint"""
+        statements: Dict[str, _Statement] = {}
+
+        def entry(query: str, executable: bool) -> _Statement:
+            keyword = query.lstrip().split(None, 1)[0].upper() if query.strip() else ""
+            executable = executable and keyword in EXPLAINABLE
+            fingerprint_id = fingerprint(query)[0]
+            statement = statements.get(fingerprint_id)
+            if statement is None:
+                statement = statements[fingerprint_id] = _Statement(fingerprint_id, query, executable)
+            elif executable and not statement.executable:
+                statement.query, statement.executable = query, True
+            return statement
+
+        history: Dict[str, Tuple[int, float]] = {}
+        for record in storage.get_query_history(connection_id, limit=QUERY_HISTORY_LIMIT):
+            if not record.success:
+                continue
+            statement = entry(record.query, True)
+            calls, total = history.get(statement.fingerprint, (0, 0.0))
+            history[statement.fingerprint] = (calls + 1, total + record.executionTime)
+
+        # Each source undercounts differently (history is capped, slow queries
+        # only see slow runs), so take the largest figure any source reports
+        for fingerprint_id, (calls, total) in history.items():
+            statements[fingerprint_id].calls = calls
+            statements[fingerprint_id].total_time = total
+        for slow in storage.get_slow_queries(connection_id, limit=QUERY_HISTORY_LIMIT):
+            # Statements logged from bound operations carry driver placeholders and cannot be planned as-is
+            statement = entry(slow.query, not re.search(r"\?|%\(|%s", slow.query))
+            statement.calls = max(statement.calls, slow.count)
+            statement.total_time = max(statement.total_time, (slow.avgExecutionTime or slow.executionTime) * slow.count)
+        for stats in statement_stats.get(connection_id, "totalTime", limit=QUERY_HISTORY_LIMIT):
+            statement = statements.get(stats["fingerprint"]) or entry(stats["query"], False)
+            statement.calls = max(statement.calls, stats["calls"])
+            statement.total_time = max(statement.total_time, stats["totalTime"])
+
+        return [statement for statement in statements.values() if statement.calls]
+
+    def candidate_columns(self, shape: QueryShape, table_name: str, columns: Dict[str, str],
+                          distinct: Dict[str, int]) -> Tuple[List[str], Dict[str, Set[str]]]:
+        """Index columns a statement would want on a table, and the role of each"""
+        table = table_name.lower()
+        if table not in shape.tables():
+            return [], {}
+
+        def on_table(usage: Dict[str, List[str]]) -> List[str]:
+            names = usage.get(table, []) + usage.get("*", [])
+            return [columns[name] for name in names if name in columns]
+
+        roles: Dict[str, Set[str]] = {}
+        equality = []
+        for role, names in (("filter", on_table(shape.equality)), ("join", on_table(shape.joins))):
+            for name in names:
+                roles.setdefault(name, set()).add(role)
+                if name not in equality:
+                    equality.append(name)
+        # Most selective first; columns without statistics keep their order
+        equality.sort(key=lambda name: -distinct.get(name, 0))
+
+        index_columns = list(equality)
+        ranges = [name for name in on_table(shape.ranges) if name not in index_columns]
+        if ranges:
+            index_columns.append(ranges[0])
+            roles.setdefault(ranges[0], set()).add("range")
+        else:
+            order = on_table(shape.order)
+            if len(order) == len(shape.order.get(table, []) + shape.order.get("*", [])):
+                for name in order:
+                    if name not in index_columns:
+                        index_columns.append(name)
+                        roles.setdefault(name, set()).add("order")
+        index_columns = index_columns[:self.MAX_INDEX_COLUMNS]
+        return index_columns, {name: roles[name] for name in index_columns}
+
+    def suggest(self, engine: Engine, connection_id: str, table_name: str, columns: List[str],
+                existing: List[List[str]], distinct: Dict[str, int], limit: int = 5) -> List[Dict[str, Any]]:
+        """Ranked index suggestions for a table"""
+        column_names = {name.lower(): name for name in columns}
+        workload = self.workload(connection_id)
+        total_weight = sum(statement.weight for statement in workload) or 1.0
+
+        # Columns tuple -> [weight, statements, column roles]
+        candidates: Dict[Tuple[str, ...], List[Any]] = {}
+        shapes: Dict[str, QueryShape] = {}
+        for statement in workload:
+            shape = shapes[statement.fingerprint] = parse_query(statement.query)
+            index_columns, roles = self.candidate_columns(shape, table_name, column_names, distinct)
+            if not index_columns:
+                continue
+            candidate = candidates.setdefault(tuple(index_columns), [0.0, [], {}])
+            candidate[0] += statement.weight
+            candidate[1].append(statement)
+            for name, column_roles in roles.items():
+                candidate[2].setdefault(name, set()).update(column_roles)
+
+        # An index also serves every statement that wants one of its prefixes
+        for columns_key in sorted(candidates, key=len):
+            longer = [other for other in candidates
+                      if len(other) > len(columns_key) and other[:len(columns_key)] == columns_key]
+            if longer:
+                target = candidates[max(longer, key=lambda other: candidates[other][0])]
+                weight, statements, roles = candidates.pop(columns_key)
+                target[0] += weight
+                target[1].extend(statements)
+                for name, column_roles in roles.items():
+                    target[2].setdefault(name, set()).update(column_roles)
+
+        # Drop candidates an existing index already covers as a prefix
+        for columns_key in list(candidates):
+            if any(tuple(index[:len(columns_key)]) == columns_key for index in existing):
+                del candidates[columns_key]
+
+        ranked = sorted(candidates.items(), key=lambda item: -item[1][0])[:limit * 2]
+        method, estimates = self.estimate(engine, table_name, [
+            (columns_key, [statement for statement in sorted(statements, key=lambda s: -s.weight)
+                           if statement.executable][:self.MAX_COSTED_STATEMENTS])
+            for columns_key, (_, statements, _) in ranked
+        ], shapes)
+
+        suggestions = []
+        for columns_key, (weight, statements, roles) in ranked:
+            share = weight / total_weight
+            estimate = estimates.get(columns_key)
+            improvement = None
+            if estimate:
+                before, after = estimate
+                improvement = max(0.0, 1 - after / before) if before else 0.0
+                if improvement <= 0.01:
+                    continue  # The planner would not use it
+            if improvement is not None:
+                impact = "high" if improvement >= 0.5 else "medium" if improvement >= 0.2 else "low"
+            else:
+                impact = "high" if share >= 0.25 else "medium" if share >= 0.05 else "low"
+
+            described = {
+                "filter": "filters on", "join": "joins on", "range": "range-filters on", "order": "orders by"
+            }
+            usage = ", ".join(
+                f"{described[role]} {', '.join(name for name in columns_key if role in roles.get(name, ()))}"
+                for role in described if any(role in roles.get(name, ()) for name in columns_key)
+            )
+            suggestions.append({
+                "table": table_name,
+                "columns": list(columns_key),
+                "reason": f"{len(statements)} recorded statement(s) {usage} ({share:.0%} of workload time)",
+                "impact": impact,
+                "ddl": f"CREATE INDEX {self.index_name(table_name, columns_key)} ON {table_name} ({', '.join(columns_key)})",
+                "statements": len(statements),
+                "workloadShare": round(share, 4),
+                "estimatedCostBefore": round(estimate[0], 2) if estimate else None,
+                "estimatedCostAfter": round(estimate[1], 2) if estimate else None,
+                "estimatedImprovement": round(improvement, 4) if improvement is not None else None,
+                "estimateMethod": method if estimate else None,
+                "_score": weight * (improvement if improvement is not None else 1.0)
+            })
+
+        suggestions.sort(key=lambda suggestion: -suggestion.pop("_score"))
+        return suggestions[:limit]
+
+    @staticmethod
+    def index_name(table_name: str, columns: Tuple[str, ...]) -> str:
+        return f"idx_{table_name}_{'_'.join(columns)}"[:63]
+
+    def estimate(self, engine: Engine, table_name: str,
+                 candidates: List[Tuple[Tuple[str, ...], List[_Statement]]],
+                 shapes: Dict[str, QueryShape]) -> Tuple[Optional[str], Dict[Tuple[str, ...], Tuple[float, float]]]:
+        """Summed plan cost of each candidate's statements without and with the index"""
+        if not any(statements for _, statements in candidates):
+            return None, {}
+        try:
+            if engine.dialect.name == 'postgresql':
+                return self._estimate_hypopg(engine, table_name, candidates)
+            if engine.dialect.name == 'sqlite':
+                return self._estimate_scratch(engine, table_name, candidates, shapes)
+        except Exception:
+            pass  # Estimates are best-effort; fall back to workload ranking
+        # MySQL has no hypothetical indexes, and building real ones to cost them is not an option
+        return None, {}
+
+    def _estimate_hypopg(self, engine: Engine, table_name: str,
+                         candidates: List[Tuple[Tuple[str, ...], List[_Statement]]]):
+        with engine.connect() as conn:
+            if not conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'hypopg'")).scalar():
+                return None, {}
+
+            def cost(query: str) -> Optional[float]:
+                savepoint = conn.begin_nested()
+                try:
+                    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {query}").scalar()
+                    savepoint.commit()
+                except Exception:
+                    savepoint.rollback()
+                    return None
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                return float(plan[0]["Plan"]["Total Cost"])
+
+            baseline: Dict[str, Optional[float]] = {}
+            estimates = {}
+            for columns_key, statements in candidates:
+                for statement in statements:
+                    if statement.fingerprint not in baseline:
+                        baseline[statement.fingerprint] = cost(statement.query)
+                costed = [statement for statement in statements if baseline[statement.fingerprint] is not None]
+                if not costed:
+                    continue
+                index_oid = conn.execute(
+                    text("SELECT indexrelid FROM hypopg_create_index(:ddl)"),
+                    {"ddl": f"CREATE INDEX ON {table_name} ({', '.join(columns_key)})"}
+                ).scalar()
+                try:
+                    after = [cost(statement.query) for statement in costed]
+                finally:
+                    conn.execute(text("SELECT hypopg_drop_index(:oid)"), {"oid": index_oid})
+                pairs = [(baseline[s.fingerprint], a) for s, a in zip(costed, after) if a is not None]
+                if pairs:
+                    estimates[columns_key] = (sum(b for b, _ in pairs), sum(a for _, a in pairs))
+            conn.rollback()
+        return "hypopg", estimates
+
+    def _estimate_scratch(self, engine: Engine, table_name: str,
+                          candidates: List[Tuple[Tuple[str, ...], List[_Statement]]],
+                          shapes: Dict[str, QueryShape]):
+        """Plan against an empty in-memory copy of the schema carrying the source's planner statistics"""
+        scratch = create_engine("sqlite://")
+        row_counts: Dict[str, int] = {}
+        with engine.connect() as source, scratch.connect() as conn:
+            objects = source.execute(text(
+                "SELECT type, name, tbl_name, sql FROM sqlite_master "
+                "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' AND type IN ('table', 'index', 'view')"
+            )).all()
+            for kind in ("table", "index", "view"):
+                for _, _, _, sql in (row for row in objects if row[0] == kind):
+                    try:
+                        conn.exec_driver_sql(sql)
+                    except Exception:
+                        pass  # e.g. virtual tables whose module is not loaded here
+
+            has_stats = source.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).scalar()
+            if has_stats:
+                conn.exec_driver_sql("ANALYZE")
+                conn.exec_driver_sql("DELETE FROM sqlite_stat1")
+                for tbl, idx, stat in source.execute(text("SELECT tbl, idx, stat FROM sqlite_stat1")):
+                    conn.execute(text("INSERT INTO sqlite_stat1 VALUES (:tbl, :idx, :stat)"),
+                                 {"tbl": tbl, "idx": idx, "stat": stat})
+                    row_counts.setdefault(tbl.lower(), int(stat.split()[0]))
+                conn.exec_driver_sql("ANALYZE sqlite_schema")  # Reload the copied statistics
+
+            def rows(table: str) -> int:
+                if table not in row_counts:
+                    try:
+                        row_counts[table] = source.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                    except Exception:
+                        row_counts[table] = 1000
+                return row_counts[table]
+
+            def cost(statement: _Statement) -> Optional[float]:
+                try:
+                    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement.query}").all()
+                except Exception:
+                    return None
+                aliases = shapes[statement.fingerprint].aliases
+                return _sqlite_plan_cost([row[3] for row in plan], lambda name: rows(aliases.get(name.lower(), name.lower())))
+
+            baseline: Dict[str, Optional[float]] = {}
+            estimates = {}
+            for columns_key, statements in candidates:
+                for statement in statements:
+                    if statement.fingerprint not in baseline:
+                        baseline[statement.fingerprint] = cost(statement)
+                costed = [statement for statement in statements if baseline[statement.fingerprint] is not None]
+                if not costed:
+                    continue
+                conn.exec_driver_sql(f"CREATE INDEX _advisor_candidate ON {table_name} ({', '.join(columns_key)})")
+                try:
+                    after = [cost(statement) for statement in costed]
+                finally:
+                    conn.exec_driver_sql("DROP INDEX _advisor_candidate")
+                pairs = [(baseline[s.fingerprint], a) for s, a in zip(costed, after) if a is not None]
+                if pairs:
+                    estimates[columns_key] = (sum(b for b, _ in pairs), sum(a for _, a in pairs))
+        scratch.dispose()
+        return "scratch_schema", estimates
+
+
+_PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS \S+)?(.*)$")
+
+
+def _sqlite_plan_cost(steps: List[str], rows) -> float:
+    """Rough cost of an EXPLAIN QUERY PLAN in rows visited.
+
+    SQLite does not report plan costs, so each loop is priced with the
+    planner's own default assumptions: a scan visits every row, an index
+    lookup costs log2(rows) and returns about 10 rows for an equality
+    (fewer for each further one) and a quarter of them per range, and
+    nested loops multiply.
+    """
+    total = 0.0
+    loops = 1.0
+    for detail in steps:
+        match = _PLAN_STEP.match(detail)
+        if match and detail != "SCAN CONSTANT ROW":
+            kind, name, rest = match.groups()
+            table_rows = max(rows(name), 1)
+            if kind == "SCAN":
+                produced = float(table_rows)
+                step = produced * (0.5 if "COVERING INDEX" in rest else 1.0)
+            else:
+                constraint = rest[rest.find("(") + 1:rest.rfind(")")] if "(" in rest else ""
+                if "rowid=?" in constraint or ("PRIMARY KEY" in rest and "=?" in constraint):
+                    produced = 1.0
+                else:
+                    equalities = constraint.count("=?")
+                    produced = min(float(table_rows), 10 * 0.5 ** (equalities - 1)) if equalities else float(table_rows)
+                    produced = max(produced * 0.25 ** len(re.findall(r"[<>]", constraint)), 1.0)
+                step = math.log2(table_rows + 1) + produced
+            total += loops * step
+            loops *= produced
+        elif "TEMP B-TREE" in detail:
+            total += loops * math.log2(loops + 1)
+    return total
+
+
+# Global index advisor instance
+index_advisor = IndexAdvisor()
@@ -0,0 +1,118 @@
+from typing import Callable
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+import threading
+
+
+# Seconds between progress polls while an index builds
+POLL_INTERVAL = 1.0
+# Shown when MySQL is not already recording the stages progress is read from
+UNAVAILABLE_MYSQL = ("Progress unavailable: enable the stage/innodb/alter% instruments "
+                     "and the events_stages_current consumer in performance_schema")
+
+
+class IndexBuildWatcher:
+    """Polls the progress of an index build running on another connection.
+
+    PostgreSQL reports the build in pg_stat_progress_create_index, keyed by
+    the building backend's PID. MySQL reports InnoDB ALTER TABLE stages in
+    performance_schema, keyed by the builder's connection ID, if the server
+    already records them; the watcher never changes server-wide
+    instrumentation. Each poll goes to `progress` as the current phase with
+    its work done and total. When `progress` raises because the job was
+    cancelled, the build's statement is cancelled on the server.
+    """
+
+    def __init__(self, engine: Engine, backend_id: int, progress: Callable[..., None]):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.backend_id = int(backend_id)
+        self.progress = progress
+        self.cancelled = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="index-build-watcher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=POLL_INTERVAL * 2)
+
+    def _run(self) -> None:
+        with self.engine.connect() as conn:
+            readable = self.dialect != 'mysql' or self._mysql_stages_enabled(conn)
+            unavailable = None if readable else UNAVAILABLE_MYSQL
+            while not self._stop.wait(POLL_INTERVAL):
+                phase = done = total = None
+                if readable:
+                    try:
+                        phase, done, total = self._poll(conn)
+                    except Exception:
+                        conn.rollback()
+                        # No progress view or no privileges; keep watching for cancellation
+                        readable, unavailable = False, "Progress unavailable"
+                try:
+                    if unavailable:
+                        self.progress(message=unavailable)
+                        unavailable = None
+                    elif phase is None:
+                        self.progress()
+                    else:
+                        self.progress(rows_done=done, total_rows=total,
+                                      message=f"{phase} ({done}/{total})" if total else phase)
+                except BaseException:
+                    self.cancelled = True
+                    self._cancel(conn)
+                    return
+
+    def _poll(self, conn):
+        if self.dialect == 'postgresql':
+            row = conn.execute(text(
+                "SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total, lockers_done, lockers_total "
+                "FROM pg_stat_progress_create_index WHERE pid = :pid"
+            ), {"pid": self.backend_id}).first()
+            conn.rollback()
+            if row is None:
+                return None, None, None
+            phase, blocks_done, blocks_total, tuples_done, tuples_total, lockers_done, lockers_total = row
+            # Each phase counts its own unit of work; use whichever the current one reports
+            if tuples_total:
+                return phase, tuples_done, tuples_total
+            if blocks_total:
+                return phase, blocks_done, blocks_total
+            return phase, lockers_done, lockers_total
+
+        row = conn.execute(text(
+            "SELECT s.EVENT_NAME, s.WORK_COMPLETED, s.WORK_ESTIMATED FROM performance_schema.events_stages_current s "
+            "JOIN performance_schema.threads t ON t.THREAD_ID = s.THREAD_ID WHERE t.PROCESSLIST_ID = :id"
+        ), {"id": self.backend_id}).first()
+        conn.rollback()
+        if row is None:
+            return None, None, None
+        return row[0].rsplit("/", 1)[-1], row[1], row[2]
+
+    def _mysql_stages_enabled(self, conn) -> bool:
+        """Whether the server already records InnoDB ALTER TABLE stages"""
+        try:
+            enabled = conn.execute(text(
+                "SELECT (SELECT COUNT(*) FROM performance_schema.setup_instruments "
+                "WHERE NAME LIKE 'stage/innodb/alter%' AND ENABLED = 'YES') > 0 "
+                "AND (SELECT COUNT(*) FROM performance_schema.setup_consumers "
+                "WHERE NAME = 'events_stages_current' AND ENABLED = 'YES') > 0"
+            )).scalar()
+            conn.rollback()
+            return bool(enabled)
+        except Exception:
+            conn.rollback()
+            return False
+
+    def _cancel(self, conn) -> None:
+        try:
+            if self.dialect == 'postgresql':
+                conn.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": self.backend_id})
+            else:
+                conn.execute(text(f"KILL QUERY {self.backend_id}"))
+            conn.commit()
+        except Exception:
+            conn.rollback()
@@ -0,0 +1,218 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Dict, Optional, Any, Callable, Deque
+from datetime import datetime
+from models import Job, JobProgress
+from storage import storage
+import threading
+import tempfile
+import time
+import os
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job when it has been cancelled.
+
+    Derives from BaseException so the broad ``except Exception`` blocks in the
+    database service cannot swallow it and keep going.
+    """
+
+
+class JobOutput:
+    """Value returned by a job task: a JSON result and/or downloadable content"""
+
+    def __init__(self, result: Any = None, content: Optional[str] = None,
+                 filename: Optional[str] = None, media_type: str = "application/octet-stream"):
+        self.result = result
+        self.content = content
+        self.filename = filename
+        self.media_type = media_type
+
+
+class JobContext:
+    """Progress reporting and cancellation handle passed to a running job"""
+
+    # Minimum seconds between progress writes to storage
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, job_id: str, cancel_event: threading.Event):
+        self.job_id = job_id
+        self.cancel_event = cancel_event
+        self.started = time.monotonic()
+        self.rows = 0
+        self.nbytes = 0
+        self.total_rows: Optional[int] = None
+        self.total_bytes: Optional[int] = None
+        self.message: Optional[str] = None
+        self._last_flush = 0.0
+
+    def report(self, rows: int = 0, nbytes: int = 0, total_rows: Optional[int] = None,
+               total_bytes: Optional[int] = None, message: Optional[str] = None,
+               rows_done: Optional[int] = None) -> None:
+        """Record processed rows/bytes; raises JobCancelled if the job was cancelled
+
+        `rows_done` replaces the running row count, for work that reports its absolute position.
+        """
+        self.check_cancelled()
+        self.rows = rows_done if rows_done is not None else self.rows + rows
+        self.nbytes += nbytes
+        if total_rows is not None:
+            self.total_rows = total_rows
+        if total_bytes is not None:
+            self.total_bytes = total_bytes
+        if message is not None:
+            self.message = message
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.FLUSH_INTERVAL:
+            self._last_flush = now
+            storage.update_job(self.job_id, progress=self.snapshot())
+
+    def save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        """Store the state a resumed job continues from"""
+        storage.update_job(self.job_id, checkpoint=checkpoint)
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if cancellation was requested"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def snapshot(self) -> JobProgress:
+        """Current progress with percent complete and ETA where totals are known"""
+        if self.total_rows:
+            fraction = min(self.rows / self.total_rows, 1.0)
+        elif self.total_bytes:
+            fraction = min(self.nbytes / self.total_bytes, 1.0)
+        else:
+            fraction = None
+
+        eta = None
+        if fraction:
+            elapsed = time.monotonic() - self.started
+            eta = round(elapsed * (1 - fraction) / fraction, 1)
+
+        return JobProgress(
+            rowsProcessed=self.rows,
+            bytesProcessed=self.nbytes,
+            totalRows=self.total_rows,
+            totalBytes=self.total_bytes,
+            percent=round(fraction * 100, 1) if fraction is not None else None,
+            etaSeconds=eta,
+            message=self.message
+        )
+
+
+class JobManager:
+    """Runs long operations on a worker pool with a per-connection concurrency limit"""
+
+    def __init__(self, max_workers: int = 4, per_connection_limit: int = 2,
+                 results_dir: Optional[str] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.per_connection_limit = per_connection_limit
+        self.results_dir = results_dir or os.path.join(tempfile.gettempdir(), "omni-core-jobs")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Deque[str]] = {}
+        self._running: Dict[str, int] = {}
+        self._tasks: Dict[str, Callable[[JobContext], Any]] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+
+    def submit(self, connection_id: str, job_type: str, params: Dict[str, Any],
+               task: Callable[[JobContext], Any]) -> Job:
+        """Queue a job; it starts once the connection has a free slot"""
+        job = storage.create_job(connection_id, job_type, params)
+
+        with self._lock:
+            self._tasks[job.id] = task
+            self._cancel_events[job.id] = threading.Event()
+            self._pending.setdefault(connection_id, deque()).append(job.id)
+
+        self._dispatch(connection_id)
+        return storage.get_job(job.id)
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a pending job, or signal a running one to stop at its next progress report"""
+        job = storage.get_job(job_id)
+        if not job:
+            raise ValueError("Job not found")
+
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            if event is None:
+                return job  # Already finished
+            event.set()
+
+            queue = self._pending.get(job.connectionId)
+            if queue is not None and job_id in queue:
+                queue.remove(job_id)
+                del self._tasks[job_id]
+                del self._cancel_events[job_id]
+                return storage.update_job(job_id, status="cancelled", finishedAt=datetime.utcnow().isoformat())
+
+        return job
+
+    def delete(self, job_id: str) -> None:
+        """Delete a finished job and its stored result"""
+        job = storage.get_job(job_id)
+        if not job:
+            return
+        if job.status in ("pending", "running"):
+            raise ValueError("Cancel the job before deleting it")
+        if job.resultPath and os.path.exists(job.resultPath):
+            os.remove(job.resultPath)
+        storage.delete_job(job_id)
+
+    def _dispatch(self, connection_id: str) -> None:
+        """Start queued jobs while the connection is under its concurrency limit"""
+        with self._lock:
+            queue = self._pending.get(connection_id)
+            while queue and self._running.get(connection_id, 0) < self.per_connection_limit:
+                job_id = queue.popleft()
+                self._running[connection_id] = self._running.get(connection_id, 0) + 1
+                self.executor.submit(self._run, connection_id, job_id)
+
+    def _run(self, connection_id: str, job_id: str) -> None:
+        """Execute a job and record its outcome"""
+        with self._lock:
+            task = self._tasks.pop(job_id)
+            context = JobContext(job_id, self._cancel_events[job_id])
+
+        try:
+            storage.update_job(job_id, status="running", startedAt=datetime.utcnow().isoformat())
+            output = task(context)
+            if not isinstance(output, JobOutput):
+                output = JobOutput(result=output)
+
+            fields: Dict[str, Any] = {"result": output.result}
+            if output.content is not None:
+                os.makedirs(self.results_dir, exist_ok=True)
+                path = os.path.join(self.results_dir, job_id)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(output.content)
+                fields.update(
+                    resultPath=path,
+                    resultFilename=output.filename or job_id,
+                    resultMediaType=output.media_type,
+                    resultSize=os.path.getsize(path)
+                )
+
+            storage.update_job(job_id, status="completed", finishedAt=datetime.utcnow().isoformat(),
+                               progress=context.snapshot(), **fields)
+        except JobCancelled:
+            storage.update_job(job_id, status="cancelled", finishedAt=datetime.utcnow().isoformat(),
+                               progress=context.snapshot())
+        except Exception as e:
+            storage.update_job(job_id, status="failed", finishedAt=datetime.utcnow().isoformat(),
+                               progress=context.snapshot(), error=str(e))
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+                self._running[connection_id] -= 1
+            self._dispatch(connection_id)
+
+
+# Global job manager instance
+job_manager = JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    per_connection_limit=int(os.getenv("JOB_CONCURRENCY_PER_CONNECTION", "2")),
+    results_dir=os.getenv("JOB_RESULTS_DIR")
+)
@@ -0,0 +1,241 @@
+from typing import Dict, Optional, List, Any, Tuple, Callable
+import functools
+import math
+import threading
+import time
+
+
+class LatencySketch:
+    """Log-bucketed latency histogram with bounded relative error.
+
+    Values are counted in buckets whose bounds grow geometrically by
+    ``gamma``, so any quantile is reported within ``relative_accuracy`` of the
+    true value. Recording is O(1), and two sketches with the same accuracy
+    merge by adding bucket counts, which makes them safe to combine across
+    worker processes.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 0.001):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0  # Values at or below min_value
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.errors = 0
+
+    def record(self, value: float, error: bool = False) -> None:
+        if value <= self.min_value:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value / self.min_value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if error:
+            self.errors += 1
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        """Add the counts of another sketch into this one"""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.errors += other.errors
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def _bucket_value(self, index: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+        return self.min_value * 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Approximate value at quantile q (0..1)"""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min or 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def count_above(self, threshold: float) -> int:
+        """Approximate number of values greater than threshold"""
+        return sum(count for index, count in self.buckets.items() if self._bucket_value(index) > threshold)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": round(self.total / self.count, 3) if self.count else 0,
+            "min": round(self.min or 0.0, 3),
+            "max": round(self.max or 0.0, 3),
+            "p50": round(self.quantile(0.5), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "p999": round(self.quantile(0.999), 3)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form for merging in another process"""
+        return {
+            "relativeAccuracy": self.relative_accuracy,
+            "minValue": self.min_value,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zeroCount": self.zero_count,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "errors": self.errors
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencySketch":
+        sketch = cls(data["relativeAccuracy"], data["minValue"])
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        sketch.zero_count = data["zeroCount"]
+        sketch.count = data["count"]
+        sketch.total = data["total"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.errors = data["errors"]
+        return sketch
+
+
+# name -> (slot width in seconds, slots in the window)
+WINDOWS = {
+    "1m": (10, 6),
+    "5m": (10, 30),
+    "1h": (60, 60)
+}
+
+
+class RollingSketch:
+    """Latency sketches over rolling time windows.
+
+    Events go into the current slot of two rings (10 s slots for the 1m/5m
+    windows, 1 min slots for 1h); a window is read by merging its slots.
+    """
+
+    def __init__(self):
+        sizes: Dict[int, int] = {}
+        for width, slots in WINDOWS.values():
+            sizes[width] = max(sizes.get(width, 0), slots)
+        # Each ring entry is (slot epoch, sketch); stale entries are reset on write
+        self.rings: Dict[int, List[Tuple[int, LatencySketch]]] = {
+            width: [(-1, LatencySketch()) for _ in range(size)] for width, size in sizes.items()
+        }
+
+    def record(self, value: float, error: bool = False, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        for width, ring in self.rings.items():
+            epoch = int(now // width)
+            slot = epoch % len(ring)
+            if ring[slot][0] != epoch:
+                ring[slot] = (epoch, LatencySketch())
+            ring[slot][1].record(value, error)
+
+    def window(self, name: str, now: Optional[float] = None) -> LatencySketch:
+        """Merged sketch for one of the WINDOWS"""
+        width, slots = WINDOWS[name]
+        current = int((time.time() if now is None else now) // width)
+        merged = LatencySketch()
+        for epoch, sketch in self.rings[width]:
+            if current - slots < epoch <= current:
+                merged.merge(sketch)
+        return merged
+
+
+class LatencyTracker:
+    """Rolling latency sketches per connection and operation type"""
+
+    def __init__(self):
+        self._sketches: Dict[Tuple[str, str], RollingSketch] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Called with (connection_id, operation, duration_ms, error) for every event
+        self.listeners: List[Callable[[str, str, float, bool], None]] = []
+
+    def record(self, connection_id: str, operation: str, duration_ms: float, error: bool = False) -> None:
+        with self._lock:
+            sketch = self._sketches.get((connection_id, operation))
+            if sketch is None:
+                sketch = self._sketches[(connection_id, operation)] = RollingSketch()
+            sketch.record(duration_ms, error)
+        for listener in self.listeners:
+            listener(connection_id, operation, duration_ms, error)
+
+    def window(self, connection_id: str, operation: str, name: str) -> LatencySketch:
+        with self._lock:
+            sketch = self._sketches.get((connection_id, operation))
+            return sketch.window(name) if sketch else LatencySketch()
+
+    def operations(self, connection_id: str) -> List[str]:
+        with self._lock:
+            return sorted(operation for cid, operation in self._sketches if cid == connection_id)
+
+    def summary(self, connection_id: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Percentiles per operation and window, times in ms"""
+        return {
+            operation: {name: self.window(connection_id, operation, name).summary() for name in WINDOWS}
+            for operation in self.operations(connection_id)
+        }
+
+    def export(self, connection_id: str, name: str) -> Dict[str, Dict[str, Any]]:
+        """Serialized sketches per operation, for merging with other workers"""
+        return {
+            operation: self.window(connection_id, operation, name).to_dict()
+            for operation in self.operations(connection_id)
+        }
+
+    def remove(self, connection_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._sketches if key[0] == connection_id]:
+                del self._sketches[key]
+
+    def timed(self, operation: str):
+        """Decorator for DatabaseService methods taking connection_id first.
+
+        Only the outermost instrumented call on a thread is recorded, so an
+        operation that reads metadata internally is not counted twice. Calls
+        for connections that are not open are not recorded.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(service, connection_id, *args, **kwargs):
+                depth = getattr(self._local, "depth", 0)
+                self._local.depth = depth + 1
+                start = time.perf_counter()
+                error = False
+                try:
+                    return func(service, connection_id, *args, **kwargs)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    self._local.depth = depth
+                    # Unknown IDs come from request URLs; recording them would keep sketches for each one
+                    if depth == 0 and connection_id in service.connections:
+                        self.record(connection_id, operation, (time.perf_counter() - start) * 1000, error)
+            return wrapper
+        return decorator
+
+
+# Global latency tracker instance
+latency = LatencyTracker()
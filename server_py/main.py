@@ -1,34 +1,204 @@
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, PlainTextResponse
-from typing import Optional, Dict, Any
+from fastapi.responses import FileResponse, PlainTextResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from typing import Optional, Dict, Any, List
 from datetime import datetime
+from contextlib import asynccontextmanager
 import models
 from models import (
     InsertConnectionConfig, CreateTableRequest, RenameTableRequest,
     AddColumnRequest, ModifyColumnRequest, ExecuteQueryRequest,
     ImportDataRequest, ImportDataResponse, BulkInsertRequest,
-    BulkUpdateRequest, BulkDeleteRequest, CreateIndexRequest,
-    ConstraintRequest
+    BulkUpsertRequest, BulkUpdateRequest, BulkDeleteRequest,
+    BulkChangesetRequest, CreateIndexRequest, ConstraintRequest, SlowQuerySettings,
+    SaveSchemaSnapshotRequest, SchemaDiffRequest
 )
-from database_service import db_service
+from database_service import db_service, TABLE_SORT_KEYS
+from schema_diff import diff_schemas
 from storage import storage
+from jobs import job_manager, JobContext, JobOutput
+from admission import admission, AdmissionRejected
+from query_stats import statement_stats
+from slow_log import slow_log
+from sampler import sampler
+from latency import latency, WINDOWS
+from tracing import start_trace, phase, exporter
+import metrics
+import asyncio
+import time
 import os
 
 
-app = FastAPI(title="Omni Core DB Manager API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Restore state kept by a durable storage backend across restarts"""
+    for connection in storage.get_all_connections():
+        admission.configure(connection.id, connection.maxConcurrentQueries, connection.maxQueuedRequests)
+        try:
+            db_service.connect(connection)
+        except Exception:
+            pass  # Database unreachable for now; the saved connection stays listed
+    
+    # Jobs that were queued or running when the server stopped are failed; copies can be resumed
+    for job in storage.get_unfinished_jobs():
+        storage.update_job(job.id, status="failed", finishedAt=datetime.utcnow().isoformat(),
+                           error="Interrupted by server restart")
+    
+    sampler_task = asyncio.create_task(sampler.run(db_service.connections))
+    
+    yield
+    
+    sampler_task.cancel()
+    if hasattr(storage, "flush"):
+        storage.flush()
+
+
+app = FastAPI(title="Omni Core DB Manager API", lifespan=lifespan)
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Bound concurrent and queued requests per database connection"""
+    # Preflights never reach a route, and unknown connections are left to the route's own error
+    classified = admission.classify(request.url.path) if request.method != "OPTIONS" else None
+    gate = admission.gate(classified[0]) if classified and classified[0] in db_service.connections else None
+    if gate is None:
+        return await call_next(request)
+    
+    lane = classified[1]
+    try:
+        with phase("queue"):
+            await gate.acquire(lane)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    start = time.monotonic()
+    try:
+        return await call_next(request)
+    finally:
+        gate.release(lane, time.monotonic() - start)
+
 
-# Enable CORS
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    """Record request latency and response size per route template"""
+    start = time.perf_counter()
+    status = 500
+    response = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The router stores the matched route in the scope; label by its template, never the raw path
+        route = request.scope.get("route")
+        template = getattr(route, "path", None) or "unmatched"
+        metrics.http_request_seconds.observe(time.perf_counter() - start, method=request.method, route=template)
+        metrics.http_requests.inc(method=request.method, route=template, status=status)
+        content_length = response.headers.get("content-length") if response is not None else None
+        if content_length:
+            metrics.http_response_bytes.inc(int(content_length), method=request.method, route=template)
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Report per-phase timings in a Server-Timing header and optionally export them as spans"""
+    trace = start_trace(f"{request.method} {request.url.path}")
+    start = time.perf_counter()
+    response = await call_next(request)
+    
+    route = getattr(request.scope.get("route"), "path", None)
+    if route:
+        trace.root.name = f"{request.method} {route}"
+    trace.root.end_ns = time.time_ns()
+    trace.root.attributes = {"http.method": request.method, "http.route": route,
+                             "http.status_code": response.status_code}
+    response.headers["Server-Timing"] = trace.server_timing((time.perf_counter() - start) * 1000)
+    response.headers["Timing-Allow-Origin"] = "*"
+    if exporter is not None:
+        exporter.export(trace)
+    return response
+
+
+# Enable CORS; added last so it is outermost and its headers reach every response, including 429s
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
 
+def _json_response(content: Any) -> JSONResponse:
+    """Build a JSON response, timing serialization and encoding as request phases"""
+    with phase("serialize"):
+        content = jsonable_encoder(content)
+    with phase("encode"):
+        return JSONResponse(content)
+
+
+def _observe_db_operation(connection_id: str, operation: str, duration_ms: float, error: bool) -> None:
+    engine = db_service.connections.get(connection_id)
+    if engine is None:
+        return  # IDs from request URLs must not become label values
+    dialect = engine.dialect.name
+    metrics.db_operation_seconds.observe(duration_ms / 1000, connection_id=connection_id,
+                                         dialect=dialect, operation=operation)
+    if error:
+        metrics.db_operation_errors.inc(connection_id=connection_id, dialect=dialect, operation=operation)
+
+
+def _collect_gauges() -> None:
+    """Refresh pool, admission, storage and job gauges before a scrape"""
+    for metric in (metrics.pool_size, metrics.pool_checked_out, metrics.pool_overflow,
+                   metrics.admission_active, metrics.admission_queued, metrics.jobs_by_status):
+        metric.clear()
+    
+    for connection_id, engine in list(db_service.connections.items()):
+        pool = engine.pool
+        labels = {"connection_id": connection_id, "dialect": engine.dialect.name}
+        # Not every pool class (e.g. SQLite's for in-memory databases) tracks these
+        if hasattr(pool, "size"):
+            metrics.pool_size.set(pool.size(), **labels)
+        if hasattr(pool, "checkedout"):
+            metrics.pool_checked_out.set(pool.checkedout(), **labels)
+        if hasattr(pool, "overflow"):
+            metrics.pool_overflow.set(max(pool.overflow(), 0), **labels)
+    
+    for connection_id, gate_metrics in admission.metrics().items():
+        for lane, active in gate_metrics["active"].items():
+            metrics.admission_active.set(active, connection_id=connection_id, lane=lane)
+        for lane, queued in gate_metrics["queued"].items():
+            metrics.admission_queued.set(queued, connection_id=connection_id, lane=lane)
+    
+    for kind, count in storage.sizes().items():
+        metrics.storage_records.set(count, kind=kind)
+    if hasattr(storage, "file_size"):
+        metrics.storage_bytes.set(storage.file_size())
+    
+    unfinished = storage.get_unfinished_jobs()
+    for status in ("pending", "running"):
+        metrics.jobs_by_status.set(sum(1 for job in unfinished if job.status == status), status=status)
+
+
+latency.listeners.append(_observe_db_operation)
+metrics.registry.add_collector(_collect_gauges)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # API Routes
 @app.get("/api/connections")
 async def get_connections():
@@ -60,6 +230,7 @@ async def create_connection(config: InsertConnectionConfig):
         
         # Test connection
         db_service.connect(connection)
+        admission.configure(connection.id, connection.maxConcurrentQueries, connection.maxQueuedRequests)
         
         return connection.model_dump()
     except Exception as e:
@@ -71,6 +242,10 @@ async def delete_connection(connection_id: str):
     """Delete a database connection"""
     try:
         db_service.disconnect(connection_id)
+        admission.remove(connection_id)
+        statement_stats.reset(connection_id)
+        latency.remove(connection_id)
+        metrics.registry.remove_connection(connection_id)
         storage.delete_connection(connection_id)
         return {"success": True}
     except Exception as e:
@@ -78,11 +253,109 @@ async def delete_connection(connection_id: str):
 
 
 @app.get("/api/connections/{connection_id}/tables")
-async def get_tables(connection_id: str):
-    """Get all tables for a connection"""
+async def get_tables(connection_id: str, search: Optional[str] = None, prefix: Optional[str] = None,
+                     sort: str = "name", order: str = "asc", limit: Optional[int] = None,
+                     cursor: Optional[str] = None):
+    """Get all tables for a connection, or one page of them when `limit` or `cursor` is given"""
+    if limit is None and cursor is None:
+        try:
+            tables = db_service.get_tables(connection_id)
+            return [table.model_dump() for table in tables]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    if sort not in TABLE_SORT_KEYS or order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(TABLE_SORT_KEYS)} and order asc or desc")
+    try:
+        page = await run_in_threadpool(
+            db_service.list_tables, connection_id, search=search, prefix=prefix, sort=sort,
+            descending=order == "desc", limit=max(1, min(limit or 100, 1000)), cursor=cursor
+        )
+        return {**page, "tables": [table.model_dump() for table in page["tables"]]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/schema")
+async def get_schema_snapshot(connection_id: str, request: Request, refresh: bool = False):
+    """Get a versioned snapshot of the whole schema"""
+    try:
+        snapshot = await run_in_threadpool(db_service.get_schema_snapshot, connection_id, refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    etag = f'"{snapshot["version"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(jsonable_encoder(snapshot), headers={"ETag": etag})
+
+
+@app.post("/api/connections/{connection_id}/schema/snapshots")
+async def save_schema_snapshot(connection_id: str, request: SaveSchemaSnapshotRequest):
+    """Store the current schema so later diffs can compare against it"""
+    try:
+        snapshot = await run_in_threadpool(db_service.get_schema_snapshot, connection_id, True)
+        record = storage.create_schema_snapshot(connection_id, jsonable_encoder(snapshot), request.name)
+        return record.model_dump(exclude={"snapshot"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/schema/snapshots")
+async def get_schema_snapshots(connection_id: str):
+    """List stored schema snapshots"""
     try:
-        tables = db_service.get_tables(connection_id)
-        return [table.model_dump() for table in tables]
+        return [record.model_dump(exclude={"snapshot"}) for record in storage.get_schema_snapshots(connection_id)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/schema-snapshots/{snapshot_id}")
+async def get_stored_schema_snapshot(snapshot_id: str):
+    """Get a stored schema snapshot with its content"""
+    record = storage.get_schema_snapshot(snapshot_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Schema snapshot not found")
+    return record.model_dump()
+
+
+@app.delete("/api/schema-snapshots/{snapshot_id}")
+async def delete_schema_snapshot(snapshot_id: str):
+    """Delete a stored schema snapshot"""
+    try:
+        storage.delete_schema_snapshot(snapshot_id)
+        return {"success": True}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _resolve_schema(side: str, connection_id: Optional[str], snapshot_id: Optional[str],
+                    refresh: bool) -> Dict[str, Any]:
+    """The snapshot one side of a diff refers to: a live connection or a stored snapshot"""
+    if (connection_id is None) == (snapshot_id is None):
+        raise ValueError(f"Give exactly one of {side}ConnectionId and {side}SnapshotId")
+    if connection_id is not None:
+        return db_service.get_schema_snapshot(connection_id, refresh)
+    record = storage.get_schema_snapshot(snapshot_id)
+    if record is None:
+        raise ValueError(f"Schema snapshot {snapshot_id} not found")
+    return record.snapshot
+
+
+@app.post("/api/schema-diff")
+async def diff_schema(request: SchemaDiffRequest):
+    """Compare two schemas and return the DDL that makes the target match the source"""
+    try:
+        source = await run_in_threadpool(_resolve_schema, "source", request.sourceConnectionId,
+                                         request.sourceSnapshotId, request.refresh)
+        target = await run_in_threadpool(_resolve_schema, "target", request.targetConnectionId,
+                                         request.targetSnapshotId, request.refresh)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    try:
+        return await run_in_threadpool(diff_schemas, jsonable_encoder(source), jsonable_encoder(target))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -122,7 +395,8 @@ async def get_rows(
         rows, total = db_service.get_rows(
             connection_id, table_name, limit, offset, orderBy, orderDirection or 'asc', search
         )
-        return {"rows": rows, "total": total}
+        metrics.db_rows_returned.inc(len(rows), connection_id=connection_id, operation="get_rows")
+        return _json_response({"rows": rows, "total": total})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -160,8 +434,15 @@ async def delete_row(connection_id: str, table_name: str, row_id: str):
 @app.post("/api/connections/{connection_id}/query")
 async def execute_query(connection_id: str, request: ExecuteQueryRequest):
     """Execute a custom SQL query"""
+    start = time.perf_counter()
     try:
-        result = db_service.execute_query(connection_id, request.query)
+        # Run off the event loop so a cancel request can be served meanwhile
+        result = await run_in_threadpool(
+            db_service.execute_query, connection_id, request.query,
+            timeout_ms=request.timeoutMs, request_id=request.requestId
+        )
+        statement_stats.record(connection_id, request.query, result.executionTime, result.rowCount)
+        metrics.db_rows_returned.inc(result.rowCount, connection_id=connection_id, operation="query")
         # Save to query history
         storage.add_query_history(
             connection_id, 
@@ -171,17 +452,12 @@ async def execute_query(connection_id: str, request: ExecuteQueryRequest):
             result.rowCount
         )
         
-        # Track slow queries (threshold: 1 second)
-        if result.executionTime > 1.0:
-            storage.add_slow_query(
-                connection_id,
-                request.query,
-                result.executionTime,
-                result.rowCount
-            )
-        
-        return result.model_dump()
+        return _json_response(result)
     except Exception as e:
+        # Unknown connection IDs come from the URL; they must not create stats entries
+        if connection_id in db_service.connections:
+            statement_stats.record(connection_id, request.query, (time.perf_counter() - start) * 1000,
+                                   success=False)
         # Save failed query to history
         storage.add_query_history(
             connection_id, 
@@ -340,6 +616,21 @@ async def bulk_insert(connection_id: str, table_name: str, request: BulkInsertRe
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/api/connections/{connection_id}/tables/{table_name}/bulk-upsert")
+async def bulk_upsert(connection_id: str, table_name: str, request: BulkUpsertRequest):
+    """Bulk insert rows, updating rows that conflict"""
+    try:
+        result = db_service.bulk_upsert(
+            connection_id, table_name, request.rows,
+            conflict_columns=request.conflictColumns,
+            update_columns=request.updateColumns,
+            batch_size=request.batchSize
+        )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/connections/{connection_id}/tables/{table_name}/bulk-update")
 async def bulk_update(connection_id: str, table_name: str, request: BulkUpdateRequest):
     """Bulk update rows"""
@@ -350,6 +641,17 @@ async def bulk_update(connection_id: str, table_name: str, request: BulkUpdateRe
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/api/connections/{connection_id}/tables/{table_name}/bulk-changeset")
+async def bulk_changeset(connection_id: str, table_name: str, request: BulkChangesetRequest):
+    """Apply per-row changes in one transaction"""
+    try:
+        changes = [change.model_dump() for change in request.changes]
+        result = db_service.bulk_changeset(connection_id, table_name, changes)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/connections/{connection_id}/tables/{table_name}/bulk-delete")
 async def bulk_delete(connection_id: str, table_name: str, request: BulkDeleteRequest):
     """Bulk delete rows"""
@@ -376,8 +678,11 @@ async def get_relationships(connection_id: str, tableName: Optional[str] = None)
 async def create_index(connection_id: str, table_name: str, request: CreateIndexRequest):
     """Create an index"""
     try:
-        db_service.create_index(connection_id, table_name, request.indexName, request.columns, request.unique)
-        return {"success": True}
+        result = await run_in_threadpool(
+            db_service.create_index, connection_id, table_name, request.indexName, request.columns,
+            request.unique, request.online
+        )
+        return {"success": True, **result}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -392,11 +697,30 @@ async def drop_index(connection_id: str, table_name: str, index_name: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.delete("/api/connections/{connection_id}/indexes/invalid")
+async def drop_invalid_indexes(connection_id: str, table: Optional[str] = None):
+    """Drop invalid indexes left behind by failed concurrent builds (PostgreSQL)"""
+    try:
+        dropped = await run_in_threadpool(db_service.drop_invalid_indexes, connection_id, table)
+        return {"dropped": dropped}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/tables/{table_name}/indexes/health")
+async def get_index_health(connection_id: str, table_name: str):
+    """Get unused and redundant indexes with their size and write cost"""
+    try:
+        return await run_in_threadpool(db_service.get_index_health, connection_id, table_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/connections/{connection_id}/tables/{table_name}/index-suggestions")
-async def get_index_suggestions(connection_id: str, table_name: str):
+async def get_index_suggestions(connection_id: str, table_name: str, limit: int = 5):
     """Get index suggestions"""
     try:
-        suggestions = db_service.get_index_suggestions(connection_id, table_name)
+        suggestions = await run_in_threadpool(db_service.get_index_suggestions, connection_id, table_name, limit)
         return suggestions
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -441,10 +765,12 @@ async def get_constraints(connection_id: str, table_name: str):
 
 # Table Analysis Route
 @app.get("/api/connections/{connection_id}/tables/{table_name}/analyze")
-async def analyze_table(connection_id: str, table_name: str):
+async def analyze_table(connection_id: str, table_name: str, sampleSize: int = 10000, refresh: bool = False):
     """Analyze table and get statistics"""
     try:
-        analysis = db_service.analyze_table(connection_id, table_name)
+        analysis = await run_in_threadpool(
+            db_service.analyze_table, connection_id, table_name, sample_size=sampleSize, refresh=refresh
+        )
         return analysis
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -508,12 +834,27 @@ async def delete_saved_query(query_id: str):
 async def explain_query(connection_id: str, request: models.QueryExplainRequest):
     """Explain/analyze a query to show execution plan"""
     try:
-        result = db_service.explain_query(connection_id, request.query, request.analyze)
+        result = await run_in_threadpool(
+            db_service.explain_query, connection_id, request.query, request.analyze,
+            timeout_ms=request.timeoutMs, request_id=request.requestId
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/api/connections/{connection_id}/query/{request_id}/cancel")
+async def cancel_query(connection_id: str, request_id: str):
+    """Cancel a running query by the request ID it was submitted with"""
+    try:
+        cancelled = db_service.cancel_query(connection_id, request_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not cancelled:
+        raise HTTPException(status_code=404, detail="No running query with that request ID")
+    return {"success": True}
+
+
 # Backup and Restore Routes
 @app.post("/api/connections/{connection_id}/backup")
 async def create_backup(connection_id: str, request: models.BackupRequest):
@@ -577,15 +918,37 @@ async def get_backups(connection_id: str):
 
 # Performance Monitoring Routes
 @app.get("/api/connections/{connection_id}/performance/metrics")
-async def get_performance_metrics(connection_id: str):
+async def get_performance_metrics(connection_id: str, window: str = "1h"):
     """Get performance metrics for a connection"""
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unsupported window: {window}")
     try:
-        metrics = db_service.get_performance_stats(connection_id)
+        metrics = db_service.get_performance_stats(connection_id, window)
         return metrics
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/connections/{connection_id}/performance/history")
+async def get_performance_history(connection_id: str, resolution: str = "1m", limit: int = 1440):
+    """Get sampled performance metrics over time, oldest first"""
+    if resolution not in [name for name, _, _ in sampler.resolutions]:
+        raise HTTPException(status_code=400, detail=f"Unsupported resolution: {resolution}")
+    try:
+        samples = storage.get_performance_metrics(connection_id, limit, resolution)
+        return [sample.model_dump() for sample in samples]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/performance/latency")
+async def get_latency_sketches(connection_id: str, window: str = "5m"):
+    """Get serialized latency sketches per operation, for merging across workers"""
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unsupported window: {window}")
+    return latency.export(connection_id, window)
+
+
 @app.get("/api/connections/{connection_id}/performance/slow-queries")
 async def get_slow_queries(connection_id: str, limit: int = 50):
     """Get slow queries for a connection"""
@@ -596,6 +959,65 @@ async def get_slow_queries(connection_id: str, limit: int = 50):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/connections/{connection_id}/performance/slow-queries/settings")
+async def get_slow_query_settings(connection_id: str):
+    """Get the slow query threshold for a connection"""
+    threshold_ms, percentile = slow_log.settings.get(connection_id, (None, None))
+    return {
+        "thresholdMs": threshold_ms,
+        "percentile": percentile,
+        "effectiveThresholdMs": round(slow_log.threshold(connection_id), 3)
+    }
+
+
+@app.put("/api/connections/{connection_id}/performance/slow-queries/settings")
+async def update_slow_query_settings(connection_id: str, settings: SlowQuerySettings):
+    """Set the slow query threshold for a connection, in ms or as a latency percentile"""
+    try:
+        slow_log.configure(connection_id, settings.thresholdMs, settings.percentile)
+        storage.update_connection(connection_id, slowQueryThresholdMs=settings.thresholdMs,
+                                  slowQueryPercentile=settings.percentile)
+        return await get_slow_query_settings(connection_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/performance/statements")
+async def get_statement_statistics(connection_id: str, orderBy: str = "totalTime", limit: int = 50):
+    """Get aggregate statistics per normalized statement, most expensive first"""
+    try:
+        return statement_stats.get(connection_id, orderBy, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/connections/{connection_id}/performance/statements")
+async def reset_statement_statistics(connection_id: str):
+    """Reset statement statistics for a connection"""
+    try:
+        statement_stats.reset(connection_id)
+        return {"success": True}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/admission")
+async def get_admission_metrics(connection_id: str):
+    """Get admission control limits and queue metrics for a connection"""
+    gate = admission.gate(connection_id)
+    if gate is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return gate.metrics()
+
+
+@app.get("/api/admission")
+async def get_all_admission_metrics():
+    """Get admission control metrics for every connection"""
+    return admission.metrics()
+
+
 # Data Validation Routes
 @app.get("/api/connections/{connection_id}/validations")
 async def get_validations(connection_id: str):
@@ -628,29 +1050,237 @@ async def delete_validation(validation_id: str):
 
 
 @app.post("/api/connections/{connection_id}/tables/{table_name}/validate")
-async def validate_table_data(connection_id: str, table_name: str):
+async def validate_table_data(connection_id: str, table_name: str, incremental: bool = False, reconcile: bool = False):
     """Run validation on table data"""
     try:
-        # Get validation rules for this connection
-        validations = storage.get_validations(connection_id)
+        rules_dict = _get_table_validation_rules(connection_id, table_name)
         
-        # Filter rules for this table
-        table_rules = [v for v in validations if v.tableName == table_name and v.enabled]
-        
-        if not table_rules:
+        if not rules_dict:
             return {"message": "No validation rules defined for this table", "results": []}
         
-        # Convert to dict format for validation
-        rules_dict = [v.model_dump() for v in table_rules]
-        
         # Run validation
-        results = db_service.validate_data(connection_id, table_name, rules_dict)
+        results = db_service.validate_data(connection_id, table_name, rules_dict,
+                                           incremental=incremental, reconcile=reconcile)
         
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _get_table_validation_rules(connection_id: str, table_name: str) -> List[Dict[str, Any]]:
+    """Get the enabled validation rules for a table as dicts"""
+    validations = storage.get_validations(connection_id)
+    return [v.model_dump() for v in validations if v.tableName == table_name and v.enabled]
+
+
+@app.post("/api/connections/{connection_id}/tables/{table_name}/compare")
+async def compare_table_data(connection_id: str, table_name: str, request: models.CompareDataRequest):
+    """Find rows that differ between a table and a copy of it"""
+    try:
+        return await run_in_threadpool(
+            db_service.compare_table_data, connection_id, table_name,
+            target_connection_id=request.targetConnectionId, target_table=request.targetTable,
+            columns=request.columns, leaf_size=request.leafSize, max_differences=request.maxDifferences
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Background Job Routes
+def _build_job_task(connection_id: str, request: models.SubmitJobRequest):
+    """Validate job parameters and build the task that runs on the worker pool"""
+    table_name = request.tableName
+    if request.type in ("import", "validate", "analyze", "compare", "copy", "index") and not table_name:
+        raise ValueError(f"tableName is required for {request.type} jobs")
+    
+    if request.type == "backup":
+        backup = models.BackupRequest(**request.params)
+        
+        def task(context: JobContext) -> JobOutput:
+            content, size = db_service.create_backup(
+                connection_id,
+                tables=backup.tables,
+                format=backup.format,
+                include_schema=backup.includeSchema,
+                include_data=backup.includeData,
+                progress=context.report
+            )
+            table_names = backup.tables or [t.name for t in db_service.get_tables(connection_id)]
+            metadata = storage.create_backup_metadata(
+                connection_id,
+                f"backup_{connection_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{backup.format}",
+                backup.format,
+                size,
+                table_names
+            )
+            media_type = 'application/sql' if backup.format == 'sql' else 'application/json'
+            return JobOutput(result={"backupId": metadata.id, "size": size}, content=content,
+                             filename=metadata.filename, media_type=media_type)
+        return task
+    
+    if request.type == "restore":
+        restore = models.RestoreRequest(**request.params)
+        return lambda context: db_service.restore_backup(
+            connection_id, restore.backup, restore.format, progress=context.report
+        )
+    
+    if request.type == "import":
+        import_request = models.ImportDataRequest(**request.params)
+        return lambda context: db_service.import_data(
+            connection_id, table_name, import_request.format, import_request.data, progress=context.report
+        )
+    
+    if request.type == "export":
+        format = request.params.get("format", "sql" if not table_name else "json")
+        if format not in ("json", "csv", "sql"):
+            raise ValueError(f"Unsupported format: {format}")
+        if format != "sql" and not table_name:
+            raise ValueError("tableName is required for json and csv exports")
+        
+        def task(context: JobContext) -> JobOutput:
+            if format == "sql":
+                content = db_service.export_sql_dump(connection_id, table_name, progress=context.report)
+                media_type = 'application/sql'
+            else:
+                content = db_service.export_data(connection_id, table_name, format, progress=context.report)
+                media_type = 'application/json' if format == 'json' else 'text/csv'
+            filename = f"{table_name or 'database_dump'}.{format}"
+            return JobOutput(result={"size": len(content)}, content=content,
+                             filename=filename, media_type=media_type)
+        return task
+    
+    if request.type == "validate":
+        rules_dict = _get_table_validation_rules(connection_id, table_name)
+        return lambda context: {
+            "results": db_service.validate_data(
+                connection_id, table_name, rules_dict, progress=context.report,
+                incremental=bool(request.params.get("incremental", False)),
+                reconcile=bool(request.params.get("reconcile", False))
+            )
+        }
+    
+    if request.type == "compare":
+        compare = models.CompareDataRequest(**request.params)
+        return lambda context: db_service.compare_table_data(
+            connection_id, table_name, target_connection_id=compare.targetConnectionId,
+            target_table=compare.targetTable, columns=compare.columns, leaf_size=compare.leafSize,
+            max_differences=compare.maxDifferences, progress=context.report
+        )
+    
+    if request.type == "copy":
+        copy = models.CopyTableRequest(**request.params)
+        db_service.get_connection(copy.targetConnectionId)
+        resumed = storage.get_job(request.params["resumeFrom"]) if request.params.get("resumeFrom") else None
+        return lambda context: db_service.copy_table(
+            connection_id, table_name, copy.targetConnectionId, target_table=copy.targetTable,
+            if_exists=copy.ifExists, readers=copy.readers, batch_size=copy.batchSize,
+            checkpoint=resumed.checkpoint if resumed else None,
+            progress=context.report, save_checkpoint=context.save_checkpoint
+        )
+    
+    if request.type == "index":
+        # Jobs exist for long builds, so they default to not blocking writes
+        index = models.CreateIndexRequest(**{"online": True, **request.params})
+        return lambda context: db_service.create_index(
+            connection_id, table_name, index.indexName, index.columns, unique=index.unique,
+            online=index.online, progress=context.report
+        )
+    
+    # analyze
+    return lambda context: db_service.analyze_table(
+        connection_id, table_name, progress=context.report,
+        sample_size=int(request.params.get("sampleSize", 10000)), refresh=bool(request.params.get("refresh", True))
+    )
+
+
+@app.post("/api/connections/{connection_id}/jobs")
+async def submit_job(connection_id: str, request: models.SubmitJobRequest):
+    """Submit a long-running operation as a background job"""
+    try:
+        db_service.get_connection(connection_id)
+        task = _build_job_task(connection_id, request)
+        params = {"tableName": request.tableName, **request.params} if request.tableName else dict(request.params)
+        # Keep bulky payloads out of the stored job record
+        for key in ("data", "backup"):
+            if key in params:
+                params[key] = f"<{len(str(params[key]))} characters>"
+        job = job_manager.submit(connection_id, request.type, params, task)
+        return job.model_dump(exclude={"resultPath"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/connections/{connection_id}/jobs")
+async def get_jobs(connection_id: str, limit: int = 50):
+    """Get background jobs for a connection"""
+    try:
+        jobs = storage.get_jobs(connection_id, limit)
+        return [job.model_dump(exclude={"resultPath"}) for job in jobs]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status and progress of a job"""
+    job = storage.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.model_dump(exclude={"resultPath"})
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a pending or running job"""
+    try:
+        job = job_manager.cancel(job_id)
+        return job.model_dump(exclude={"resultPath"})
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str):
+    """Resume a failed or cancelled copy job from its last checkpoint as a new job"""
+    job = storage.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.type != "copy" or job.status not in ("failed", "cancelled") or not job.checkpoint:
+        raise HTTPException(status_code=400, detail="Only failed or cancelled copy jobs with a checkpoint can be resumed")
+    try:
+        params = {key: value for key, value in job.params.items() if key not in ("tableName", "resumeFrom")}
+        request = models.SubmitJobRequest(type="copy", tableName=job.params["tableName"],
+                                          params={**params, "resumeFrom": job_id})
+        task = _build_job_task(job.connectionId, request)
+        resumed = job_manager.submit(job.connectionId, "copy", {"tableName": request.tableName, **request.params}, task)
+        return resumed.model_dump(exclude={"resultPath"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def download_job_result(job_id: str):
+    """Download the file produced by a completed job"""
+    job = storage.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.resultPath or not os.path.isfile(job.resultPath):
+        raise HTTPException(status_code=404, detail="Job has no downloadable result")
+    return FileResponse(job.resultPath, media_type=job.resultMediaType, filename=job.resultFilename)
+
+
+@app.delete("/api/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Delete a finished job and its result"""
+    try:
+        job_manager.delete(job_id)
+        return {"success": True}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # Serve frontend static files
 dist_path = "../dist/public" if os.path.exists("../dist/public") else "dist/public"
 if os.path.exists(dist_path):
@@ -0,0 +1,215 @@
+from typing import Dict, List, Any, Callable, Tuple
+import math
+import threading
+
+
+# Default latency buckets in seconds, as used by the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class for a labelled metric family"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def remove_matching(self, label: str, value: str) -> None:
+        """Drop every series whose label has the given value"""
+        if label not in self.label_names:
+            return
+        position = self.label_names.index(label)
+        with self._lock:
+            for key in [key for key in self._values if key[position] == value]:
+                del self._values[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [per-bucket counts, sum, count]
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(series[0]), series[1], series[2])) for key, series in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges right before each scrape"""
+        self.collectors.append(collector)
+
+    def remove_connection(self, connection_id: str) -> None:
+        """Forget all series labelled with a deleted connection"""
+        for metric in self.metrics:
+            metric.remove_matching("connection_id", connection_id)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+# Global registry and the metrics shared across modules. Labels are limited to
+# connection IDs, route templates and small fixed sets; never raw SQL.
+registry = Registry()
+
+http_requests = registry.counter(
+    "omnicore_http_requests", "HTTP requests by route template and status",
+    ("method", "route", "status"))
+http_request_seconds = registry.histogram(
+    "omnicore_http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route"))
+http_response_bytes = registry.counter(
+    "omnicore_http_response_bytes", "HTTP response body bytes by route template",
+    ("method", "route"))
+db_operation_seconds = registry.histogram(
+    "omnicore_db_operation_duration_seconds", "Database operation latency",
+    ("connection_id", "dialect", "operation"))
+db_operation_errors = registry.counter(
+    "omnicore_db_operation_errors", "Database operations that raised an error",
+    ("connection_id", "dialect", "operation"))
+db_rows_returned = registry.counter(
+    "omnicore_db_rows_returned", "Rows returned to clients",
+    ("connection_id", "operation"))
+transfer_rows = registry.counter(
+    "omnicore_transfer_rows", "Rows moved by imports and exports",
+    ("connection_id", "direction"))
+transfer_bytes = registry.counter(
+    "omnicore_transfer_bytes", "Bytes moved by imports and exports",
+    ("connection_id", "direction"))
+cache_requests = registry.counter(
+    "omnicore_cache_requests", "Cache lookups by cache and result",
+    ("cache", "result"))
+pool_size = registry.gauge(
+    "omnicore_pool_size", "Configured connection pool size", ("connection_id", "dialect"))
+pool_checked_out = registry.gauge(
+    "omnicore_pool_checked_out", "Pooled database connections currently in use", ("connection_id", "dialect"))
+pool_overflow = registry.gauge(
+    "omnicore_pool_overflow", "Connections opened beyond the pool size", ("connection_id", "dialect"))
+admission_active = registry.gauge(
+    "omnicore_admission_active", "Requests running per connection and lane", ("connection_id", "lane"))
+admission_queued = registry.gauge(
+    "omnicore_admission_queued", "Requests waiting per connection and lane", ("connection_id", "lane"))
+storage_records = registry.gauge(
+    "omnicore_storage_records", "Records held by the metadata storage backend", ("kind",))
+storage_bytes = registry.gauge(
+    "omnicore_storage_bytes", "Size of the metadata storage file", ())
+jobs_by_status = registry.gauge(
+    "omnicore_jobs", "Background jobs by status", ("status",))
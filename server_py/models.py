@@ -21,6 +21,11 @@ class ConnectionConfig(BaseModel):
     database: Optional[str] = None
     username: Optional[str] = None
     password: Optional[str] = None
+    statementTimeout: Optional[int] = None
+    maxConcurrentQueries: Optional[int] = None
+    maxQueuedRequests: Optional[int] = None
+    slowQueryThresholdMs: Optional[float] = None
+    slowQueryPercentile: Optional[float] = None
 
 
 class InsertConnectionConfig(BaseModel):
@@ -33,12 +38,19 @@ class InsertConnectionConfig(BaseModel):
     database: Optional[str] = None
     username: Optional[str] = None
     password: Optional[str] = None
+    statementTimeout: Optional[int] = None
+    maxConcurrentQueries: Optional[int] = None
+    maxQueuedRequests: Optional[int] = None
+    slowQueryThresholdMs: Optional[float] = None
+    slowQueryPercentile: Optional[float] = None
 
 
 class TableMetadata(BaseModel):
     name: str
     rowCount: int
     columnCount: int
+    rowCountEstimated: bool = False
+    sizeBytes: Optional[int] = None
 
 
 class ColumnMetadata(BaseModel):
@@ -90,6 +102,8 @@ class ModifyColumnRequest(BaseModel):
 
 class ExecuteQueryRequest(BaseModel):
     query: str
+    timeoutMs: Optional[int] = None
+    requestId: Optional[str] = None
 
 
 class ImportDataRequest(BaseModel):
@@ -117,6 +131,13 @@ class BulkInsertRequest(BaseModel):
     rows: List[Dict[str, Any]]
 
 
+class BulkUpsertRequest(BaseModel):
+    rows: List[Dict[str, Any]]
+    conflictColumns: Optional[List[str]] = None
+    updateColumns: Optional[List[str]] = None
+    batchSize: int = 500
+
+
 class BulkUpdateRequest(BaseModel):
     updates: Dict[str, Any]
     where: Dict[str, Any]
@@ -126,6 +147,15 @@ class BulkDeleteRequest(BaseModel):
     ids: List[Any]
 
 
+class RowChange(BaseModel):
+    pk: Any
+    changes: Dict[str, Any]
+
+
+class BulkChangesetRequest(BaseModel):
+    changes: List[RowChange]
+
+
 class BackupRequest(BaseModel):
     format: Literal["sql", "json"] = "sql"
     tables: Optional[List[str]] = None
@@ -158,6 +188,13 @@ class IndexSuggestion(BaseModel):
     columns: List[str]
     reason: str
     impact: Literal["high", "medium", "low"]
+    ddl: Optional[str] = None
+    statements: Optional[int] = None
+    workloadShare: Optional[float] = None
+    estimatedCostBefore: Optional[float] = None
+    estimatedCostAfter: Optional[float] = None
+    estimatedImprovement: Optional[float] = None
+    estimateMethod: Optional[Literal["hypopg", "scratch_schema"]] = None
 
 
 class ValidationRule(BaseModel):
@@ -171,6 +208,7 @@ class CreateIndexRequest(BaseModel):
     indexName: str
     columns: List[str]
     unique: bool = False
+    online: bool = False  # Build without blocking writes (PostgreSQL and MySQL)
 
 
 class ConstraintRequest(BaseModel):
@@ -207,6 +245,8 @@ class InsertSavedQuery(BaseModel):
 class QueryExplainRequest(BaseModel):
     query: str
     analyze: bool = False
+    timeoutMs: Optional[int] = None
+    requestId: Optional[str] = None
 
 
 class QueryExplainResult(BaseModel):
@@ -227,6 +267,10 @@ class PerformanceMetrics(BaseModel):
     p95ExecutionTime: float
     errorRate: float
     activeConnections: int
+    resolution: str = "10s"
+    queriesPerSecond: float = 0.0
+    p50ExecutionTime: float = 0.0
+    p99ExecutionTime: float = 0.0
 
 
 class SlowQuery(BaseModel):
@@ -236,6 +280,17 @@ class SlowQuery(BaseModel):
     executionTime: float
     timestamp: str
     rowCount: Optional[int] = None
+    fingerprint: Optional[str] = None
+    count: int = 1
+    maxExecutionTime: Optional[float] = None
+    avgExecutionTime: Optional[float] = None
+    firstSeen: Optional[str] = None
+    plan: Optional[str] = None
+
+
+class SlowQuerySettings(BaseModel):
+    thresholdMs: Optional[float] = None
+    percentile: Optional[float] = None
 
 
 class DataValidation(BaseModel):
@@ -247,6 +302,22 @@ class DataValidation(BaseModel):
     ruleValue: Optional[str] = None
     customExpression: Optional[str] = None
     enabled: bool = True
+    # Incremental runs check rows past a watermark on this column (default: a single-column primary key)
+    watermarkColumn: Optional[str] = None
+    # Incremental runs between automatic full passes; None never reconciles automatically
+    reconcileEvery: Optional[int] = None
+
+
+class ValidationState(BaseModel):
+    validationId: str
+    connectionId: str
+    watermarkColumn: Optional[str] = None
+    watermark: Optional[Any] = None
+    violationCount: int = 0
+    sampleViolations: List[Any] = []
+    incrementalRuns: int = 0
+    lastRun: Optional[str] = None
+    lastFullRun: Optional[str] = None
 
 
 class ValidationResult(BaseModel):
@@ -266,3 +337,80 @@ class BackupMetadata(BaseModel):
     timestamp: str
     tables: List[str]
     status: Literal["pending", "completed", "failed"]
+
+
+class SchemaSnapshotRecord(BaseModel):
+    id: str
+    connectionId: str
+    name: Optional[str] = None
+    version: str
+    dialect: str
+    createdAt: str
+    tableCount: int
+    snapshot: Optional[Dict[str, Any]] = None
+
+
+class SaveSchemaSnapshotRequest(BaseModel):
+    name: Optional[str] = None
+
+
+class SchemaDiffRequest(BaseModel):
+    sourceConnectionId: Optional[str] = None
+    sourceSnapshotId: Optional[str] = None
+    targetConnectionId: Optional[str] = None
+    targetSnapshotId: Optional[str] = None
+    refresh: bool = False
+
+
+class CompareDataRequest(BaseModel):
+    targetConnectionId: Optional[str] = None
+    targetTable: Optional[str] = None
+    columns: Optional[List[str]] = None
+    leafSize: int = 1000
+    maxDifferences: int = 100
+
+
+class CopyTableRequest(BaseModel):
+    targetConnectionId: str
+    targetTable: Optional[str] = None
+    ifExists: Literal["fail", "append", "truncate", "replace"] = "fail"
+    readers: int = 4
+    batchSize: int = 5000
+
+
+JobType = Literal["backup", "restore", "import", "export", "validate", "analyze", "compare", "copy", "index"]
+
+
+class JobProgress(BaseModel):
+    rowsProcessed: int = 0
+    bytesProcessed: int = 0
+    totalRows: Optional[int] = None
+    totalBytes: Optional[int] = None
+    percent: Optional[float] = None
+    etaSeconds: Optional[float] = None
+    message: Optional[str] = None
+
+
+class Job(BaseModel):
+    id: str
+    connectionId: str
+    type: JobType
+    status: Literal["pending", "running", "completed", "failed", "cancelled"]
+    params: Dict[str, Any] = {}
+    progress: JobProgress = JobProgress()
+    createdAt: str
+    startedAt: Optional[str] = None
+    finishedAt: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Any] = None
+    resultFilename: Optional[str] = None
+    resultMediaType: Optional[str] = None
+    resultSize: Optional[int] = None
+    resultPath: Optional[str] = None
+    checkpoint: Optional[Dict[str, Any]] = None
+
+
+class SubmitJobRequest(BaseModel):
+    type: JobType
+    tableName: Optional[str] = None
+    params: Dict[str, Any] = {}
@@ -0,0 +1,148 @@
+from typing import Dict, Optional, List, Tuple
+from datetime import datetime
+import hashlib
+import os
+import re
+import threading
+
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"(?:\b[EeNnXxBb])?'(?:[^'\\]|''|\\.)*'")
+_DOLLAR_STRING = re.compile(r"\$(\w*)\$.*?\$\1\$", re.S)
+# Driver bind parameters: $1, :name, %s and %(name)s; PostgreSQL :: casts are left alone
+_BIND = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):[A-Za-z_]\w*")
+_NUMBER = re.compile(r"(?<![\w.$:])[-+]?(?:0x[0-9a-f]+|\d+(?:\.\d*)?(?:e[-+]?\d+)?|\.\d+)\b", re.I)
+_LIST = r"\(\s*\?(?:\s*,\s*\?)*\s*\)"
+_IN_LIST = re.compile(r"\b(not\s+)?in\s*" + _LIST, re.I)
+_VALUES_LIST = re.compile(r"\bvalues\s*" + _LIST + r"(?:\s*,\s*" + _LIST + r")*", re.I)
+_PUNCTUATION = re.compile(r"([(),]|[=<>!]+)")
+_WHITESPACE = re.compile(r"\s+")
+_TIGHTEN = re.compile(r"(?<=\() | (?=[),])")
+
+
+def normalize_query(query: str) -> str:
+    """Replace literals and bind parameters with ? and collapse IN/VALUES lists so equivalent statements match
+
+    Tokens are separated by single spaces, except inside parentheses and before commas,
+    so the result does not depend on the original spacing.
+    """
+    normalized = _COMMENT.sub(" ", query)
+    normalized = _DOLLAR_STRING.sub("?", normalized)
+    normalized = _STRING.sub("?", normalized)
+    normalized = _BIND.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PUNCTUATION.sub(r" \1 ", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized)
+    normalized = _TIGHTEN.sub("", normalized)
+    normalized = _IN_LIST.sub(lambda m: f"{m.group(1) or ''}in (...)", normalized)
+    normalized = _VALUES_LIST.sub("values (...)", normalized)
+    normalized = normalized.strip().rstrip(";").strip()
+    return normalized.lower()
+
+
+def fingerprint(query: str) -> Tuple[str, str]:
+    """Return (fingerprint id, normalized text) for a query"""
+    normalized = normalize_query(query)
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest(), normalized
+
+
+class StatementStats:
+    """Running totals for one statement fingerprint"""
+    __slots__ = ("fingerprint", "query", "calls", "total_time", "min_time", "max_time",
+                 "rows", "errors", "first_seen", "last_seen")
+
+    def __init__(self, fingerprint_id: str, query: str):
+        self.fingerprint = fingerprint_id
+        self.query = query
+        self.calls = 0
+        self.total_time = 0.0
+        self.min_time: Optional[float] = None
+        self.max_time = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.first_seen = datetime.utcnow().isoformat()
+        self.last_seen = self.first_seen
+
+    def add(self, execution_time: float, row_count: Optional[int], success: bool) -> None:
+        self.calls += 1
+        self.total_time += execution_time
+        self.min_time = execution_time if self.min_time is None else min(self.min_time, execution_time)
+        self.max_time = max(self.max_time, execution_time)
+        self.rows += row_count or 0
+        if not success:
+            self.errors += 1
+        self.last_seen = datetime.utcnow().isoformat()
+
+    def to_dict(self) -> Dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "query": self.query,
+            "calls": self.calls,
+            "totalTime": round(self.total_time, 3),
+            "meanTime": round(self.total_time / self.calls, 3) if self.calls else 0,
+            "minTime": round(self.min_time or 0.0, 3),
+            "maxTime": round(self.max_time, 3),
+            "rows": self.rows,
+            "errors": self.errors,
+            "firstSeen": self.first_seen,
+            "lastSeen": self.last_seen
+        }
+
+
+SORT_KEYS = {
+    "totalTime": lambda s: s.total_time,
+    "meanTime": lambda s: s.total_time / s.calls if s.calls else 0,
+    "maxTime": lambda s: s.max_time,
+    "calls": lambda s: s.calls,
+    "rows": lambda s: s.rows,
+    "errors": lambda s: s.errors
+}
+
+
+class StatementStatsStore:
+    """Per-connection aggregate statistics keyed by statement fingerprint.
+
+    Like pg_stat_statements, when a connection tracks more than max_statements
+    fingerprints the least-called 5% are dropped to make room.
+    """
+
+    def __init__(self, max_statements: int = 5000):
+        self.max_statements = max_statements
+        self._stats: Dict[str, Dict[str, StatementStats]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, connection_id: str, query: str, execution_time: float,
+               row_count: Optional[int] = None, success: bool = True) -> str:
+        """Add one execution (time in ms) and return the statement fingerprint"""
+        fingerprint_id, normalized = fingerprint(query)
+        with self._lock:
+            stats = self._stats.setdefault(connection_id, {})
+            entry = stats.get(fingerprint_id)
+            if entry is None:
+                if len(stats) >= self.max_statements:
+                    self._evict(stats)
+                entry = stats[fingerprint_id] = StatementStats(fingerprint_id, normalized)
+            entry.add(execution_time, row_count, success)
+        return fingerprint_id
+
+    def _evict(self, stats: Dict[str, StatementStats]) -> None:
+        victims = sorted(stats.values(), key=lambda s: (s.calls, s.last_seen))
+        for entry in victims[:max(1, len(victims) // 20)]:
+            del stats[entry.fingerprint]
+
+    def get(self, connection_id: str, order_by: str = "totalTime", limit: int = 50) -> List[Dict]:
+        """Statement statistics for a connection, highest first by the given key"""
+        if order_by not in SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {order_by}")
+        with self._lock:
+            entries = list(self._stats.get(connection_id, {}).values())
+            entries.sort(key=SORT_KEYS[order_by], reverse=True)
+            return [entry.to_dict() for entry in entries[:limit]]
+
+    def reset(self, connection_id: str) -> None:
+        with self._lock:
+            self._stats.pop(connection_id, None)
+
+
+# Global statement statistics instance
+statement_stats = StatementStatsStore(max_statements=int(os.getenv("STATEMENT_STATS_MAX", "5000")))
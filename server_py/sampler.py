@@ -0,0 +1,120 @@
+from typing import Dict, Optional, List, Tuple
+from datetime import datetime
+from models import PerformanceMetrics
+from latency import latency, LatencySketch
+from slow_log import slow_log
+from storage import storage
+import asyncio
+import os
+import threading
+import time
+
+
+class _Rollup:
+    """Sketch accumulating samples until its period closes"""
+    __slots__ = ("period", "sketch")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.sketch = LatencySketch()
+
+
+class MetricsSampler:
+    """Samples per-connection performance at a fixed interval and keeps downsampled series.
+
+    Every interval the operations recorded since the last tick become one
+    sample. Samples are also merged into open 1 minute and 1 hour rollups,
+    which are written out as their own points once the period ends. Each
+    resolution keeps a fixed number of points: an hour of base samples, a day
+    of minutes and thirty days of hours.
+    """
+
+    def __init__(self, interval: int = 10):
+        self.interval = interval
+        # resolution name -> (period in seconds, points kept)
+        self.resolutions: List[Tuple[str, int, int]] = [
+            (f"{interval}s", interval, 3600 // interval),
+            ("1m", 60, 1440),
+            ("1h", 3600, 720)
+        ]
+        self._current: Dict[str, LatencySketch] = {}
+        self._rollups: Dict[Tuple[str, str], _Rollup] = {}
+        self._lock = threading.Lock()
+        latency.listeners.append(self._observe)
+
+    def _observe(self, connection_id: str, operation: str, duration_ms: float, error: bool) -> None:
+        # Individual statements are already part of the operation that ran them
+        if operation == "statement":
+            return
+        with self._lock:
+            sketch = self._current.get(connection_id)
+            if sketch is None:
+                sketch = self._current[connection_id] = LatencySketch()
+            sketch.record(duration_ms, error)
+
+    def _to_metrics(self, connection_id: str, sketch: LatencySketch, resolution: str, seconds: int,
+                    end: float, active_connections: int) -> PerformanceMetrics:
+        return PerformanceMetrics(
+            connectionId=connection_id,
+            timestamp=datetime.utcfromtimestamp(end).isoformat(),
+            resolution=resolution,
+            totalQueries=sketch.count,
+            slowQueries=sketch.count_above(slow_log.threshold(connection_id)),
+            queriesPerSecond=round(sketch.count / seconds, 3),
+            avgExecutionTime=round(sketch.total / sketch.count, 3) if sketch.count else 0.0,
+            p50ExecutionTime=round(sketch.quantile(0.5), 3),
+            p95ExecutionTime=round(sketch.quantile(0.95), 3),
+            p99ExecutionTime=round(sketch.quantile(0.99), 3),
+            errorRate=round(sketch.errors / sketch.count, 3) if sketch.count else 0.0,
+            activeConnections=active_connections
+        )
+
+    def sample(self, connection_ids: List[str], pool_checked_out: Dict[str, int],
+               now: Optional[float] = None) -> None:
+        """Record one base sample per connection and close any finished rollup periods"""
+        now = time.time() if now is None else now
+        with self._lock:
+            current, self._current = self._current, {}
+
+        base_name, base_seconds, base_points = self.resolutions[0]
+        for connection_id in connection_ids:
+            sketch = current.get(connection_id, LatencySketch())
+            active = pool_checked_out.get(connection_id, 0)
+            storage.add_performance_metrics(
+                self._to_metrics(connection_id, sketch, base_name, base_seconds, now, active), base_points
+            )
+
+            for name, seconds, points in self.resolutions[1:]:
+                period = int(now // seconds)
+                rollup = self._rollups.get((connection_id, name))
+                if rollup is not None and rollup.period != period:
+                    storage.add_performance_metrics(
+                        self._to_metrics(connection_id, rollup.sketch, name, seconds,
+                                         (rollup.period + 1) * seconds, active), points
+                    )
+                    rollup = None
+                if rollup is None:
+                    rollup = self._rollups[(connection_id, name)] = _Rollup(period)
+                rollup.sketch.merge(sketch)
+
+        # Forget rollups of connections that are gone
+        for key in [key for key in self._rollups if key[0] not in connection_ids]:
+            del self._rollups[key]
+
+    async def run(self, connections) -> None:
+        """Sample every interval until cancelled; `connections` maps IDs to engines"""
+        while True:
+            await asyncio.sleep(self.interval - time.time() % self.interval)
+            try:
+                engines = dict(connections)
+                checked_out = {
+                    connection_id: engine.pool.checkedout()
+                    for connection_id, engine in engines.items() if hasattr(engine.pool, "checkedout")
+                }
+                await asyncio.to_thread(self.sample, list(engines), checked_out)
+            except Exception:
+                pass  # A failed sample must not stop the sampler
+
+
+# Global sampler instance
+sampler = MetricsSampler(interval=int(os.getenv("METRICS_SAMPLE_INTERVAL", "10")))
@@ -0,0 +1,358 @@
+from typing import Dict, List, Any, Tuple
+import hashlib
+import json
+
+
+# Column attributes compared by the diff; the others restate keys and indexes
+COLUMN_FIELDS = ("type", "nullable", "defaultValue", "autoIncrement")
+
+# Spellings of the same type across dialects and reflection paths
+TYPE_ALIASES = {
+    "INT": "INTEGER",
+    "INT4": "INTEGER",
+    "INT8": "BIGINT",
+    "INT2": "SMALLINT",
+    "BOOL": "BOOLEAN",
+    "FLOAT4": "REAL",
+    "FLOAT8": "DOUBLE PRECISION",
+    "DOUBLE": "DOUBLE PRECISION",
+    "CHARACTER VARYING": "VARCHAR",
+    "CHARACTER": "CHAR",
+    "TIMESTAMP WITHOUT TIME ZONE": "TIMESTAMP",
+    "TIMESTAMP WITH TIME ZONE": "TIMESTAMPTZ",
+}
+
+
+def normalize_type(type_name: str) -> str:
+    """Upper-case a type and map dialect aliases to one spelling, keeping any length or precision"""
+    base, paren, rest = type_name.strip().upper().partition("(")
+    base = TYPE_ALIASES.get(base.strip(), base.strip())
+    return base + (paren + rest.replace(" ", "") if paren else "")
+
+
+def _canonical_table(table: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a snapshot table that the diff compares.
+
+    Indexes and constraints are identified by what they enforce rather than by
+    name, since generated names often differ between environments.
+    """
+    return {
+        "columns": {
+            column["name"]: {
+                "type": normalize_type(column["type"]),
+                "nullable": column["nullable"],
+                "defaultValue": column.get("defaultValue"),
+                "autoIncrement": bool(column.get("autoIncrement"))
+            }
+            for column in table["columns"]
+        },
+        "primaryKey": list(table.get("primaryKey") or []),
+        "indexes": sorted(_index_key(index) for index in table.get("indexes", [])),
+        "foreignKeys": sorted(_foreign_key_key(fk) for fk in table.get("foreignKeys", [])),
+        "uniqueConstraints": sorted(tuple(uc["columns"]) for uc in table.get("uniqueConstraints", [])),
+        "checkConstraints": sorted(_check_key(cc) for cc in table.get("checkConstraints", []))
+    }
+
+
+def _index_key(index: Dict[str, Any]) -> Tuple:
+    return (tuple(index["columns"]), bool(index["unique"]))
+
+
+def _foreign_key_key(fk: Dict[str, Any]) -> Tuple:
+    return (tuple(fk["columns"]), fk["referredTable"], tuple(fk["referredColumns"]),
+            (fk.get("onDelete") or "NO ACTION").upper(), (fk.get("onUpdate") or "NO ACTION").upper())
+
+
+def _check_key(cc: Dict[str, Any]) -> str:
+    # Databases re-render expressions, so compare them without spacing or outer parentheses
+    expression = "".join(cc["expression"].split()).lower()
+    while expression.startswith("(") and expression.endswith(")"):
+        expression = expression[1:-1]
+    return expression
+
+
+def table_digest(canonical: Dict[str, Any]) -> str:
+    """Hash of a table's compared content"""
+    content = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _keyed(items: List[Dict[str, Any]], key) -> Dict[Any, Dict[str, Any]]:
+    return {key(item): item for item in items}
+
+
+def _added_removed(source: Dict[Any, Any], target: Dict[Any, Any]) -> Tuple[List[Any], List[Any]]:
+    return ([source[key] for key in source if key not in target], [target[key] for key in target if key not in source])
+
+
+class SchemaDiff:
+    """Differences between two schema snapshots and the DDL that reconciles them.
+
+    The target is the schema that would change: objects only in the source
+    are reported as added, objects only in the target as removed, and the DDL
+    is written for the target's dialect. Each table is hashed first, and only
+    tables whose hashes differ are compared object by object, so comparing
+    large, mostly identical schemas costs little more than hashing them.
+
+    SQLite cannot alter columns or add and drop constraints in place; such
+    changes are reported as warnings instead of statements.
+    """
+
+    def __init__(self, source: Dict[str, Any], target: Dict[str, Any]):
+        self.source = source
+        self.target = target
+        self.dialect = target["dialect"]
+        self.warnings: List[str] = []
+        # DDL in execution order: drops before creates, foreign keys last
+        self._phases: Dict[str, List[str]] = {
+            phase: [] for phase in ("drop_foreign_keys", "drop_constraints", "drop_indexes", "drop_tables",
+                                    "create_tables", "alter_columns", "primary_keys", "create_indexes",
+                                    "add_constraints", "add_foreign_keys")
+        }
+
+    def compute(self) -> Dict[str, Any]:
+        source_tables = {table["name"]: table for table in self.source["tables"]}
+        target_tables = {table["name"]: table for table in self.target["tables"]}
+        if self.source["dialect"] != self.target["dialect"]:
+            self.warnings.append(
+                f"Comparing {self.source['dialect']} with {self.target['dialect']}; "
+                "types are compared after normalizing common aliases")
+
+        tables = []
+        unchanged = 0
+        if self.source.get("version") != self.target.get("version"):
+            for name in sorted(source_tables.keys() | target_tables.keys()):
+                source_table, target_table = source_tables.get(name), target_tables.get(name)
+                if target_table is None:
+                    tables.append({"name": name, "status": "added"})
+                    self._create_table(source_table)
+                elif source_table is None:
+                    tables.append({"name": name, "status": "removed"})
+                    self._phases["drop_tables"].append(f"DROP TABLE {name}")
+                else:
+                    source_canonical, target_canonical = _canonical_table(source_table), _canonical_table(target_table)
+                    if table_digest(source_canonical) == table_digest(target_canonical):
+                        unchanged += 1
+                    else:
+                        tables.append(self._diff_table(source_table, target_table, source_canonical, target_canonical))
+        else:
+            unchanged = len(source_tables)
+
+        ddl = [statement for statements in self._phases.values() for statement in statements]
+        return {
+            "identical": not tables,
+            "sourceVersion": self.source.get("version"),
+            "targetVersion": self.target.get("version"),
+            "dialect": self.dialect,
+            "summary": {
+                "tablesAdded": sum(1 for table in tables if table["status"] == "added"),
+                "tablesRemoved": sum(1 for table in tables if table["status"] == "removed"),
+                "tablesChanged": sum(1 for table in tables if table["status"] == "changed"),
+                "tablesUnchanged": unchanged
+            },
+            "tables": tables,
+            "ddl": ddl,
+            "warnings": self.warnings
+        }
+
+    def _diff_table(self, source: Dict[str, Any], target: Dict[str, Any],
+                    source_canonical: Dict[str, Any], target_canonical: Dict[str, Any]) -> Dict[str, Any]:
+        name = source["name"]
+        result: Dict[str, Any] = {"name": name, "status": "changed"}
+
+        source_columns = {column["name"]: column for column in source["columns"]}
+        target_columns = {column["name"]: column for column in target["columns"]}
+        added_columns, removed_columns = _added_removed(source_columns, target_columns)
+        changed_columns = [
+            {
+                "name": column,
+                "from": {field: target_canonical["columns"][column][field] for field in COLUMN_FIELDS},
+                "to": {field: source_canonical["columns"][column][field] for field in COLUMN_FIELDS}
+            }
+            for column in source_columns
+            if column in target_columns and source_canonical["columns"][column] != target_canonical["columns"][column]
+        ]
+        if added_columns or removed_columns or changed_columns:
+            result["columns"] = {
+                "added": [column["name"] for column in added_columns],
+                "removed": [column["name"] for column in removed_columns],
+                "changed": changed_columns
+            }
+
+        # Constraints and indexes on dropped columns go with them, so drop those first
+        added_indexes, removed_indexes = _added_removed(_keyed(source.get("indexes", []), _index_key),
+                                                        _keyed(target.get("indexes", []), _index_key))
+        added_fks, removed_fks = _added_removed(_keyed(source.get("foreignKeys", []), _foreign_key_key),
+                                                _keyed(target.get("foreignKeys", []), _foreign_key_key))
+        unique_key = lambda uc: tuple(uc["columns"])
+        added_uniques, removed_uniques = _added_removed(_keyed(source.get("uniqueConstraints", []), unique_key),
+                                                        _keyed(target.get("uniqueConstraints", []), unique_key))
+        added_checks, removed_checks = _added_removed(_keyed(source.get("checkConstraints", []), _check_key),
+                                                      _keyed(target.get("checkConstraints", []), _check_key))
+
+        for fk in removed_fks:
+            self._drop_foreign_key(name, fk)
+        for uc in removed_uniques:
+            self._drop_constraint(name, uc, "unique constraint")
+        for cc in removed_checks:
+            self._drop_constraint(name, cc, "check constraint")
+        for index in removed_indexes:
+            self._phases["drop_indexes"].append(
+                f"DROP INDEX {index['name']} ON {name}" if self.dialect == 'mysql' else f"DROP INDEX {index['name']}")
+
+        for column in added_columns:
+            if self.dialect == 'sqlite' and not column["nullable"] and column.get("defaultValue") is None:
+                self.warnings.append(f"{name}.{column['name']}: SQLite cannot add a NOT NULL column without a default")
+            self._phases["alter_columns"].append(f"ALTER TABLE {name} ADD COLUMN {self._column_definition(column)}")
+        for column in removed_columns:
+            self._phases["alter_columns"].append(f"ALTER TABLE {name} DROP COLUMN {column['name']}")
+        for change in changed_columns:
+            self._alter_column(name, source_columns[change["name"]], change)
+
+        if source_canonical["primaryKey"] != target_canonical["primaryKey"]:
+            result["primaryKey"] = {"from": target_canonical["primaryKey"], "to": source_canonical["primaryKey"]}
+            self._change_primary_key(name, target_canonical["primaryKey"], source_canonical["primaryKey"])
+
+        for index in added_indexes:
+            self._phases["create_indexes"].append(self._create_index(name, index))
+        for uc in added_uniques:
+            self._add_constraint(name, uc, f"UNIQUE ({', '.join(uc['columns'])})", "unique constraint")
+        for cc in added_checks:
+            self._add_constraint(name, cc, f"CHECK ({cc['expression']})", "check constraint")
+        for fk in added_fks:
+            self._add_constraint(name, fk, self._foreign_key_clause(fk), "foreign key", phase="add_foreign_keys")
+
+        for key, added, removed, describe in (
+            ("indexes", added_indexes, removed_indexes, lambda index: index["name"]),
+            ("foreignKeys", added_fks, removed_fks,
+             lambda fk: fk.get("name") or f"({', '.join(fk['columns'])}) -> {fk['referredTable']}"),
+            ("uniqueConstraints", added_uniques, removed_uniques,
+             lambda uc: uc.get("name") or f"({', '.join(uc['columns'])})"),
+            ("checkConstraints", added_checks, removed_checks, lambda cc: cc.get("name") or cc["expression"]),
+        ):
+            if added or removed:
+                result[key] = {"added": [describe(item) for item in added], "removed": [describe(item) for item in removed]}
+        return result
+
+    def _column_definition(self, column: Dict[str, Any]) -> str:
+        column_type = column["type"]
+        definition = f"{column['name']} {column_type}"
+        default = column.get("defaultValue")
+        if column.get("autoIncrement"):
+            if self.dialect == 'postgresql':
+                # Serial types create their own sequence; a copied nextval() default would not resolve
+                serial = {"INTEGER": "SERIAL", "BIGINT": "BIGSERIAL", "SMALLINT": "SMALLSERIAL"}.get(normalize_type(column_type))
+                if serial:
+                    definition, default = f"{column['name']} {serial}", None
+            elif self.dialect == 'mysql':
+                definition += " AUTO_INCREMENT"
+                default = None
+        if not column["nullable"]:
+            definition += " NOT NULL"
+        if default is not None:
+            definition += f" DEFAULT {default}"
+        return definition
+
+    def _create_table(self, table: Dict[str, Any]) -> None:
+        name = table["name"]
+        parts = [self._column_definition(column) for column in table["columns"]]
+        if table.get("primaryKey"):
+            parts.append(f"PRIMARY KEY ({', '.join(table['primaryKey'])})")
+        for uc in table.get("uniqueConstraints", []):
+            parts.append(self._named(uc, f"UNIQUE ({', '.join(uc['columns'])})"))
+        for cc in table.get("checkConstraints", []):
+            parts.append(self._named(cc, f"CHECK ({cc['expression']})"))
+        if self.dialect == 'sqlite':
+            # SQLite only takes foreign keys in CREATE TABLE
+            parts.extend(self._named(fk, self._foreign_key_clause(fk)) for fk in table.get("foreignKeys", []))
+        else:
+            for fk in table.get("foreignKeys", []):
+                self._add_constraint(name, fk, self._foreign_key_clause(fk), "foreign key", phase="add_foreign_keys")
+        self._phases["create_tables"].append(f"CREATE TABLE {name} (\n  " + ",\n  ".join(parts) + "\n)")
+        for index in table.get("indexes", []):
+            self._phases["create_indexes"].append(self._create_index(name, index))
+
+    def _create_index(self, table_name: str, index: Dict[str, Any]) -> str:
+        unique = "UNIQUE " if index["unique"] else ""
+        return f"CREATE {unique}INDEX {index['name']} ON {table_name} ({', '.join(index['columns'])})"
+
+    def _foreign_key_clause(self, fk: Dict[str, Any]) -> str:
+        clause = f"FOREIGN KEY ({', '.join(fk['columns'])}) REFERENCES {fk['referredTable']} ({', '.join(fk['referredColumns'])})"
+        if fk.get("onDelete"):
+            clause += f" ON DELETE {fk['onDelete']}"
+        if fk.get("onUpdate"):
+            clause += f" ON UPDATE {fk['onUpdate']}"
+        return clause
+
+    def _named(self, constraint: Dict[str, Any], clause: str) -> str:
+        return f"CONSTRAINT {constraint['name']} {clause}" if constraint.get("name") else clause
+
+    def _add_constraint(self, table_name: str, constraint: Dict[str, Any], clause: str, kind: str,
+                        phase: str = "add_constraints") -> None:
+        if self.dialect == 'sqlite':
+            self.warnings.append(f"{table_name}: SQLite cannot add a {kind} to an existing table; rebuild it to add {clause}")
+            return
+        self._phases[phase].append(f"ALTER TABLE {table_name} ADD {self._named(constraint, clause)}")
+
+    def _drop_constraint(self, table_name: str, constraint: Dict[str, Any], kind: str) -> None:
+        name = constraint.get("name")
+        if self.dialect == 'sqlite' or not name:
+            self._cannot_drop(table_name, kind, name or constraint.get("expression") or ", ".join(constraint["columns"]))
+            return
+        if self.dialect == 'mysql' and kind == "check constraint":
+            self._phases["drop_constraints"].append(f"ALTER TABLE {table_name} DROP CHECK {name}")
+        elif self.dialect == 'mysql':
+            self._phases["drop_constraints"].append(f"ALTER TABLE {table_name} DROP INDEX {name}")
+        else:
+            self._phases["drop_constraints"].append(f"ALTER TABLE {table_name} DROP CONSTRAINT {name}")
+
+    def _cannot_drop(self, table_name: str, kind: str, description: str) -> None:
+        reason = "SQLite cannot drop it in place" if self.dialect == 'sqlite' else "it has no name to drop it by"
+        self.warnings.append(f"{table_name}: {kind} {description} is not in the source, but {reason}; rebuild the table")
+
+    def _drop_foreign_key(self, table_name: str, fk: Dict[str, Any]) -> None:
+        name = fk.get("name")
+        if self.dialect == 'sqlite' or not name:
+            self._cannot_drop(table_name, "foreign key", name or ", ".join(fk["columns"]))
+            return
+        keyword = "FOREIGN KEY" if self.dialect == 'mysql' else "CONSTRAINT"
+        self._phases["drop_foreign_keys"].append(f"ALTER TABLE {table_name} DROP {keyword} {name}")
+
+    def _alter_column(self, table_name: str, column: Dict[str, Any], change: Dict[str, Any]) -> None:
+        name = column["name"]
+        before, after = change["from"], change["to"]
+        if self.dialect == 'sqlite':
+            self.warnings.append(f"{table_name}.{name}: SQLite cannot alter a column in place; rebuild the table")
+        elif self.dialect == 'mysql':
+            # MODIFY restates the whole column
+            self._phases["alter_columns"].append(f"ALTER TABLE {table_name} MODIFY COLUMN {self._column_definition(column)}")
+        else:
+            statements = self._phases["alter_columns"]
+            if before["type"] != after["type"]:
+                statements.append(f"ALTER TABLE {table_name} ALTER COLUMN {name} TYPE {column['type']}")
+            if before["nullable"] != after["nullable"]:
+                statements.append(f"ALTER TABLE {table_name} ALTER COLUMN {name} "
+                                  + ("DROP NOT NULL" if after["nullable"] else "SET NOT NULL"))
+            if before["defaultValue"] != after["defaultValue"]:
+                statements.append(f"ALTER TABLE {table_name} ALTER COLUMN {name} "
+                                  + (f"SET DEFAULT {after['defaultValue']}" if after["defaultValue"] is not None
+                                     else "DROP DEFAULT"))
+            if before["autoIncrement"] != after["autoIncrement"]:
+                self.warnings.append(f"{table_name}.{name}: auto-increment differs; add or drop its sequence or identity by hand")
+
+    def _change_primary_key(self, table_name: str, before: List[str], after: List[str]) -> None:
+        if self.dialect == 'sqlite':
+            self.warnings.append(f"{table_name}: SQLite cannot change a primary key in place; rebuild the table")
+            return
+        statements = self._phases["primary_keys"]
+        if before:
+            # PostgreSQL names primary keys <table>_pkey unless told otherwise
+            statements.append(f"ALTER TABLE {table_name} DROP PRIMARY KEY" if self.dialect == 'mysql'
+                              else f"ALTER TABLE {table_name} DROP CONSTRAINT {table_name}_pkey")
+        if after:
+            statements.append(f"ALTER TABLE {table_name} ADD PRIMARY KEY ({', '.join(after)})")
+
+
+def diff_schemas(source: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare two schema snapshots; the DDL turns the target into the source"""
+    return SchemaDiff(source, target).compute()
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from latency import latency
+from query_stats import fingerprint
+from storage import storage
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Statements that can be explained without executing them
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class SlowQueryLog:
+    """Logs slow statements from every engine and captures their plans in the background.
+
+    Each statement is timed with cursor execution events, so any
+    DatabaseService operation is covered, not only ad-hoc queries. A
+    connection's threshold is either a fixed number of milliseconds or a
+    percentile of its recent statement latency. The first time a fingerprint
+    turns up slow, its plan is captured with a plain EXPLAIN (never ANALYZE)
+    on a separate worker.
+    """
+
+    # Statements needed in the 5m window before a percentile threshold applies
+    MIN_PERCENTILE_SAMPLES = 100
+
+    def __init__(self, default_threshold_ms: float = 1000.0, plan_workers: int = 1):
+        self.default_threshold_ms = default_threshold_ms
+        self.settings: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._plan_executor = ThreadPoolExecutor(max_workers=plan_workers, thread_name_prefix="slow-log-plan")
+        self._pending_plans: Set[Tuple[str, str]] = set()
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+
+    def configure(self, connection_id: str, threshold_ms: Optional[float] = None,
+                  percentile: Optional[float] = None) -> None:
+        """Set a connection's threshold in ms, or as a latency percentile (0-100)"""
+        if percentile is not None and not 0 < percentile < 100:
+            raise ValueError("Percentile must be between 0 and 100")
+        self.settings[connection_id] = (threshold_ms, percentile)
+
+    def remove(self, connection_id: str) -> None:
+        self.settings.pop(connection_id, None)
+
+    def threshold(self, connection_id: str) -> float:
+        """Current slow-statement threshold for a connection, in ms"""
+        threshold_ms, percentile = self.settings.get(connection_id, (None, None))
+        if percentile is not None:
+            recent = latency.window(connection_id, "statement", "5m")
+            if recent.count >= self.MIN_PERCENTILE_SAMPLES:
+                return recent.quantile(percentile / 100)
+        return threshold_ms if threshold_ms is not None else self.default_threshold_ms
+
+    def attach(self, engine: Engine, connection_id: str) -> None:
+        """Time every statement executed on an engine"""
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._slow_log_start = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, "_slow_log_start", None)
+            if start is None or getattr(self._local, "capturing", False):
+                return
+            # Runs inside the statement's execution; a logging failure must not fail the statement
+            try:
+                row_count = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+                self.observe(engine, connection_id, statement, parameters, (time.perf_counter() - start) * 1000,
+                             row_count)
+            except Exception:
+                logger.exception("Failed to record statement for the slow query log")
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    def observe(self, engine: Engine, connection_id: str, statement: str, parameters: Any,
+                duration_ms: float, row_count: Optional[int] = None) -> None:
+        """Record a statement's duration and log it if it is slow"""
+        threshold = self.threshold(connection_id)
+        latency.record(connection_id, "statement", duration_ms)
+        if duration_ms < threshold:
+            return
+
+        fingerprint_id = fingerprint(statement)[0]
+        is_new = storage.add_slow_query(connection_id, statement, duration_ms, row_count, fingerprint_id)
+        if is_new:
+            self._schedule_plan(engine, connection_id, fingerprint_id, statement, parameters)
+
+    def _schedule_plan(self, engine: Engine, connection_id: str, fingerprint_id: str,
+                       statement: str, parameters: Any) -> None:
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if keyword not in EXPLAINABLE:
+            return
+        key = (connection_id, fingerprint_id)
+        with self._pending_lock:
+            if key in self._pending_plans:
+                return
+            self._pending_plans.add(key)
+        self._plan_executor.submit(self._capture_plan, engine, connection_id, fingerprint_id, statement, parameters)
+
+    def _capture_plan(self, engine: Engine, connection_id: str, fingerprint_id: str,
+                      statement: str, parameters: Any) -> None:
+        """Run EXPLAIN for a slow statement with its original parameters"""
+        # executemany passes a list of parameter sets; one is enough to plan
+        if isinstance(parameters, list):
+            parameters = parameters[0] if parameters else None
+        self._local.capturing = True
+        try:
+            dialect = engine.dialect.name
+            with engine.connect() as conn:
+                if dialect == 'postgresql':
+                    result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                    plan = json.dumps(result.scalar(), indent=2)
+                elif dialect == 'mysql':
+                    result = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                    columns = list(result.keys())
+                    plan = "\n".join(str(dict(zip(columns, row))) for row in result.fetchall())
+                else:  # SQLite
+                    result = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    plan = "\n".join(str(tuple(row)) for row in result.fetchall())
+                conn.rollback()
+        except Exception as e:
+            plan = f"Plan unavailable: {e}"
+        finally:
+            self._local.capturing = False
+            with self._pending_lock:
+                self._pending_plans.discard((connection_id, fingerprint_id))
+        storage.set_slow_query_plan(connection_id, fingerprint_id, plan)
+
+
+# Global slow query log instance
+slow_log = SlowQueryLog(default_threshold_ms=float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "1000")))
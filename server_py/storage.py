@@ -1,27 +1,139 @@
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Any, Tuple, Deque, Set
+from collections import deque
+from itertools import islice
+from pydantic import BaseModel
 from models import (ConnectionConfig, InsertConnectionConfig, DatabaseType, QueryHistory,
                    SavedQuery, InsertSavedQuery, SlowQuery, PerformanceMetrics, 
-                   DataValidation, BackupMetadata)
+                   DataValidation, ValidationState, BackupMetadata, SchemaSnapshotRecord, Job)
+from query_stats import fingerprint as query_fingerprint
 import uuid
+import os
+import time
+import atexit
+import hashlib
+import sqlite3
+import threading
 from datetime import datetime
 
 
+# Per-connection cap on retained query history entries
+QUERY_HISTORY_LIMIT = int(os.getenv("QUERY_HISTORY_LIMIT", "1000"))
+SLOW_QUERY_LIMIT = 100
+PERFORMANCE_METRICS_LIMIT = 100
+
+
+class _QueryRecord:
+    """Compact history/slow-query entry; the query text lives in QueryTexts"""
+    __slots__ = ("id", "text_key", "timestamp", "execution_time", "success", "row_count", "error")
+    
+    def __init__(self, text_key: bytes, execution_time: float, success: bool = True,
+                 row_count: Optional[int] = None, error: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.text_key = text_key
+        self.timestamp = time.time()
+        self.execution_time = execution_time
+        self.success = success
+        self.row_count = row_count
+        self.error = error
+
+
+class _SlowQueryRecord:
+    """Slow-log entry aggregating every slow execution of one statement fingerprint"""
+    __slots__ = ("id", "fingerprint", "text_key", "first_seen", "timestamp", "execution_time",
+                 "max_time", "total_time", "count", "row_count", "plan")
+    
+    def __init__(self, fingerprint: str, text_key: bytes, execution_time: float, row_count: Optional[int]):
+        self.id = str(uuid.uuid4())
+        self.fingerprint = fingerprint
+        self.text_key = text_key
+        self.first_seen = self.timestamp = time.time()
+        self.execution_time = self.max_time = self.total_time = execution_time
+        self.count = 1
+        self.row_count = row_count
+        self.plan: Optional[str] = None
+
+
+class QueryTexts:
+    """Reference-counted store that keeps one copy of each distinct query text"""
+    
+    def __init__(self):
+        self._texts: Dict[bytes, List[Any]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._texts)
+    
+    def acquire(self, text: str) -> bytes:
+        """Store a text (or add a reference to it) and return its key"""
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        entry = self._texts.get(key)
+        if entry is None:
+            self._texts[key] = [text, 1]
+        else:
+            entry[1] += 1
+        return key
+    
+    def release(self, key: bytes) -> None:
+        """Drop a reference, freeing the text once nothing refers to it"""
+        entry = self._texts.get(key)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._texts[key]
+    
+    def get(self, key: bytes) -> str:
+        return self._texts[key][0]
+
+
+def _schema_snapshot_record(connection_id: str, snapshot: Dict[str, Any], name: Optional[str]) -> SchemaSnapshotRecord:
+    return SchemaSnapshotRecord(
+        id=str(uuid.uuid4()),
+        connectionId=connection_id,
+        name=name,
+        version=snapshot["version"],
+        dialect=snapshot["dialect"],
+        createdAt=datetime.utcnow().isoformat(),
+        tableCount=len(snapshot["tables"]),
+        snapshot=snapshot
+    )
+
+
 class MemStorage:
     """In-memory storage for database connections and query history"""
     
-    def __init__(self):
+    def __init__(self, history_limit: int = QUERY_HISTORY_LIMIT):
+        self.history_limit = history_limit
         self.connections: Dict[str, ConnectionConfig] = {}
-        self.query_history: Dict[str, QueryHistory] = {}
-        self.query_history_by_connection: Dict[str, List[str]] = {}
+        self.query_texts = QueryTexts()
+        # Ring buffers of compact records; pydantic models are built on read
+        self.query_history_by_connection: Dict[str, Deque[_QueryRecord]] = {}
+        # Slow queries by fingerprint, least recently seen first
+        self.slow_queries_by_connection: Dict[str, Dict[str, _SlowQueryRecord]] = {}
+        self.performance_metrics: Dict[Tuple[str, str], Deque[PerformanceMetrics]] = {}
+        # *_by_connection dicts are insertion-ordered sets of IDs for O(1) removal
         self.saved_queries: Dict[str, SavedQuery] = {}
-        self.saved_queries_by_connection: Dict[str, List[str]] = {}
-        self.slow_queries: Dict[str, SlowQuery] = {}
-        self.slow_queries_by_connection: Dict[str, List[str]] = {}
-        self.performance_metrics: Dict[str, List[PerformanceMetrics]] = {}
+        self.saved_queries_by_connection: Dict[str, Dict[str, None]] = {}
         self.data_validations: Dict[str, DataValidation] = {}
-        self.validations_by_connection: Dict[str, List[str]] = {}
+        self.validation_states: Dict[str, ValidationState] = {}
+        self.validations_by_connection: Dict[str, Dict[str, None]] = {}
         self.backups: Dict[str, BackupMetadata] = {}
-        self.backups_by_connection: Dict[str, List[str]] = {}
+        self.backups_by_connection: Dict[str, Dict[str, None]] = {}
+        self.schema_snapshots: Dict[str, SchemaSnapshotRecord] = {}
+        self.schema_snapshots_by_connection: Dict[str, Dict[str, None]] = {}
+        self.jobs: Dict[str, Job] = {}
+        self.jobs_by_connection: Dict[str, Dict[str, None]] = {}
+        # Slow queries are logged from database worker threads
+        self._lock = threading.RLock()
+    
+    def _push(self, ring: Deque[_QueryRecord], record: _QueryRecord) -> None:
+        """Append to a ring buffer, releasing the text of the evicted entry"""
+        if len(ring) == ring.maxlen:
+            self.query_texts.release(ring[0].text_key)
+        ring.append(record)
+    
+    def _release_all(self, ring: Deque[_QueryRecord]) -> None:
+        for record in ring:
+            self.query_texts.release(record.text_key)
+        ring.clear()
     
     def get_connection(self, connection_id: str) -> Optional[ConnectionConfig]:
         """Get a connection by ID"""
@@ -42,58 +154,59 @@ class MemStorage:
         self.connections[connection_id] = connection
         return connection
     
+    def update_connection(self, connection_id: str, **fields: Any) -> ConnectionConfig:
+        """Update fields of a connection"""
+        if connection_id not in self.connections:
+            raise ValueError("Connection not found")
+        connection = self.connections[connection_id].model_copy(update=fields)
+        self.connections[connection_id] = connection
+        return connection
+    
     def delete_connection(self, connection_id: str) -> None:
         """Delete a connection"""
         if connection_id in self.connections:
             del self.connections[connection_id]
         # Also delete query history for this connection
-        if connection_id in self.query_history_by_connection:
-            query_ids = self.query_history_by_connection[connection_id]
-            for query_id in query_ids:
-                if query_id in self.query_history:
-                    del self.query_history[query_id]
-            del self.query_history_by_connection[connection_id]
+        with self._lock:
+            if connection_id in self.query_history_by_connection:
+                self._release_all(self.query_history_by_connection.pop(connection_id))
     
     def add_query_history(self, connection_id: str, query: str, execution_time: float, 
-                          success: bool, row_count: Optional[int] = None, error: Optional[str] = None) -> QueryHistory:
+                          success: bool, row_count: Optional[int] = None, error: Optional[str] = None) -> None:
         """Add a query to history"""
-        query_id = str(uuid.uuid4())
-        history = QueryHistory(
-            id=query_id,
+        with self._lock:
+            if connection_id not in self.query_history_by_connection:
+                self.query_history_by_connection[connection_id] = deque(maxlen=self.history_limit)
+            record = _QueryRecord(self.query_texts.acquire(query), execution_time, success, row_count, error)
+            self._push(self.query_history_by_connection[connection_id], record)
+    
+    def _to_history(self, connection_id: str, record: _QueryRecord) -> QueryHistory:
+        return QueryHistory(
+            id=record.id,
             connectionId=connection_id,
-            query=query,
-            timestamp=datetime.utcnow().isoformat(),
-            executionTime=execution_time,
-            success=success,
-            rowCount=row_count,
-            error=error
+            query=self.query_texts.get(record.text_key),
+            timestamp=datetime.utcfromtimestamp(record.timestamp).isoformat(),
+            executionTime=record.execution_time,
+            success=record.success,
+            rowCount=record.row_count,
+            error=record.error
         )
-        self.query_history[query_id] = history
-        
-        if connection_id not in self.query_history_by_connection:
-            self.query_history_by_connection[connection_id] = []
-        self.query_history_by_connection[connection_id].append(query_id)
-        
-        return history
     
     def get_query_history(self, connection_id: str, limit: int = 50) -> List[QueryHistory]:
         """Get query history for a connection"""
         if connection_id not in self.query_history_by_connection:
             return []
         
-        query_ids = self.query_history_by_connection[connection_id]
         # Return most recent queries first
-        recent_ids = query_ids[-limit:][::-1]
-        return [self.query_history[qid] for qid in recent_ids if qid in self.query_history]
+        with self._lock:
+            recent = islice(reversed(self.query_history_by_connection[connection_id]), limit)
+            return [self._to_history(connection_id, record) for record in recent]
     
     def clear_query_history(self, connection_id: str) -> None:
         """Clear query history for a connection"""
-        if connection_id in self.query_history_by_connection:
-            query_ids = self.query_history_by_connection[connection_id]
-            for query_id in query_ids:
-                if query_id in self.query_history:
-                    del self.query_history[query_id]
-            self.query_history_by_connection[connection_id] = []
+        with self._lock:
+            if connection_id in self.query_history_by_connection:
+                self._release_all(self.query_history_by_connection[connection_id])
     
     # Saved Queries methods
     def create_saved_query(self, connection_id: str, query_data: InsertSavedQuery) -> SavedQuery:
@@ -108,19 +221,13 @@ class MemStorage:
             **query_data.model_dump()
         )
         self.saved_queries[query_id] = saved_query
-        
-        if connection_id not in self.saved_queries_by_connection:
-            self.saved_queries_by_connection[connection_id] = []
-        self.saved_queries_by_connection[connection_id].append(query_id)
-        
+        self.saved_queries_by_connection.setdefault(connection_id, {})[query_id] = None
         return saved_query
     
     def get_saved_queries(self, connection_id: str) -> List[SavedQuery]:
         """Get all saved queries for a connection"""
-        if connection_id not in self.saved_queries_by_connection:
-            return []
-        query_ids = self.saved_queries_by_connection[connection_id]
-        return [self.saved_queries[qid] for qid in query_ids if qid in self.saved_queries]
+        query_ids = self.saved_queries_by_connection.get(connection_id, {})
+        return [self.saved_queries[qid] for qid in query_ids]
     
     def get_saved_query(self, query_id: str) -> Optional[SavedQuery]:
         """Get a saved query by ID"""
@@ -143,64 +250,543 @@ class MemStorage:
     
     def delete_saved_query(self, query_id: str) -> None:
         """Delete a saved query"""
-        if query_id in self.saved_queries:
-            saved_query = self.saved_queries[query_id]
-            connection_id = saved_query.connectionId
-            del self.saved_queries[query_id]
-            if connection_id in self.saved_queries_by_connection:
-                self.saved_queries_by_connection[connection_id].remove(query_id)
+        saved_query = self.saved_queries.pop(query_id, None)
+        if saved_query is not None:
+            self.saved_queries_by_connection.get(saved_query.connectionId, {}).pop(query_id, None)
     
     # Slow Queries methods
-    def add_slow_query(self, connection_id: str, query: str, execution_time: float, row_count: Optional[int] = None) -> SlowQuery:
-        """Add a slow query"""
+    def add_slow_query(self, connection_id: str, query: str, execution_time: float,
+                       row_count: Optional[int] = None, fingerprint: Optional[str] = None) -> bool:
+        """Add a slow query, merging it into the entry for its fingerprint; True if the entry is new"""
+        fingerprint = fingerprint or query_fingerprint(query)[0]
+        with self._lock:
+            entries = self.slow_queries_by_connection.setdefault(connection_id, {})
+            record = entries.pop(fingerprint, None)
+            if record is None:
+                if len(entries) >= SLOW_QUERY_LIMIT:
+                    # Keep only SLOW_QUERY_LIMIT fingerprints per connection
+                    evicted = entries.pop(next(iter(entries)))
+                    self.query_texts.release(evicted.text_key)
+                entries[fingerprint] = _SlowQueryRecord(fingerprint, self.query_texts.acquire(query),
+                                                        execution_time, row_count)
+                return True
+            
+            # Keep the latest example of the statement
+            self.query_texts.release(record.text_key)
+            record.text_key = self.query_texts.acquire(query)
+            record.timestamp = time.time()
+            record.execution_time = execution_time
+            record.max_time = max(record.max_time, execution_time)
+            record.total_time += execution_time
+            record.count += 1
+            record.row_count = row_count
+            entries[fingerprint] = record
+            return False
+    
+    def set_slow_query_plan(self, connection_id: str, fingerprint: str, plan: str) -> None:
+        """Attach a captured execution plan to a slow query entry"""
+        with self._lock:
+            record = self.slow_queries_by_connection.get(connection_id, {}).get(fingerprint)
+            if record is not None:
+                record.plan = plan
+    
+    def get_slow_queries(self, connection_id: str, limit: int = 50) -> List[SlowQuery]:
+        """Get slow queries for a connection"""
+        with self._lock:
+            recent = list(islice(reversed(self.slow_queries_by_connection.get(connection_id, {}).values()), limit))
+            return [
+                SlowQuery(
+                    id=record.id,
+                    connectionId=connection_id,
+                    query=self.query_texts.get(record.text_key),
+                    executionTime=record.execution_time,
+                    timestamp=datetime.utcfromtimestamp(record.timestamp).isoformat(),
+                    rowCount=record.row_count,
+                    fingerprint=record.fingerprint,
+                    count=record.count,
+                    maxExecutionTime=record.max_time,
+                    avgExecutionTime=record.total_time / record.count,
+                    firstSeen=datetime.utcfromtimestamp(record.first_seen).isoformat(),
+                    plan=record.plan
+                )
+                for record in recent
+            ]
+    
+    # Performance Metrics methods
+    def add_performance_metrics(self, metrics: PerformanceMetrics, retention: Optional[int] = None) -> None:
+        """Add performance metrics, keeping the last `retention` samples per connection and resolution"""
+        key = (metrics.connectionId, metrics.resolution)
+        if key not in self.performance_metrics:
+            self.performance_metrics[key] = deque(maxlen=retention or PERFORMANCE_METRICS_LIMIT)
+        self.performance_metrics[key].append(metrics)
+    
+    def get_performance_metrics(self, connection_id: str, limit: int = 50,
+                                resolution: str = "10s") -> List[PerformanceMetrics]:
+        """Get performance metrics for a connection, oldest first"""
+        samples = self.performance_metrics.get((connection_id, resolution))
+        if not samples:
+            return []
+        return list(islice(reversed(samples), limit))[::-1]
+    
+    # Data Validation methods
+    def create_validation(self, connection_id: str, validation: DataValidation) -> DataValidation:
+        """Create a data validation rule"""
+        validation_id = str(uuid.uuid4())
+        validation_obj = DataValidation(
+            id=validation_id,
+            connectionId=connection_id,
+            **validation.model_dump(exclude={'id', 'connectionId'})
+        )
+        self.data_validations[validation_id] = validation_obj
+        self.validations_by_connection.setdefault(connection_id, {})[validation_id] = None
+        return validation_obj
+    
+    def get_validations(self, connection_id: str) -> List[DataValidation]:
+        """Get all validations for a connection"""
+        validation_ids = self.validations_by_connection.get(connection_id, {})
+        return [self.data_validations[vid] for vid in validation_ids]
+    
+    def delete_validation(self, validation_id: str) -> None:
+        """Delete a validation rule"""
+        validation = self.data_validations.pop(validation_id, None)
+        self.validation_states.pop(validation_id, None)
+        if validation is not None:
+            self.validations_by_connection.get(validation.connectionId, {}).pop(validation_id, None)
+    
+    def get_validation_state(self, validation_id: str) -> Optional[ValidationState]:
+        """Get the watermark and running totals of a validation rule"""
+        return self.validation_states.get(validation_id)
+    
+    def save_validation_state(self, state: ValidationState) -> None:
+        """Store the watermark and running totals of a validation rule"""
+        self.validation_states[state.validationId] = state
+    
+    # Backup methods
+    def create_backup_metadata(self, connection_id: str, filename: str, format: str, 
+                               size: int, tables: List[str]) -> BackupMetadata:
+        """Create backup metadata"""
+        backup_id = str(uuid.uuid4())
+        backup = BackupMetadata(
+            id=backup_id,
+            connectionId=connection_id,
+            filename=filename,
+            format=format,
+            size=size,
+            timestamp=datetime.utcnow().isoformat(),
+            tables=tables,
+            status="completed"
+        )
+        self.backups[backup_id] = backup
+        self.backups_by_connection.setdefault(connection_id, {})[backup_id] = None
+        return backup
+    
+    def get_backups(self, connection_id: str) -> List[BackupMetadata]:
+        """Get all backups for a connection"""
+        backup_ids = self.backups_by_connection.get(connection_id, {})
+        return [self.backups[bid] for bid in reversed(backup_ids)]
+    
+    # Schema snapshot methods
+    def create_schema_snapshot(self, connection_id: str, snapshot: Dict[str, Any],
+                               name: Optional[str] = None) -> SchemaSnapshotRecord:
+        """Store a schema snapshot"""
+        record = _schema_snapshot_record(connection_id, snapshot, name)
+        self.schema_snapshots[record.id] = record
+        self.schema_snapshots_by_connection.setdefault(connection_id, {})[record.id] = None
+        return record
+    
+    def get_schema_snapshots(self, connection_id: str) -> List[SchemaSnapshotRecord]:
+        """Get the stored schema snapshots of a connection without their content, newest first"""
+        snapshot_ids = self.schema_snapshots_by_connection.get(connection_id, {})
+        return [self.schema_snapshots[sid].model_copy(update={"snapshot": None}) for sid in reversed(snapshot_ids)]
+    
+    def get_schema_snapshot(self, snapshot_id: str) -> Optional[SchemaSnapshotRecord]:
+        """Get a stored schema snapshot with its content"""
+        return self.schema_snapshots.get(snapshot_id)
+    
+    def delete_schema_snapshot(self, snapshot_id: str) -> None:
+        """Delete a stored schema snapshot"""
+        record = self.schema_snapshots.pop(snapshot_id, None)
+        if record is not None:
+            self.schema_snapshots_by_connection.get(record.connectionId, {}).pop(snapshot_id, None)
+    
+    # Job methods
+    def create_job(self, connection_id: str, job_type: str, params: Dict[str, Any]) -> Job:
+        """Create a pending job"""
+        job_id = str(uuid.uuid4())
+        job = Job(
+            id=job_id,
+            connectionId=connection_id,
+            type=job_type,
+            status="pending",
+            params=params,
+            createdAt=datetime.utcnow().isoformat()
+        )
+        self.jobs[job_id] = job
+        self.jobs_by_connection.setdefault(connection_id, {})[job_id] = None
+        return job
+    
+    def update_job(self, job_id: str, **fields: Any) -> Job:
+        """Update fields of a job"""
+        if job_id not in self.jobs:
+            raise ValueError("Job not found")
+        job = self.jobs[job_id].model_copy(update=fields)
+        self.jobs[job_id] = job
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID"""
+        return self.jobs.get(job_id)
+    
+    def get_jobs(self, connection_id: str, limit: int = 50) -> List[Job]:
+        """Get jobs for a connection, most recent first"""
+        job_ids = self.jobs_by_connection.get(connection_id, {})
+        return [self.jobs[jid] for jid in islice(reversed(job_ids), limit)]
+    
+    def get_unfinished_jobs(self) -> List[Job]:
+        """Get all pending or running jobs"""
+        return [job for job in self.jobs.values() if job.status in ("pending", "running")]
+    
+    def delete_job(self, job_id: str) -> None:
+        """Delete a job"""
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            self.jobs_by_connection.get(job.connectionId, {}).pop(job_id, None)
+    
+    def sizes(self) -> Dict[str, int]:
+        """Number of stored records by kind"""
+        return {
+            "connections": len(self.connections),
+            "query_history": sum(len(ring) for ring in self.query_history_by_connection.values()),
+            "query_texts": len(self.query_texts),
+            "saved_queries": len(self.saved_queries),
+            "slow_queries": sum(len(entries) for entries in self.slow_queries_by_connection.values()),
+            "performance_metrics": sum(len(ring) for ring in self.performance_metrics.values()),
+            "validations": len(self.data_validations),
+            "validation_states": len(self.validation_states),
+            "backups": len(self.backups),
+            "schema_snapshots": len(self.schema_snapshots),
+            "jobs": len(self.jobs)
+        }
+
+
+class SQLiteStorage:
+    """Durable storage backed by a SQLite database in WAL mode.
+
+    Records are stored as JSON documents next to indexed connection_id and
+    timestamp columns. Query history and slow queries are buffered and
+    written behind in batches, so request latency does not include a disk
+    sync; reads of those tables flush the buffer first. Slow queries are
+    merged into their fingerprint's entry when the batch is written.
+    """
+    
+    TABLES = ("connections", "query_history", "saved_queries", "slow_queries",
+              "performance_metrics", "validations", "validation_states", "backups", "schema_snapshots", "jobs")
+    
+    def __init__(self, path: str, flush_interval: float = 0.2, flush_batch_size: int = 256,
+                 history_limit: int = QUERY_HISTORY_LIMIT):
+        self.path = path
+        self.history_limit = history_limit
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.RLock()
+        self._pending: List[Tuple[str, str, str, str, str]] = []
+        self._pending_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        # IDs of slow-query entries on disk or pending, so add_slow_query can tell new fingerprints without a read
+        self._slow_query_ids: Set[str] = set()
+        
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for table in self.TABLES:
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "id TEXT PRIMARY KEY, connection_id TEXT NOT NULL, timestamp TEXT NOT NULL, data TEXT NOT NULL)"
+                )
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_connection_timestamp ON {table} (connection_id, timestamp)"
+                )
+            self._slow_query_ids.update(row[0] for row in self._db.execute("SELECT id FROM slow_queries"))
+        
+        self._writer = threading.Thread(target=self._write_behind, name="storage-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+    
+    # Low-level helpers
+    def _put(self, table: str, record_id: str, connection_id: str, timestamp: str, model: BaseModel) -> None:
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {table} (id, connection_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                (record_id, connection_id, timestamp, model.model_dump_json())
+            )
+    
+    def _get(self, table: str, record_id: str, model_cls):
+        with self._db_lock:
+            row = self._db.execute(f"SELECT data FROM {table} WHERE id = ?", (record_id,)).fetchone()
+        return model_cls.model_validate_json(row[0]) if row else None
+    
+    def _list(self, table: str, connection_id: str, model_cls, limit: Optional[int] = None,
+              newest_first: bool = False) -> list:
+        order = "DESC" if newest_first else "ASC"
+        query = f"SELECT data FROM {table} WHERE connection_id = ? ORDER BY timestamp {order}, rowid {order}"
+        params: tuple = (connection_id,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._db_lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [model_cls.model_validate_json(row[0]) for row in rows]
+    
+    def _delete(self, table: str, record_id: str) -> None:
+        with self._db_lock:
+            self._db.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,))
+    
+    def _enqueue(self, table: str, record_id: str, connection_id: str, timestamp: str, model: BaseModel) -> None:
+        with self._pending_lock:
+            self._pending.append((table, record_id, connection_id, timestamp, model.model_dump_json()))
+            if len(self._pending) >= self.flush_batch_size:
+                self._flush_requested.set()
+    
+    def _write_behind(self) -> None:
+        while True:
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # Keep the writer alive; the batch is retried on the next flush
+    
+    def flush(self) -> None:
+        """Write buffered history and slow-query records in one transaction"""
+        with self._db_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            
+            try:
+                self._db.execute("BEGIN")
+                for table in {entry[0] for entry in batch} - {"slow_queries"}:
+                    self._db.executemany(
+                        f"INSERT OR REPLACE INTO {table} (id, connection_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                        [entry[1:] for entry in batch if entry[0] == table]
+                    )
+                self._merge_slow_queries([entry for entry in batch if entry[0] == "slow_queries"])
+                for table, connection_id in {(entry[0], entry[2]) for entry in batch}:
+                    limit = self.history_limit if table == "query_history" else SLOW_QUERY_LIMIT
+                    self._trim(table, connection_id, limit)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                raise
+            
+            if any(entry[0] == "slow_queries" for entry in batch):
+                # Trimming may have evicted fingerprints, which count as new when they are next seen
+                with self._pending_lock:
+                    pending = {entry[1] for entry in self._pending if entry[0] == "slow_queries"}
+                    self._slow_query_ids = pending | {
+                        row[0] for row in self._db.execute("SELECT id FROM slow_queries")
+                    }
+    
+    def _merge_slow_queries(self, entries: List[Tuple[str, str, str, str, str]]) -> None:
+        """Fold buffered slow executions into their stored per-fingerprint entries"""
+        merged: Dict[str, SlowQuery] = {}
+        for _, record_id, connection_id, timestamp, data in entries:
+            observed = SlowQuery.model_validate_json(data)
+            current = merged.get(record_id) or self._get("slow_queries", record_id, SlowQuery)
+            if current is None:
+                merged[record_id] = observed
+                continue
+            count = current.count + observed.count
+            merged[record_id] = current.model_copy(update={
+                "query": observed.query,
+                "executionTime": observed.executionTime,
+                "timestamp": observed.timestamp,
+                "rowCount": observed.rowCount,
+                "count": count,
+                "maxExecutionTime": max(current.maxExecutionTime or 0.0, observed.maxExecutionTime or 0.0),
+                "avgExecutionTime": ((current.avgExecutionTime or 0.0) * current.count
+                                     + (observed.avgExecutionTime or 0.0) * observed.count) / count
+            })
+        for record_id, slow_query in merged.items():
+            self._put("slow_queries", record_id, slow_query.connectionId, slow_query.timestamp, slow_query)
+    
+    def _trim(self, table: str, connection_id: str, keep: int) -> None:
+        """Delete all but the newest `keep` records of a connection"""
+        self._db.execute(
+            f"DELETE FROM {table} WHERE connection_id = ? AND id NOT IN "
+            f"(SELECT id FROM {table} WHERE connection_id = ? ORDER BY timestamp DESC, rowid DESC LIMIT ?)",
+            (connection_id, connection_id, keep)
+        )
+    
+    # Connection methods
+    def get_connection(self, connection_id: str) -> Optional[ConnectionConfig]:
+        """Get a connection by ID"""
+        return self._get("connections", connection_id, ConnectionConfig)
+    
+    def get_all_connections(self) -> List[ConnectionConfig]:
+        """Get all connections"""
+        with self._db_lock:
+            rows = self._db.execute("SELECT data FROM connections ORDER BY timestamp, rowid").fetchall()
+        return [ConnectionConfig.model_validate_json(row[0]) for row in rows]
+    
+    def create_connection(self, config: InsertConnectionConfig, db_type: DatabaseType) -> ConnectionConfig:
+        """Create a new connection"""
+        connection_id = str(uuid.uuid4())
+        connection = ConnectionConfig(
+            id=connection_id,
+            type=db_type,
+            **config.model_dump(exclude_none=True, exclude={"type"})
+        )
+        self._put("connections", connection_id, connection_id, datetime.utcnow().isoformat(), connection)
+        return connection
+    
+    def update_connection(self, connection_id: str, **fields: Any) -> ConnectionConfig:
+        """Update fields of a connection"""
+        with self._db_lock:
+            row = self._db.execute("SELECT timestamp FROM connections WHERE id = ?", (connection_id,)).fetchone()
+            connection = self.get_connection(connection_id)
+            if connection is None:
+                raise ValueError("Connection not found")
+            connection = connection.model_copy(update=fields)
+            self._put("connections", connection_id, connection_id, row[0], connection)
+        return connection
+    
+    def delete_connection(self, connection_id: str) -> None:
+        """Delete a connection"""
+        self.flush()
+        with self._db_lock:
+            self._db.execute("DELETE FROM connections WHERE id = ?", (connection_id,))
+            # Also delete query history for this connection
+            self._db.execute("DELETE FROM query_history WHERE connection_id = ?", (connection_id,))
+    
+    # Query history methods
+    def add_query_history(self, connection_id: str, query: str, execution_time: float, 
+                          success: bool, row_count: Optional[int] = None, error: Optional[str] = None) -> None:
+        """Add a query to history"""
         query_id = str(uuid.uuid4())
-        slow_query = SlowQuery(
+        history = QueryHistory(
             id=query_id,
             connectionId=connection_id,
             query=query,
-            executionTime=execution_time,
             timestamp=datetime.utcnow().isoformat(),
-            rowCount=row_count
+            executionTime=execution_time,
+            success=success,
+            rowCount=row_count,
+            error=error
         )
-        self.slow_queries[query_id] = slow_query
-        
-        if connection_id not in self.slow_queries_by_connection:
-            self.slow_queries_by_connection[connection_id] = []
-        self.slow_queries_by_connection[connection_id].append(query_id)
-        
-        # Keep only last 100 slow queries per connection
-        if len(self.slow_queries_by_connection[connection_id]) > 100:
-            old_id = self.slow_queries_by_connection[connection_id].pop(0)
-            if old_id in self.slow_queries:
-                del self.slow_queries[old_id]
-        
-        return slow_query
+        self._enqueue("query_history", query_id, connection_id, history.timestamp, history)
+    
+    def get_query_history(self, connection_id: str, limit: int = 50) -> List[QueryHistory]:
+        """Get query history for a connection"""
+        self.flush()
+        return self._list("query_history", connection_id, QueryHistory, limit, newest_first=True)
+    
+    def clear_query_history(self, connection_id: str) -> None:
+        """Clear query history for a connection"""
+        self.flush()
+        with self._db_lock:
+            self._db.execute("DELETE FROM query_history WHERE connection_id = ?", (connection_id,))
+    
+    # Saved Queries methods
+    def create_saved_query(self, connection_id: str, query_data: InsertSavedQuery) -> SavedQuery:
+        """Create a saved query"""
+        query_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        saved_query = SavedQuery(
+            id=query_id,
+            connectionId=connection_id,
+            createdAt=now,
+            updatedAt=now,
+            **query_data.model_dump()
+        )
+        self._put("saved_queries", query_id, connection_id, now, saved_query)
+        return saved_query
+    
+    def get_saved_queries(self, connection_id: str) -> List[SavedQuery]:
+        """Get all saved queries for a connection"""
+        return self._list("saved_queries", connection_id, SavedQuery)
+    
+    def get_saved_query(self, query_id: str) -> Optional[SavedQuery]:
+        """Get a saved query by ID"""
+        return self._get("saved_queries", query_id, SavedQuery)
+    
+    def update_saved_query(self, query_id: str, query_data: InsertSavedQuery) -> SavedQuery:
+        """Update a saved query"""
+        saved_query = self.get_saved_query(query_id)
+        if saved_query is None:
+            raise ValueError("Saved query not found")
+        updated_query = SavedQuery(
+            id=saved_query.id,
+            connectionId=saved_query.connectionId,
+            createdAt=saved_query.createdAt,
+            updatedAt=datetime.utcnow().isoformat(),
+            **query_data.model_dump()
+        )
+        self._put("saved_queries", query_id, saved_query.connectionId, saved_query.createdAt, updated_query)
+        return updated_query
+    
+    def delete_saved_query(self, query_id: str) -> None:
+        """Delete a saved query"""
+        self._delete("saved_queries", query_id)
+    
+    # Slow Queries methods
+    def add_slow_query(self, connection_id: str, query: str, execution_time: float,
+                       row_count: Optional[int] = None, fingerprint: Optional[str] = None) -> bool:
+        """Add a slow query, merging it into the entry for its fingerprint; True if the entry is new"""
+        fingerprint = fingerprint or query_fingerprint(query)[0]
+        record_id = f"{connection_id}:{fingerprint}"
+        now = datetime.utcnow().isoformat()
+        slow_query = SlowQuery(
+            id=record_id,
+            connectionId=connection_id,
+            query=query,
+            executionTime=execution_time,
+            timestamp=now,
+            rowCount=row_count,
+            fingerprint=fingerprint,
+            maxExecutionTime=execution_time,
+            avgExecutionTime=execution_time,
+            firstSeen=now
+        )
+        with self._pending_lock:
+            is_new = record_id not in self._slow_query_ids
+            self._slow_query_ids.add(record_id)
+        self._enqueue("slow_queries", record_id, connection_id, now, slow_query)
+        return is_new
+    
+    def set_slow_query_plan(self, connection_id: str, fingerprint: str, plan: str) -> None:
+        """Attach a captured execution plan to a slow query entry"""
+        record_id = f"{connection_id}:{fingerprint}"
+        self.flush()
+        with self._db_lock:
+            slow_query = self._get("slow_queries", record_id, SlowQuery)
+            if slow_query is not None:
+                self._put("slow_queries", record_id, connection_id, slow_query.timestamp,
+                          slow_query.model_copy(update={"plan": plan}))
     
     def get_slow_queries(self, connection_id: str, limit: int = 50) -> List[SlowQuery]:
         """Get slow queries for a connection"""
-        if connection_id not in self.slow_queries_by_connection:
-            return []
-        query_ids = self.slow_queries_by_connection[connection_id]
-        recent_ids = query_ids[-limit:][::-1]
-        return [self.slow_queries[qid] for qid in recent_ids if qid in self.slow_queries]
+        self.flush()
+        return self._list("slow_queries", connection_id, SlowQuery, limit, newest_first=True)
     
     # Performance Metrics methods
-    def add_performance_metrics(self, metrics: PerformanceMetrics) -> None:
-        """Add performance metrics"""
-        connection_id = metrics.connectionId
-        if connection_id not in self.performance_metrics:
-            self.performance_metrics[connection_id] = []
-        self.performance_metrics[connection_id].append(metrics)
-        
-        # Keep only last 100 metric entries per connection
-        if len(self.performance_metrics[connection_id]) > 100:
-            self.performance_metrics[connection_id].pop(0)
+    def add_performance_metrics(self, metrics: PerformanceMetrics, retention: Optional[int] = None) -> None:
+        """Add performance metrics, keeping the last `retention` samples per connection and resolution"""
+        # Series are keyed by connection and resolution so each is trimmed separately
+        series = f"{metrics.connectionId}/{metrics.resolution}"
+        with self._db_lock:
+            self._put("performance_metrics", str(uuid.uuid4()), series, metrics.timestamp, metrics)
+            self._trim("performance_metrics", series, retention or PERFORMANCE_METRICS_LIMIT)
     
-    def get_performance_metrics(self, connection_id: str, limit: int = 50) -> List[PerformanceMetrics]:
-        """Get performance metrics for a connection"""
-        if connection_id not in self.performance_metrics:
-            return []
-        return self.performance_metrics[connection_id][-limit:]
+    def get_performance_metrics(self, connection_id: str, limit: int = 50,
+                                resolution: str = "10s") -> List[PerformanceMetrics]:
+        """Get performance metrics for a connection, oldest first"""
+        series = f"{connection_id}/{resolution}"
+        return self._list("performance_metrics", series, PerformanceMetrics, limit, newest_first=True)[::-1]
     
     # Data Validation methods
     def create_validation(self, connection_id: str, validation: DataValidation) -> DataValidation:
@@ -209,31 +795,27 @@ class MemStorage:
         validation_obj = DataValidation(
             id=validation_id,
             connectionId=connection_id,
-            **validation.model_dump(exclude={'id'})
+            **validation.model_dump(exclude={'id', 'connectionId'})
         )
-        self.data_validations[validation_id] = validation_obj
-        
-        if connection_id not in self.validations_by_connection:
-            self.validations_by_connection[connection_id] = []
-        self.validations_by_connection[connection_id].append(validation_id)
-        
+        self._put("validations", validation_id, connection_id, datetime.utcnow().isoformat(), validation_obj)
         return validation_obj
     
     def get_validations(self, connection_id: str) -> List[DataValidation]:
         """Get all validations for a connection"""
-        if connection_id not in self.validations_by_connection:
-            return []
-        validation_ids = self.validations_by_connection[connection_id]
-        return [self.data_validations[vid] for vid in validation_ids if vid in self.data_validations]
+        return self._list("validations", connection_id, DataValidation)
     
     def delete_validation(self, validation_id: str) -> None:
         """Delete a validation rule"""
-        if validation_id in self.data_validations:
-            validation = self.data_validations[validation_id]
-            connection_id = validation.connectionId
-            del self.data_validations[validation_id]
-            if connection_id in self.validations_by_connection:
-                self.validations_by_connection[connection_id].remove(validation_id)
+        self._delete("validations", validation_id)
+        self._delete("validation_states", validation_id)
+    
+    def get_validation_state(self, validation_id: str) -> Optional[ValidationState]:
+        """Get the watermark and running totals of a validation rule"""
+        return self._get("validation_states", validation_id, ValidationState)
+    
+    def save_validation_state(self, state: ValidationState) -> None:
+        """Store the watermark and running totals of a validation rule"""
+        self._put("validation_states", state.validationId, state.connectionId, state.lastRun, state)
     
     # Backup methods
     def create_backup_metadata(self, connection_id: str, filename: str, format: str, 
@@ -250,21 +832,99 @@ class MemStorage:
             tables=tables,
             status="completed"
         )
-        self.backups[backup_id] = backup
-        
-        if connection_id not in self.backups_by_connection:
-            self.backups_by_connection[connection_id] = []
-        self.backups_by_connection[connection_id].append(backup_id)
-        
+        self._put("backups", backup_id, connection_id, backup.timestamp, backup)
         return backup
     
     def get_backups(self, connection_id: str) -> List[BackupMetadata]:
         """Get all backups for a connection"""
-        if connection_id not in self.backups_by_connection:
-            return []
-        backup_ids = self.backups_by_connection[connection_id]
-        return [self.backups[bid] for bid in backup_ids if bid in self.backups][::-1]
+        return self._list("backups", connection_id, BackupMetadata, newest_first=True)
+    
+    # Schema snapshot methods
+    def create_schema_snapshot(self, connection_id: str, snapshot: Dict[str, Any],
+                               name: Optional[str] = None) -> SchemaSnapshotRecord:
+        """Store a schema snapshot"""
+        record = _schema_snapshot_record(connection_id, snapshot, name)
+        self._put("schema_snapshots", record.id, connection_id, record.createdAt, record)
+        return record
+    
+    def get_schema_snapshots(self, connection_id: str) -> List[SchemaSnapshotRecord]:
+        """Get the stored schema snapshots of a connection without their content, newest first"""
+        records = self._list("schema_snapshots", connection_id, SchemaSnapshotRecord, newest_first=True)
+        return [record.model_copy(update={"snapshot": None}) for record in records]
+    
+    def get_schema_snapshot(self, snapshot_id: str) -> Optional[SchemaSnapshotRecord]:
+        """Get a stored schema snapshot with its content"""
+        return self._get("schema_snapshots", snapshot_id, SchemaSnapshotRecord)
+    
+    def delete_schema_snapshot(self, snapshot_id: str) -> None:
+        """Delete a stored schema snapshot"""
+        self._delete("schema_snapshots", snapshot_id)
+    
+    # Job methods
+    def create_job(self, connection_id: str, job_type: str, params: Dict[str, Any]) -> Job:
+        """Create a pending job"""
+        job_id = str(uuid.uuid4())
+        job = Job(
+            id=job_id,
+            connectionId=connection_id,
+            type=job_type,
+            status="pending",
+            params=params,
+            createdAt=datetime.utcnow().isoformat()
+        )
+        self._put("jobs", job_id, connection_id, job.createdAt, job)
+        return job
+    
+    def update_job(self, job_id: str, **fields: Any) -> Job:
+        """Update fields of a job"""
+        with self._db_lock:
+            job = self.get_job(job_id)
+            if job is None:
+                raise ValueError("Job not found")
+            job = job.model_copy(update=fields)
+            self._put("jobs", job_id, job.connectionId, job.createdAt, job)
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID"""
+        return self._get("jobs", job_id, Job)
+    
+    def get_jobs(self, connection_id: str, limit: int = 50) -> List[Job]:
+        """Get jobs for a connection, most recent first"""
+        return self._list("jobs", connection_id, Job, limit, newest_first=True)
+    
+    def get_unfinished_jobs(self) -> List[Job]:
+        """Get all pending or running jobs"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT data FROM jobs WHERE json_extract(data, '$.status') IN ('pending', 'running')"
+            ).fetchall()
+        return [Job.model_validate_json(row[0]) for row in rows]
+    
+    def delete_job(self, job_id: str) -> None:
+        """Delete a job"""
+        self._delete("jobs", job_id)
+    
+    def sizes(self) -> Dict[str, int]:
+        """Number of stored records by kind"""
+        self.flush()
+        with self._db_lock:
+            return {table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in self.TABLES}
+    
+    def file_size(self) -> int:
+        """Bytes used by the database file and its write-ahead log"""
+        return sum(os.path.getsize(path) for path in (self.path, self.path + "-wal") if os.path.exists(path))
+
+
+def create_storage():
+    """Create the storage backend selected by STORAGE_BACKEND (memory or sqlite)"""
+    backend = os.getenv("STORAGE_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteStorage(os.getenv("STORAGE_PATH", "omni_core_storage.db"))
+    if backend != "memory":
+        raise ValueError(f"Unsupported storage backend: {backend}")
+    return MemStorage()
 
 
 # Global storage instance
-storage = MemStorage()
+storage = create_storage()
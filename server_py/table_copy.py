@@ -0,0 +1,299 @@
+from typing import Dict, Optional, List, Any, Callable, Tuple
+from sqlalchemy import MetaData, Table, Column, Text, select, delete, func, tuple_, text, and_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import CompileError
+from sqlalchemy.types import NullType
+from datetime import datetime, date, time as time_type
+from decimal import Decimal
+import json
+import math
+import queue
+import threading
+import uuid
+
+
+# Rows read, converted and written per batch
+BATCH_SIZE = 5000
+# Batches buffered between the readers and the writer
+QUEUE_BATCHES = 8
+# Parallel readers by default, and at most
+READERS = 4
+MAX_READERS = 8
+
+
+def _portable_type(column_type, dialect):
+    """The source type as a generic SQLAlchemy type the target dialect can create, or None for text"""
+    if isinstance(column_type, NullType):
+        return None
+    try:
+        generic = column_type.as_generic()
+        generic.compile(dialect=dialect)
+    except (NotImplementedError, CompileError):
+        return None
+    return generic
+
+
+def _as_text(value: Any) -> Any:
+    """Value of a column that had no portable type, as text"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def _to_json(value: Any) -> Any:
+    """Key value in a form that survives a checkpoint stored as JSON"""
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    if isinstance(value, (datetime, date, time_type)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def _from_json(value: Any, column_type) -> Any:
+    """Key value read back from a checkpoint, as the Python type the column binds"""
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return value
+    if python_type in (datetime, date, time_type):
+        return python_type.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    if python_type is bytes:
+        return bytes.fromhex(value)
+    return value
+
+
+class TableCopy:
+    """Streams a table from one connection to another.
+
+    Readers each own a primary key range and stream it with a server-side
+    cursor, in key order, into a bounded queue; a full queue blocks the
+    readers, so memory stays at QUEUE_BATCHES batches whatever the table
+    size. A single writer inserts each batch in its own transaction through
+    a typed target Table, so the target dialect's bind processing handles
+    JSON, decimals and dates. Columns are created with the generic form of
+    their source type; types with no portable form become text.
+
+    After each batch commits, the range's last copied key is saved as a
+    checkpoint. Resuming deletes target rows past that key, which may have
+    committed before the checkpoint was saved, and continues from it.
+    Tables without a primary key are copied by a single reader and cannot
+    be resumed.
+    """
+
+    def __init__(self, source_engine: Engine, table_name: str, target_engine: Engine, target_table: str,
+                 readers: int = READERS, batch_size: int = BATCH_SIZE,
+                 progress: Optional[Callable[..., None]] = None,
+                 save_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.source_engine = source_engine
+        self.target_engine = target_engine
+        self.target_name = target_table
+        self.readers = max(1, min(readers, MAX_READERS))
+        self.batch_size = batch_size
+        self.progress = progress
+        self.save_checkpoint = save_checkpoint
+        self.source = Table(table_name, MetaData(), autoload_with=source_engine)
+        self.key_columns = [column.name for column in self.source.primary_key.columns]
+        self.text_columns: List[str] = []
+
+    def _target_table(self, if_exists: str) -> Tuple[Table, bool]:
+        """The target Table, created from the source's columns unless it exists; returns (table, created)"""
+        with self.target_engine.connect() as conn:
+            exists = self.target_engine.dialect.has_table(conn, self.target_name)
+        if exists and if_exists == "fail":
+            raise ValueError(f"Table {self.target_name} already exists on the target")
+        if exists and if_exists == "replace":
+            with self.target_engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE {self.target_name}"))
+            exists = False
+        if exists:
+            table = Table(self.target_name, MetaData(), autoload_with=self.target_engine)
+            missing = [column.name for column in self.source.columns if column.name not in table.columns]
+            if missing:
+                raise ValueError(f"Target table {self.target_name} has no column(s) {', '.join(missing)}")
+            if if_exists == "truncate":
+                with self.target_engine.begin() as conn:
+                    conn.execute(delete(table))
+            return table, False
+
+        columns = []
+        for column in self.source.columns:
+            column_type = _portable_type(column.type, self.target_engine.dialect)
+            if column_type is None:
+                self.text_columns.append(column.name)
+                column_type = Text()
+            columns.append(Column(column.name, column_type, primary_key=column.primary_key,
+                                  nullable=column.nullable, autoincrement=False))
+        table = Table(self.target_name, MetaData(), *columns)
+        table.create(self.target_engine)
+        return table, True
+
+    def _ranges(self, conn) -> List[Dict[str, Any]]:
+        """Split the key space between the readers, with every boundary an existing key"""
+        if not self.key_columns or self.readers == 1:
+            return [{"low": None, "high": None, "last": None, "done": False}]
+        keys = [self.source.c[name] for name in self.key_columns]
+        row_count = conn.execute(select(func.count()).select_from(self.source)).scalar()
+        step = max(1, math.ceil(row_count / self.readers))
+        numbered = select(*keys, text(f"ROW_NUMBER() OVER (ORDER BY {', '.join(self.key_columns)}) AS rn")) \
+            .select_from(self.source).subquery()
+        boundaries = [
+            [_to_json(value) for value in row]
+            for row in conn.execute(
+                select(*[numbered.c[name] for name in self.key_columns])
+                .where(text(f"rn % {step} = 1 AND rn > 1")).order_by(*[numbered.c[name] for name in self.key_columns])
+            )
+        ]
+        edges = [None] + boundaries + [None]
+        return [{"low": edges[i], "high": edges[i + 1], "last": None, "done": False} for i in range(len(edges) - 1)]
+
+    def _key(self, table: Table):
+        columns = [table.c[name] for name in self.key_columns]
+        return columns[0] if len(columns) == 1 else tuple_(*columns)
+
+    def _bound(self, table: Table, values: List[Any]):
+        values = [_from_json(value, table.c[name].type) for name, value in zip(self.key_columns, values)]
+        return values[0] if len(values) == 1 else tuple_(*values)
+
+    def _range_filter(self, table: Table, key_range: Dict[str, Any]):
+        """Rows of a range not yet copied"""
+        key = self._key(table)
+        conditions = []
+        if key_range["last"] is not None:
+            conditions.append(key > self._bound(table, key_range["last"]))
+        elif key_range["low"] is not None:
+            conditions.append(key >= self._bound(table, key_range["low"]))
+        if key_range["high"] is not None:
+            conditions.append(key < self._bound(table, key_range["high"]))
+        return and_(*conditions) if conditions else None
+
+    def _put(self, batches: "queue.Queue", item: Tuple[int, Any], stop: threading.Event) -> bool:
+        """Wait for room in the queue unless the copy stopped; False if it did"""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, key_range: Dict[str, Any], index: int, batches: "queue.Queue", stop: threading.Event) -> None:
+        try:
+            query = select(self.source)
+            condition = self._range_filter(self.source, key_range) if self.key_columns else None
+            if condition is not None:
+                query = query.where(condition)
+            if self.key_columns:
+                query = query.order_by(*[self.source.c[name] for name in self.key_columns])
+            with self.source_engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=self.batch_size).execute(query)
+                for rows in result.mappings().partitions(self.batch_size):
+                    batch = [dict(row) for row in rows]
+                    for row in batch:
+                        for name in self.text_columns:
+                            row[name] = _as_text(row[name])
+                    if not self._put(batches, (index, batch), stop):
+                        return
+            self._put(batches, (index, None), stop)
+        except BaseException as e:
+            self._put(batches, (index, e), stop)
+
+    def _cleanup(self, target: Table, ranges: List[Dict[str, Any]]) -> None:
+        """Delete target rows that committed after the last saved checkpoint"""
+        with self.target_engine.begin() as conn:
+            for key_range in ranges:
+                if not key_range["done"]:
+                    condition = self._range_filter(target, key_range)
+                    conn.execute(delete(target).where(condition) if condition is not None else delete(target))
+
+    def run(self, if_exists: str = "fail", checkpoint: Optional[Dict[str, Any]] = None,
+            total_rows: Optional[int] = None) -> Dict[str, Any]:
+        if checkpoint is not None:
+            if not self.key_columns:
+                raise ValueError("Tables without a primary key cannot be resumed")
+            target = Table(self.target_name, MetaData(), autoload_with=self.target_engine)
+            self.text_columns = checkpoint.get("textColumns", [])
+            ranges = checkpoint["ranges"]
+            copied = checkpoint.get("rowsCopied", 0)
+            self._cleanup(target, ranges)
+        else:
+            target, _ = self._target_table(if_exists)
+            with self.source_engine.connect() as conn:
+                ranges = self._ranges(conn)
+            copied = 0
+        if self.save_checkpoint and self.key_columns:
+            # Saved up front too, so a job that fails before its first batch can still be resumed
+            self.save_checkpoint(self._checkpoint(ranges, copied))
+        if self.progress:
+            self.progress(rows=copied, total_rows=total_rows,
+                          message=f"Copying with {sum(1 for r in ranges if not r['done'])} reader(s)")
+
+        batches: "queue.Queue" = queue.Queue(maxsize=QUEUE_BATCHES)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._read, args=(key_range, i, batches, stop),
+                             name=f"copy-reader-{i}", daemon=True)
+            for i, key_range in enumerate(ranges) if not key_range["done"]
+        ]
+        for thread in threads:
+            thread.start()
+
+        remaining = len(threads)
+        try:
+            with self.target_engine.connect() as conn:
+                insert = target.insert()
+                while remaining:
+                    index, batch = batches.get()
+                    if batch is None:
+                        ranges[index]["done"] = True
+                        remaining -= 1
+                    elif isinstance(batch, BaseException):
+                        raise batch
+                    else:
+                        conn.execute(insert, batch)
+                        conn.commit()
+                        copied += len(batch)
+                        if self.key_columns:
+                            ranges[index]["last"] = [_to_json(batch[-1][name]) for name in self.key_columns]
+                    if self.save_checkpoint and self.key_columns:
+                        self.save_checkpoint(self._checkpoint(ranges, copied))
+                    if self.progress and batch is not None and not isinstance(batch, BaseException):
+                        self.progress(rows=len(batch))
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+
+        self._reset_sequences(target)
+        return {
+            "targetTable": self.target_name,
+            "rowsCopied": copied,
+            "readers": len(ranges),
+            "textColumns": self.text_columns
+        }
+
+    def _checkpoint(self, ranges: List[Dict[str, Any]], copied: int) -> Dict[str, Any]:
+        return {"target": self.target_name, "ranges": ranges, "rowsCopied": copied, "textColumns": self.text_columns}
+
+    def _reset_sequences(self, target: Table) -> None:
+        """Move PostgreSQL sequences past the copied keys so later inserts do not collide"""
+        if self.target_engine.dialect.name != 'postgresql' or len(self.key_columns) != 1:
+            return
+        column = self.key_columns[0]
+        with self.target_engine.begin() as conn:
+            sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, :column)"),
+                                    {"table": self.target_name, "column": column}).scalar()
+            if sequence:
+                conn.execute(text(f"SELECT setval(:sequence, COALESCE((SELECT MAX({column}) FROM {self.target_name}), 1))"),
+                             {"sequence": sequence})
@@ -0,0 +1,117 @@
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Dict, Optional, List, Any
+import json
+import os
+import queue
+import threading
+import time
+
+
+class Span:
+    """A timed phase of a request"""
+    __slots__ = ("span_id", "name", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.span_id = os.urandom(8).hex()
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+
+
+class RequestTrace:
+    """Phase timings collected while serving one request"""
+
+    # Spans kept per request; totals keep counting past this limit
+    MAX_SPANS = 256
+
+    def __init__(self, name: str):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name)
+        self.spans: List[Span] = []
+        self.totals: Dict[str, float] = {}  # Phase name -> milliseconds
+        self._lock = threading.Lock()
+
+    def add(self, span: Span, duration_ms: float) -> None:
+        with self._lock:
+            self.totals[span.name] = self.totals.get(span.name, 0.0) + duration_ms
+            if len(self.spans) < self.MAX_SPANS:
+                self.spans.append(span)
+
+    def server_timing(self, total_ms: float) -> str:
+        """Server-Timing header value, one metric per phase plus the total"""
+        with self._lock:
+            entries = [f"{name};dur={duration:.3f}" for name, duration in self.totals.items()]
+        entries.append(f"total;dur={total_ms:.3f}")
+        return ", ".join(entries)
+
+    def to_spans(self) -> List[Dict[str, Any]]:
+        """Spans in the OpenTelemetry JSON field layout"""
+        def encode(span: Span, parent: Optional[str]) -> Dict[str, Any]:
+            return {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": parent,
+                "name": span.name,
+                "startTimeUnixNano": span.start_ns,
+                "endTimeUnixNano": span.end_ns,
+                "attributes": span.attributes
+            }
+        return [encode(self.root, None)] + [encode(span, self.root.span_id) for span in self.spans]
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace(name: str) -> RequestTrace:
+    trace = RequestTrace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def phase(name: str, **attributes: Any):
+    """Time a block as a phase of the current request; a no-op outside a request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span = Span(name, attributes)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span.end_ns = time.time_ns()
+        trace.add(span, (time.perf_counter() - start) * 1000)
+
+
+class SpanExporter:
+    """Appends finished traces as JSON lines to a file from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue[RequestTrace]" = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._write, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: RequestTrace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # Drop rather than slow down requests
+
+    def _write(self) -> None:
+        while True:
+            trace = self._queue.get()
+            with open(self.path, "a", encoding="utf-8") as f:
+                for span in trace.to_spans():
+                    f.write(json.dumps(span, default=str) + "\n")
+
+
+# Optional span export, enabled by setting TRACE_EXPORT_PATH
+exporter = SpanExporter(os.environ["TRACE_EXPORT_PATH"]) if os.getenv("TRACE_EXPORT_PATH") else None
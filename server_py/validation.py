@@ -0,0 +1,200 @@
+from typing import Dict, Optional, List, Any, Callable, Tuple
+from sqlalchemy import text
+import re
+
+
+# Violating rows returned per rule
+SAMPLE_LIMIT = 5
+# Rows fetched per round trip when patterns are matched in Python
+PATTERN_CHUNK_SIZE = 10000
+
+
+class ValidationPlan:
+    """Validates all of a table's rules in one aggregate scan.
+
+    Row-level rules (required, range, custom and pattern) each become a
+    condition that flags a violating row; one query sums them with
+    SUM(CASE WHEN ...) and also counts distinct values for unique rules. A
+    second query then reads only violating rows, stopping once every rule has
+    its samples. Pattern rules are pushed down as `~` (PostgreSQL) or REGEXP
+    (MySQL); on SQLite, which has no built-in regex operator, they are
+    matched in Python with compiled regexes while streaming the table in
+    chunks, and that pass also collects the samples.
+
+    `where` limits the check to a slice of the table. With `incremental`,
+    that slice is the rows added since the last run, and unique rules count
+    only values that the new rows turned into duplicates.
+    """
+
+    def __init__(self, dialect: str, table_name: str, rules: List[Dict[str, Any]],
+                 where: Optional[str] = None, where_params: Optional[Dict[str, Any]] = None,
+                 incremental: bool = False):
+        self.table_name = table_name
+        self.rules = rules
+        self.where = where
+        self.incremental = incremental and where is not None
+        self.params: Dict[str, Any] = dict(where_params or {})
+        self.conditions: Dict[int, str] = {}  # Rule index -> SQL condition true for a violating row
+        self.unique: List[int] = []
+        self.patterns: Dict[int, Tuple[str, "re.Pattern"]] = {}  # Rule index -> (column, regex) matched in Python
+
+        for i, rule in enumerate(rules):
+            column = rule["columnName"]
+            rule_type = rule["ruleType"]
+            rule_value = (rule.get("ruleValue") or "").strip()
+
+            if rule_type == "required":
+                self.conditions[i] = f"{column} IS NULL"
+            elif rule_type == "unique":
+                self.unique.append(i)
+            elif rule_type == "range" and rule_value:
+                # "min,max"; either side may be left empty
+                low, _, high = (bound.strip() for bound in rule_value.partition(","))
+                bounds = []
+                if low:
+                    self.params[f"min_{i}"] = low
+                    bounds.append(f"{column} < :min_{i}")
+                if high:
+                    self.params[f"max_{i}"] = high
+                    bounds.append(f"{column} > :max_{i}")
+                if bounds:
+                    self.conditions[i] = " OR ".join(bounds)
+            elif rule_type == "custom" and rule.get("customExpression"):
+                self.conditions[i] = f"NOT ({rule['customExpression']})"
+            elif rule_type == "pattern" and rule_value:
+                try:
+                    regex = re.compile(rule_value)
+                except re.error as e:
+                    raise ValueError(f"Invalid pattern for {column}: {e}")
+                self.params[f"pattern_{i}"] = rule_value
+                if dialect == 'postgresql':
+                    self.conditions[i] = f"{column} IS NOT NULL AND NOT (CAST({column} AS TEXT) ~ :pattern_{i})"
+                elif dialect == 'mysql':
+                    self.conditions[i] = f"{column} IS NOT NULL AND NOT ({column} REGEXP :pattern_{i})"
+                else:
+                    del self.params[f"pattern_{i}"]
+                    self.patterns[i] = (column, regex)
+
+    def _from(self) -> str:
+        return f"FROM {self.table_name}" + (f" WHERE {self.where}" if self.where else "")
+
+    def aggregate_query(self) -> Optional[str]:
+        """The single scan: one violation sum per row-level rule, value counts per unique rule"""
+        columns = [f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS v_{i}" for i, condition in self.conditions.items()]
+        # New rows can duplicate older ones, so incremental unique checks always run duplicates_query
+        for i in ([] if self.incremental else self.unique):
+            column = self.rules[i]["columnName"]
+            columns.append(f"COUNT({column}) AS n_{i}")
+            columns.append(f"COUNT(DISTINCT {column}) AS d_{i}")
+            columns.append(f"SUM(CASE WHEN {column} IS NULL THEN 1 ELSE 0 END) AS z_{i}")
+        if not columns:
+            return None
+        return f"SELECT {', '.join(columns)} {self._from()}"
+
+    def sample_query(self, rule_indexes: List[int], filtered: bool = True) -> str:
+        """Rows with a flag column per rule; only violating rows unless `filtered` is False"""
+        flags = [f"CASE WHEN {self.conditions[i]} THEN 1 ELSE 0 END AS _violates_{i}" for i in rule_indexes]
+        query = f"SELECT {', '.join(['*'] + flags)} {self._from()}"
+        if filtered and rule_indexes:
+            matches = " OR ".join(f"({self.conditions[i]})" for i in rule_indexes)
+            query += f" AND ({matches})" if self.where else f" WHERE {matches}"
+        return query
+
+    def duplicates_query(self, rule_index: int) -> str:
+        """Most repeated values of a unique rule, with the number of repeated values"""
+        column = self.rules[rule_index]["columnName"]
+        if self.incremental:
+            # Values of the new rows that repeat, unless they already repeated among the older rows
+            return (f"SELECT {column}, COUNT(*) AS count, COUNT(*) OVER () AS duplicate_values "
+                    f"FROM {self.table_name} WHERE {column} IN (SELECT {column} {self._from()}) "
+                    f"GROUP BY {column} HAVING COUNT(*) > 1 AND SUM(CASE WHEN {self.where} THEN 0 ELSE 1 END) <= 1 "
+                    f"ORDER BY count DESC LIMIT {SAMPLE_LIMIT}")
+        return (f"SELECT {column}, COUNT(*) AS count, COUNT(*) OVER () AS duplicate_values {self._from()} "
+                f"GROUP BY {column} HAVING COUNT(*) > 1 ORDER BY count DESC LIMIT {SAMPLE_LIMIT}")
+
+    def run(self, conn, progress: Optional[Callable[..., None]] = None) -> List[Dict[str, Any]]:
+        """Execute the plan and return one result per rule, in rule order"""
+        counts: Dict[int, int] = {i: 0 for i in range(len(self.rules))}
+        samples: Dict[int, List[Any]] = {i: [] for i in range(len(self.rules))}
+
+        aggregate = self.aggregate_query()
+        if aggregate:
+            if progress:
+                progress(message=f"Checking {len(self.rules)} rule(s) in one scan")
+            totals = conn.execute(text(aggregate), self.params).mappings().one()
+            for i in self.conditions:
+                counts[i] = int(totals[f"v_{i}"] or 0)
+        for i in self.unique:
+            if self.incremental or totals[f"n_{i}"] > totals[f"d_{i}"] or (totals[f"z_{i}"] or 0) > 1:
+                rows = conn.execute(text(self.duplicates_query(i)), self.params).fetchall()
+                counts[i] = rows[0][2] if rows else 0
+                samples[i] = [{"value": row[0], "count": row[1]} for row in rows]
+
+        if self.patterns:
+            # Python matching needs the rows anyway, so the same pass collects every rule's samples
+            if progress:
+                progress(message="Matching patterns")
+            self._scan_patterns(conn, counts, samples, progress)
+        else:
+            flagged = [i for i in self.conditions if counts[i]]
+            if flagged:
+                if progress:
+                    progress(message="Fetching sample violations")
+                self._collect_samples(conn, flagged, samples)
+
+        return [
+            {
+                "tableName": self.table_name,
+                "columnName": rule["columnName"],
+                "rule": rule["ruleType"],
+                "violationCount": counts[i],
+                "sampleViolations": samples[i]
+            }
+            for i, rule in enumerate(self.rules)
+        ]
+
+    def _collect_samples(self, conn, rule_indexes: List[int], samples: Dict[int, List[Any]]) -> None:
+        result = conn.execution_options(stream_results=True).execute(
+            text(self.sample_query(rule_indexes)), self.params)
+        try:
+            flag_count = len(rule_indexes)
+            keys = list(result.keys())[:-flag_count]
+            for row in result:
+                for i, flag in zip(rule_indexes, row[-flag_count:]):
+                    if flag and len(samples[i]) < SAMPLE_LIMIT:
+                        samples[i].append(dict(zip(keys, row[:-flag_count])))
+                if all(len(samples[i]) >= SAMPLE_LIMIT for i in rule_indexes):
+                    break
+        finally:
+            result.close()
+
+    def _scan_patterns(self, conn, counts: Dict[int, int], samples: Dict[int, List[Any]],
+                       progress: Optional[Callable[..., None]] = None) -> None:
+        sampled = [i for i in self.conditions if counts[i]]
+        result = conn.execution_options(stream_results=True).execute(
+            text(self.sample_query(sampled, filtered=False)), self.params)
+        try:
+            flag_count = len(sampled)
+            keys = list(result.keys())[:len(result.keys()) - flag_count]
+            lowered = [key.lower() for key in keys]
+            positions = {}
+            for i, (column, _) in self.patterns.items():
+                if column.lower() not in lowered:
+                    raise ValueError(f"Column {column} not found in {self.table_name}")
+                positions[i] = lowered.index(column.lower())
+            for chunk in result.partitions(PATTERN_CHUNK_SIZE):
+                for row in chunk:
+                    values = row[:len(keys)]
+                    for i, (_, regex) in self.patterns.items():
+                        value = values[positions[i]]
+                        if value is not None and not regex.search(value if isinstance(value, str) else str(value)):
+                            counts[i] += 1
+                            if len(samples[i]) < SAMPLE_LIMIT:
+                                samples[i].append(dict(zip(keys, values)))
+                    for i, flag in zip(sampled, row[len(keys):]):
+                        if flag and len(samples[i]) < SAMPLE_LIMIT:
+                            samples[i].append(dict(zip(keys, values)))
+                if progress:
+                    progress(rows=len(chunk))
+        finally:
+            result.close()